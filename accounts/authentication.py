@@ -1,13 +1,70 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
 from accounts.models import Profile
 
+USER_CACHE_KEY = "auth_user:{user_id}"
+
+
+def users_with_email(email):
+    """
+    Users whose email matches `email` case-insensitively. Filters on
+    LOWER(email), which is what the accounts 0003 index covers.
+    """
+    return User.objects.alias(email_lower=Lower("email")).filter(email_lower=email.lower())
+
+
+def cached_user(user_id):
+    """
+    The user with `user_id` and their profile, from the cache when
+    AUTH_USER_CACHE_TIMEOUT is set. Entries are dropped whenever the user or
+    profile is saved (accounts/signals.py), so password changes and
+    deactivations apply at once.
+    """
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    key = USER_CACHE_KEY.format(user_id=user_id)
+    if timeout:
+        try:
+            user = cache.get(key)
+        except Exception:
+            user = None
+        if user is not None:
+            return user
+    user = User.objects.select_related("profile").filter(pk=user_id).first()
+    if user is not None and timeout:
+        try:
+            cache.set(key, user, timeout)
+        except Exception:
+            pass
+    return user
+
+
+def forget_cached_user(user_id):
+    try:
+        cache.delete(USER_CACHE_KEY.format(user_id=user_id))
+    except Exception:
+        pass
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads the user of each request through cached_user()."""
+
+    def get_user(self, user_id):
+        user = cached_user(user_id)
+        return user if self.user_can_authenticate(user) else None
+
 
 class EmailAuthBackend:
     """Authenticate using an email address."""
 
     def authenticate(self, request, username=None, password=None, **kwargs):
+        if not username:
+            return None
         try:
-            user = User.objects.get(email=username)
+            user = users_with_email(username).get()
         except (User.DoesNotExist, User.MultipleObjectsReturned):
             return None
 
@@ -16,10 +73,7 @@ class EmailAuthBackend:
         return None
 
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        return cached_user(user_id)
 
 
 def get_or_create_user_by_email(backend, details, user=None, *args, **kwargs):
@@ -39,7 +93,7 @@ def get_or_create_user_by_email(backend, details, user=None, *args, **kwargs):
 
     try:
         # Check if a user with this email already exists
-        existing_user = User.objects.get(email=email)
+        existing_user = users_with_email(email).get()
         return {"user": existing_user}
     except User.DoesNotExist:
         # User doesn't exist, let the default pipeline create one
@@ -0,0 +1,191 @@
+import threading
+from bisect import bisect_left, insort
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+
+from images import thumbnails
+
+r = redis.from_url(settings.REDIS_URL)
+
+# Every searchable term of a user is a member "<term>\x00<user id>" of one
+# sorted set with all scores 0, so ZRANGEBYLEX returns the members starting
+# with a prefix in order. The user's current members are kept in a set so an
+# edit can remove the old ones.
+INDEX_KEY = "users:autocomplete"
+USER_TERMS_KEY = "users:autocomplete:{user_id}"
+SEPARATOR = "\x00"
+
+
+def user_terms(user):
+    """Lowercased prefixes a user can be found by: username, full name, last name."""
+    if not user.is_active:
+        return set()
+    terms = {user.username.lower()}
+    full_name = " ".join(user.get_full_name().lower().split())
+    if full_name:
+        terms.add(full_name)
+    last_name = " ".join(user.last_name.lower().split())
+    if last_name:
+        terms.add(last_name)
+    return terms
+
+
+def _member(term, user_id):
+    return f"{term}{SEPARATOR}{user_id}"
+
+
+def _user_id(member):
+    return int(member.rsplit(SEPARATOR, 1)[1])
+
+
+class LocalIndex:
+    """
+    Sorted in-process list of the same members, searched with bisect; used
+    while Redis is unavailable. Built from the database on first use and kept
+    up to date by this process's index_user() calls only.
+    """
+
+    def __init__(self):
+        self.members = None
+        self.terms = {}
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.members is None:
+            self.members, self.terms = [], {}
+            for user in get_user_model().objects.filter(is_active=True).only(
+                "id", "username", "first_name", "last_name", "is_active"
+            ):
+                self.terms[user.pk] = {_member(term, user.pk) for term in user_terms(user)}
+            self.members = sorted(member for members in self.terms.values() for member in members)
+
+    def update(self, user_id, terms):
+        with self.lock:
+            if self.members is None:
+                return
+            new = {_member(term, user_id) for term in terms}
+            old = self.terms.pop(user_id, set())
+            for member in old - new:
+                index = bisect_left(self.members, member)
+                if index < len(self.members) and self.members[index] == member:
+                    del self.members[index]
+            for member in new - old:
+                insort(self.members, member)
+            if new:
+                self.terms[user_id] = new
+
+    def search(self, prefix, count):
+        with self.lock:
+            self._load()
+            start = bisect_left(self.members, prefix)
+            return self.members[start : start + count]
+
+    def clear(self):
+        with self.lock:
+            self.members = None
+            self.terms = {}
+
+
+local_index = LocalIndex()
+
+
+def _replace_terms(user_id, terms):
+    local_index.update(user_id, terms)
+    terms_key = USER_TERMS_KEY.format(user_id=user_id)
+    members = [_member(term, user_id) for term in terms]
+    try:
+        stale = {member.decode() for member in r.smembers(terms_key)} - set(members)
+        pipeline = r.pipeline()
+        if stale:
+            pipeline.zrem(INDEX_KEY, *stale)
+        pipeline.delete(terms_key)
+        if members:
+            pipeline.zadd(INDEX_KEY, {member: 0 for member in members})
+            pipeline.sadd(terms_key, *members)
+        pipeline.execute()
+    except Exception:
+        # rebuild_autocomplete restores entries missed while Redis was down.
+        pass
+
+
+def index_user(user):
+    """Replace the autocomplete entries of `user` (none once inactive)."""
+    _replace_terms(user.pk, user_terms(user))
+
+
+def unindex_user(user_id):
+    _replace_terms(user_id, set())
+
+
+def rebuild_index(batch_size=1000):
+    """Index every active user from scratch; returns the number indexed."""
+    r.delete(INDEX_KEY)
+    count = 0
+    users = get_user_model().objects.filter(is_active=True).only(
+        "id", "username", "first_name", "last_name", "is_active"
+    )
+    pipeline = r.pipeline()
+    for user in users.iterator(chunk_size=batch_size):
+        members = [_member(term, user.pk) for term in user_terms(user)]
+        terms_key = USER_TERMS_KEY.format(user_id=user.pk)
+        pipeline.zadd(INDEX_KEY, {member: 0 for member in members})
+        pipeline.delete(terms_key)
+        pipeline.sadd(terms_key, *members)
+        count += 1
+        if count % batch_size == 0:
+            pipeline.execute()
+    pipeline.execute()
+    local_index.clear()
+    return count
+
+
+def _matching_members(prefix, count):
+    try:
+        # Members are compared as UTF-8 bytes; no byte sorts after 0xff.
+        start = b"[" + prefix.encode()
+        members = r.zrangebylex(INDEX_KEY, start, start + b"\xff", start=0, num=count)
+        return [member.decode() for member in members]
+    except Exception:
+        return local_index.search(prefix, count)
+
+
+def complete(query, limit=8):
+    """
+    Active users whose username, full name or last name starts with `query`
+    (case-insensitively), in lexicographic order of the matching term, as
+    records with the URL of their avatar thumbnail (None until generated).
+    """
+    prefix = " ".join(query.lower().split())
+    if not prefix:
+        return []
+    user_ids = []
+    # A user can match with several terms; read a few extra members.
+    for member in _matching_members(prefix, limit * 3):
+        if not member.startswith(prefix):
+            break
+        user_id = _user_id(member)
+        if user_id not in user_ids:
+            user_ids.append(user_id)
+    user_ids = user_ids[:limit]
+    users = get_user_model().objects.filter(is_active=True).select_related("profile").in_bulk(user_ids)
+    users = [users[user_id] for user_id in user_ids if user_id in users]
+
+    photos = []
+    for user in users:
+        try:
+            photos.append(user.profile.photo)
+        except ObjectDoesNotExist:
+            photos.append(None)
+    avatars = thumbnails.lookup_thumbnails(photos, "avatar")
+    return [
+        {
+            "username": user.username,
+            "name": user.get_full_name(),
+            "url": user.get_absolute_url(),
+            "avatar": avatar.url if avatar else None,
+        }
+        for user, avatar in zip(users, avatars)
+    ]
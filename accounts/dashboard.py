@@ -0,0 +1,89 @@
+from functools import cache as memoize
+
+from django.conf import settings
+from django.core.cache import cache
+
+from actions.models import Action
+from images.views import attach_view_counts
+from pages.conditional import VERSION_PREFIX, bump_versions, get_versions
+
+from .models import Contact
+
+SNAPSHOT_PREFIX = "dashboard:"
+
+
+@memoize
+def bookmarklet_code():
+    """The bookmarklet link, read from static/js/bookmarklet_launcher.js once per process."""
+    path = settings.BASE_DIR / "static" / "js" / "bookmarklet_launcher.js"
+    return "javascript:" + path.read_text().strip()
+
+
+def dashboard_version(user_id):
+    """Name of the content version (pages/conditional.py) of a user's dashboard."""
+    return f"dashboard:{user_id}"
+
+
+def invalidate_dashboards(*user_ids):
+    bump_versions(*(dashboard_version(user_id) for user_id in user_ids))
+
+
+def invalidate_follower_dashboards(user_id):
+    """Invalidate a user's dashboard and those of everyone following them."""
+    followers = Contact.objects.filter(user_to_id=user_id).values_list("user_from_id", flat=True)
+    invalidate_dashboards(user_id, *followers)
+
+
+def build_snapshot(user):
+    following_ids = list(user.following.values_list("id", flat=True))
+    if following_ids:
+        # Actions of the users followed, and the user's own.
+        actions = list(
+            Action.objects.filter(user_id__in=following_ids + [user.id])
+            .select_related("user", "user__profile")
+            .prefetch_related("target")
+            .order_by("-created")[:10]
+        )
+    else:
+        actions = []
+    user_images = list(user.image_set.all()[:6])
+    attach_view_counts(user_images)
+    return {
+        "actions": actions,
+        "user_images": user_images,
+        "followers_count": user.followers.count(),
+        "following_count": len(following_ids),
+    }
+
+
+def get_snapshot(user):
+    """
+    Return the data the dashboard of `user` shows. The snapshot is cached under
+    a fixed key together with the dashboard version it was built from; both are
+    fetched in one get_many, and a snapshot older than the current version (see
+    invalidate_dashboards()) is rebuilt. View counts refresh when the snapshot
+    expires (DASHBOARD_SNAPSHOT_TIMEOUT).
+    """
+    name = dashboard_version(user.pk)
+    version_key = f"{VERSION_PREFIX}{name}"
+    snapshot_key = f"{SNAPSHOT_PREFIX}{user.pk}"
+    try:
+        found = cache.get_many([version_key, snapshot_key])
+    except Exception:
+        found = {}
+    version = found.get(version_key)
+    snapshot = found.get(snapshot_key)
+    if version is not None and snapshot is not None and snapshot["version"] == version:
+        return snapshot
+
+    if version is None:
+        version = get_versions([name])[0]
+    # Built after reading the version: a change made meanwhile bumps it, so
+    # this snapshot is already stale for the next request.
+    snapshot = build_snapshot(user)
+    snapshot["version"] = version
+    try:
+        cache.set(snapshot_key, snapshot, settings.DASHBOARD_SNAPSHOT_TIMEOUT)
+    except Exception:
+        pass
+    return snapshot
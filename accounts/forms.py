@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
+from .authentication import users_with_email
 from .models import Profile
 
 
@@ -31,7 +32,7 @@ class UserRegistrationForm(forms.ModelForm):
 
     def clean_email(self):
         email = self.cleaned_data.get("email")
-        if get_user_model().objects.filter(email=email).exists():
+        if email and users_with_email(email).exists():
             raise forms.ValidationError("Email already in use.")
         return email
 
@@ -59,7 +60,7 @@ class UserEditForm(forms.ModelForm):
     def clean_email(self):
         email = self.cleaned_data.get("email")
         user_id = self.instance.id
-        if get_user_model().objects.filter(email=email).exclude(id=user_id).exists():
+        if email and users_with_email(email).exclude(id=user_id).exists():
             raise forms.ValidationError("Email already in use.")
         return email
 
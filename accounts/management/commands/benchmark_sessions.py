@@ -0,0 +1,90 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Profile
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "accounts.sessions",
+    "cache": "django.contrib.sessions.backends.cache",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure authenticated request throughput with each session engine. Requests "
+        "go through the full middleware and view stack in-process (django.test.Client), "
+        "against the configured database and session cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per engine.")
+        parser.add_argument(
+            "--engine",
+            action="append",
+            choices=list(ENGINES),
+            help="Session store to measure (repeatable). Defaults to all, db first as the baseline.",
+        )
+        parser.add_argument("--path", help="Page to request. Defaults to the dashboard.")
+        parser.add_argument("--username", help="Existing user to log in as. Defaults to a temporary user.")
+
+    def handle(self, *args, **options):
+        engines = options["engine"] or list(ENGINES)
+        path = options["path"] or reverse("dashboard")
+        User = get_user_model()
+        if options["username"]:
+            try:
+                user = User.objects.get(username=options["username"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['username']!r}.")
+            temporary = False
+        else:
+            user = User.objects.create_user(username=f"session-benchmark-{uuid.uuid4().hex[:12]}")
+            Profile.objects.create(user=user)
+            temporary = True
+
+        self.stdout.write(f"{options['requests']} requests to {path} per engine.")
+        self.stdout.write(f"{'engine':<10} {'req/s':>9} {'ms/req':>8} {'session queries/req':>20}")
+        baseline = None
+        try:
+            for engine in engines:
+                rate, ms, session_queries = self.measure(ENGINES[engine], user, path, options["requests"])
+                baseline = baseline or rate
+                self.stdout.write(
+                    f"{engine:<10} {rate:>9.1f} {ms:>8.2f} {session_queries:>20.2f}"
+                    f"  ({rate / baseline:.2f}x {engines[0]})"
+                )
+        finally:
+            if temporary:
+                user.delete()
+
+    def measure(self, engine, user, path, count):
+        """Return (requests per second, ms per request, session queries per request)."""
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ("*", "")]
+        client = Client(raise_request_exception=False, HTTP_HOST=hosts[0].lstrip(".") if hosts else "localhost")
+        with override_settings(SESSION_ENGINE=engine):
+            client.force_login(user)
+            try:
+                # Untimed: fills the session cache and the page's own caches.
+                response = client.get(path, secure=True)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {path} answered {response.status_code}.")
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        client.get(path, secure=True)
+                    elapsed = time.perf_counter() - start
+            finally:
+                client.logout()
+        session_table = Session._meta.db_table
+        session_queries = sum(session_table in query["sql"] for query in queries.captured_queries)
+        return count / elapsed, elapsed * 1000 / count, session_queries / count
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.autocomplete import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis index behind the user autocomplete (accounts/autocomplete.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{indexed} users indexed."))
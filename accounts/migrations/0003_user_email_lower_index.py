@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations
+
+# Indexes on LOWER(email) of the user table for case-insensitive email logins
+# (accounts/authentication.py:users_with_email). Emails are also made unique,
+# ignoring case and blanks, unless existing rows already share one; then only
+# the lookup index is created and the duplicates have to be merged by hand
+# before a unique index can be added.
+
+LOOKUP_INDEX = "accounts_user_email_lower_idx"
+UNIQUE_INDEX = "accounts_user_email_lower_uniq"
+
+
+def create_indexes(apps, schema_editor):
+    table = schema_editor.quote_name(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table)
+    schema_editor.execute(f"CREATE INDEX {LOOKUP_INDEX} ON {table} (LOWER(email))")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT LOWER(email) FROM {table} WHERE email <> '' GROUP BY LOWER(email) HAVING COUNT(*) > 1"
+        )
+        duplicates = cursor.fetchall()
+    if not duplicates:
+        schema_editor.execute(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON {table} (LOWER(email)) WHERE email <> ''")
+
+
+def drop_indexes(apps, schema_editor):
+    for name in (UNIQUE_INDEX, LOOKUP_INDEX):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_contact"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        # After the last auth.User change: SQLite rebuilds altered tables
+        # without indexes unknown to the model state.
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
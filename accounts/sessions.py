@@ -0,0 +1,43 @@
+"""
+Cached, database-backed sessions that keep working from the database while
+the session cache is unreachable (settings.SESSION_STORE = "cached_db").
+"""
+
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+
+class SessionStore(CachedDBStore):
+    """
+    Django's cached_db store reads the session from the cache and falls back to
+    the django_session table, but fails the request if refilling the cache
+    raises. Here reads never depend on the cache. Deleting (logout, key
+    rotation on login) still fails while the cache is down: a copy left behind
+    would keep the old session alive once the cache is back.
+    """
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        if data is not None:
+            return data
+
+        session = self._get_session_from_db()
+        if not session:
+            return {}
+        data = self.decode(session.session_data)
+        try:
+            self._cache.set(self.cache_key, data, self.get_expiry_age(expiry=session.expire_date))
+        except Exception:
+            pass
+        return data
+
+    def exists(self, session_key):
+        try:
+            if session_key and self.cache_key_prefix + session_key in self._cache:
+                return True
+        except Exception:
+            pass
+        return DBStore.exists(self, session_key)
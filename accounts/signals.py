@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from actions.models import Action
+from images.models import Image
+
+from .authentication import forget_cached_user
+from .autocomplete import index_user, unindex_user
+from .dashboard import invalidate_dashboards, invalidate_follower_dashboards
+from .models import Contact, Profile
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def contact_changed(sender, instance, **kwargs):
+    # Follow counts and whose actions are shown.
+    invalidate_dashboards(instance.user_from_id, instance.user_to_id)
+
+
+@receiver(post_save, sender=Action)
+def action_created(sender, instance, created, **kwargs):
+    if created:
+        invalidate_follower_dashboards(instance.user_id)
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, **kwargs):
+    # Uploads, edits and likes (total_likes) show in "My Posted Images".
+    invalidate_dashboards(instance.user_id)
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    # Followers may have an action targeting it.
+    invalidate_follower_dashboards(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    forget_cached_user(instance.pk)
+    # Logins only touch last_login.
+    if update_fields == frozenset({"last_login"}):
+        return
+    # Registration, UserEditForm and admin edits.
+    index_user(instance)
+    # Names appear in followers' activity streams.
+    if not created:
+        invalidate_follower_dashboards(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    forget_cached_user(instance.pk)
+    unindex_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    # The cached user carries the profile.
+    forget_cached_user(instance.user_id)
+    invalidate_follower_dashboards(instance.user_id)
@@ -0,0 +1,28 @@
+// People search box: debounced prefix lookups against the user autocomplete
+// endpoint (accounts/autocomplete.py), newest response wins.
+document.addEventListener('alpine:init', () => {
+    Alpine.data('userAutocomplete', (url) => ({
+        query: '',
+        results: [],
+        open: false,
+        requestId: 0,
+
+        search() {
+            const query = this.query.trim();
+            const requestId = ++this.requestId;
+            if (!query) {
+                this.results = [];
+                this.open = false;
+                return;
+            }
+            fetch(`${url}?${new URLSearchParams({q: query})}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (requestId !== this.requestId) return;
+                    this.results = data.users;
+                    this.open = true;
+                })
+                .catch(error => console.error('Autocomplete failed:', error));
+        },
+    }));
+});
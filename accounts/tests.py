@@ -1,11 +1,27 @@
-from datetime import date
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from actions.utils import create_action
+from images.models import Image
+
+from .authentication import EmailAuthBackend, cached_user, get_or_create_user_by_email
+from .autocomplete import complete, local_index, user_terms
+from .dashboard import bookmarklet_code
 from .forms import UserEditForm, UserRegistrationForm
 from .models import Contact, Profile
+from .sessions import SessionStore
+from .throttling import LocalBuckets, client_ip, local_buckets
 
 User = get_user_model()
 
@@ -310,3 +326,314 @@ class AccountsViewsTests(TestCase):
         data = response.json()
         self.assertEqual(data['status'], 'error')
 
+
+class DashboardSnapshotTests(TestCase):
+    """Test the cached dashboard snapshot and its invalidation"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Profile.objects.create(user=self.user)
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        Profile.objects.create(user=self.other)
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+    
+    def _dashboard(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def test_snapshot_is_reused(self):
+        """Test a repeated load does not query actions, images or follows"""
+        Contact.objects.create(user_from=self.user, user_to=self.other)
+        create_action(self.other, 'bookmarked image')
+        self._dashboard()
+        with CaptureQueriesContext(connection) as queries:
+            response = self._dashboard()
+        self.assertEqual(len(response.context['actions']), 1)
+        for table in ('actions_action', 'images_image', 'accounts_contact'):
+            self.assertFalse(any(table in query['sql'] for query in queries.captured_queries), table)
+    
+    def test_follow_and_followed_actions_invalidate(self):
+        """Test following someone and their new actions refresh the dashboard"""
+        self.assertEqual(self._dashboard().context['following_count'], 0)
+        Contact.objects.create(user_from=self.user, user_to=self.other)
+        response = self._dashboard()
+        self.assertEqual(response.context['following_count'], 1)
+        self.assertEqual(len(response.context['actions']), 0)
+        create_action(self.other, 'bookmarked image')
+        self.assertEqual(len(self._dashboard().context['actions']), 1)
+        other = Client()
+        other.login(username='other', password='testpass123')
+        self.assertEqual(other.get(reverse('dashboard')).context['followers_count'], 1)
+    
+    def test_upload_invalidates(self):
+        """Test a new image of the user shows up"""
+        self.assertEqual(len(self._dashboard().context['user_images']), 0)
+        Image.objects.create(user=self.user, title='New', image='images/new.jpg')
+        self.assertEqual([image.title for image in self._dashboard().context['user_images']], ['New'])
+    
+    def test_bookmarklet_code_is_loaded_once(self):
+        """Test the bookmarklet file is read once per process"""
+        bookmarklet_code.cache_clear()
+        self._dashboard()
+        response = self._dashboard()
+        self.assertTrue(response.context['bookmarklet_code'].startswith('javascript:'))
+        self.assertEqual(bookmarklet_code.cache_info().misses, 1)
+
+
+class UserAutocompleteTests(TestCase):
+    """Test username and name prefix autocomplete"""
+    
+    def setUp(self):
+        # Redis is optional; these tests run against the in-process index.
+        local_index.clear()
+        self.addCleanup(local_index.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.ada = User.objects.create_user(username='ada', first_name='Ada', last_name='Lovelace', password='x')
+        self.alan = User.objects.create_user(username='aturing', first_name='Alan', last_name='Turing', password='x')
+        Profile.objects.create(user=self.ada)
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+    
+    def _usernames(self, query):
+        return [record['username'] for record in complete(query)]
+    
+    def test_terms(self):
+        """Test users are found by username, full name and last name"""
+        self.assertEqual(user_terms(self.ada), {'ada', 'ada lovelace', 'lovelace'})
+        self.ada.is_active = False
+        self.assertEqual(user_terms(self.ada), set())
+    
+    def test_prefixes(self):
+        """Test prefixes match case-insensitively, each user once"""
+        self.assertEqual(self._usernames('A'), ['ada', 'aturing'])
+        self.assertEqual(self._usernames('ada l'), ['ada'])
+        self.assertEqual(self._usernames('TUR'), ['aturing'])
+        self.assertEqual(self._usernames('x'), [])
+        self.assertEqual(self._usernames('  '), [])
+    
+    def test_edits_update_the_index(self):
+        """Test saving a user replaces their entries incrementally"""
+        self.assertEqual(self._usernames('lovelace'), ['ada'])
+        self.ada.last_name = 'Byron'
+        self.ada.save()
+        self.assertEqual(self._usernames('lovelace'), [])
+        self.assertEqual(self._usernames('byron'), ['ada'])
+        User.objects.create_user(username='adele', password='x')
+        self.assertEqual(self._usernames('ad'), ['ada', 'adele'])
+        self.alan.delete()
+        self.assertEqual(self._usernames('a'), ['ada', 'adele'])
+    
+    def test_view(self):
+        """Test the endpoint returns records with avatar URLs"""
+        response = self.client.get(reverse('user_autocomplete'), {'q': 'ada'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['users'],
+            [{'username': 'ada', 'name': 'Ada Lovelace', 'url': self.ada.get_absolute_url(), 'avatar': None}],
+        )
+
+
+class EmailLoginTests(TestCase):
+    """Test indexed case-insensitive email lookups and cached user loading"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='Test@Example.com', password='testpass123')
+        Profile.objects.create(user=self.user)
+        self.client = Client()
+    
+    def test_login_with_email_in_any_case(self):
+        """Test the email backend matches emails on LOWER(email)"""
+        with CaptureQueriesContext(connection) as queries:
+            user = EmailAuthBackend().authenticate(None, username='test@EXAMPLE.com', password='testpass123')
+        self.assertEqual(user, self.user)
+        self.assertIn('LOWER(', queries.captured_queries[0]['sql'].upper())
+        self.assertIsNone(EmailAuthBackend().authenticate(None, username='test@example.com', password='wrong'))
+        self.assertTrue(self.client.login(username='TEST@example.com', password='testpass123'))
+    
+    def test_email_unique_index(self):
+        """Test emails are unique ignoring case through the LOWER(email) index"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='other', email='TEST@example.com')
+        # Blank emails are not unique.
+        User.objects.create_user(username='blank1')
+        User.objects.create_user(username='blank2')
+    
+    def test_forms_and_pipeline_ignore_case(self):
+        """Test registration rejects a case variant and the social pipeline finds the user"""
+        form = UserRegistrationForm(data={
+            'username': 'newuser', 'email': 'test@example.COM', 'password': 'x', 'password2': 'x',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+        self.assertEqual(get_or_create_user_by_email(None, {'email': 'TEST@example.com'}), {'user': self.user})
+    
+    def test_cached_user(self):
+        """Test requests load the user from the cache until it is saved"""
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(reverse('edit'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('edit'))
+        self.assertFalse(any('FROM "auth_user" WHERE "auth_user"."id"' in query['sql'] for query in queries.captured_queries))
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.assertEqual(cached_user(self.user.pk).first_name, 'Changed')
+        self.user.set_password('newpass456')
+        self.user.save()
+        # The old session's hash no longer matches.
+        response = self.client.get(reverse('edit'))
+        self.assertEqual(response.status_code, 302)
+    
+    def test_cache_can_be_disabled(self):
+        """Test AUTH_USER_CACHE_TIMEOUT=0 always reads the database"""
+        with self.settings(AUTH_USER_CACHE_TIMEOUT=0):
+            cached_user(self.user.pk)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(cached_user(self.user.pk), self.user)
+            self.assertEqual(len(queries.captured_queries), 1)
+
+
+class ThrottlingTests(TestCase):
+    """Test token-bucket rate limits on login and write endpoints"""
+    
+    def setUp(self):
+        # Redis is optional; these tests use the in-process buckets.
+        local_buckets.clear()
+        self.addCleanup(local_buckets.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.client = Client()
+    
+    def _login(self, username):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'wrong'})
+    
+    def test_login_is_limited_per_account(self):
+        """Test repeated failed logins for one account get a 429 with Retry-After"""
+        for _ in range(5):
+            self.assertEqual(self._login('testuser').status_code, 200)
+        response = self._login('TestUser')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertEqual(self._login('other').status_code, 200)
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+    
+    def test_login_is_limited_per_ip(self):
+        """Test many accounts tried from one address are limited too"""
+        with self.settings(THROTTLE_RATES={'login': {'ip': '3/m'}}):
+            for i in range(3):
+                self.assertEqual(self._login(f'user{i}').status_code, 200)
+            self.assertEqual(self._login('user9').status_code, 429)
+            self.client.defaults['REMOTE_ADDR'] = '10.0.0.2'
+            self.assertEqual(self._login('user9').status_code, 200)
+    
+    def test_like_and_follow_are_limited_per_user(self):
+        """Test write endpoints answer 429 JSON once a user's bucket is empty"""
+        self.client.login(username='testuser', password='testpass123')
+        image = Image.objects.create(user=self.other, title='Test', image='images/test.jpg')
+        with self.settings(THROTTLE_RATES={'like': {'user': '2/m'}, 'follow': {'user': '1/m'}}):
+            for _ in range(2):
+                response = self.client.post(reverse('images:like'), {'id': image.id, 'action': 'like'})
+                self.assertEqual(response.json()['status'], 'ok')
+            response = self.client.post(reverse('images:like'), {'id': image.id, 'action': 'like'})
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.json()['status'], 'error')
+            self.assertTrue(response.has_header('Retry-After'))
+            follow = {'id': self.other.id, 'action': 'follow'}
+            self.assertEqual(self.client.post(reverse('user_follow'), follow).status_code, 200)
+            self.assertEqual(self.client.post(reverse('user_follow'), follow).status_code, 429)
+            with self.settings(THROTTLE_ENABLED=False):
+                self.assertEqual(self.client.post(reverse('user_follow'), follow).status_code, 200)
+    
+    def test_local_buckets_refill(self):
+        """Test buckets refill over time and deny without consuming"""
+        buckets = LocalBuckets()
+        bucket = [('key', 2, 1 / 1000)]
+        with patch('accounts.throttling.time.monotonic', return_value=100.0):
+            self.assertEqual(buckets.take(bucket), (True, 0))
+            self.assertEqual(buckets.take(bucket), (True, 0))
+            self.assertEqual(buckets.take(bucket), (False, 1000))
+        with patch('accounts.throttling.time.monotonic', return_value=101.0):
+            self.assertEqual(buckets.take(bucket), (True, 0))
+        # A denied request takes nothing from the other buckets.
+        with patch('accounts.throttling.time.monotonic', return_value=101.0):
+            self.assertFalse(buckets.take([('fresh', 1, 1 / 1000), ('key', 2, 1 / 1000)])[0])
+            self.assertTrue(buckets.take([('fresh', 1, 1 / 1000)])[0])
+    
+    def test_client_ip(self):
+        """Test the client address honours the configured trusted proxies"""
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4, 5.6.7.8')
+        with self.settings(THROTTLE_PROXY_COUNT=0):
+            self.assertEqual(client_ip(request), '10.0.0.1')
+        with self.settings(THROTTLE_PROXY_COUNT=1):
+            self.assertEqual(client_ip(request), '5.6.7.8')
+        with self.settings(THROTTLE_PROXY_COUNT=2):
+            self.assertEqual(client_ip(request), '1.2.3.4')
+
+
+class SessionStorageTests(TestCase):
+    """Test cached session storage and its maintenance commands"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Profile.objects.create(user=self.user)
+        self.client = Client()
+    
+    def _session_queries(self, queries):
+        return [query for query in queries.captured_queries if Session._meta.db_table in query['sql']]
+    
+    def test_cached_db_reads_sessions_from_cache(self):
+        """Test authenticated requests don't query the session table"""
+        self.client.login(username='testuser', password='testpass123')
+        self.assertEqual(Session.objects.count(), 1)
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._session_queries(queries), [])
+    
+    def test_cached_db_falls_back_to_database(self):
+        """Test sessions still load while the session cache is failing"""
+        store = SessionStore()
+        store['answer'] = 42
+        store.create()
+        store._cache.clear()
+        
+        store = SessionStore(store.session_key)
+        with patch.object(store._cache, 'get', side_effect=ConnectionError), \
+                patch.object(store._cache, 'set', side_effect=ConnectionError):
+            self.assertEqual(store['answer'], 42)
+            self.assertTrue(store.exists(store.session_key))
+    
+    def test_cache_engine_stores_no_rows(self):
+        """Test the cache-only engine keeps sessions out of the database"""
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.cache'):
+            self.client.login(username='testuser', password='testpass123')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._session_queries(queries), [])
+        self.assertEqual(Session.objects.count(), 0)
+    
+    def test_clearsessions_deletes_expired_rows(self):
+        """Test clearsessions removes only expired sessions with the cached_db store"""
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='current', session_data='', expire_date=now + timedelta(days=1))
+        with self.settings(SESSION_ENGINE='accounts.sessions'):
+            call_command('clearsessions')
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['current'])
+    
+    def test_benchmark_sessions(self):
+        """Test the benchmark reports each engine and removes its temporary user"""
+        users = User.objects.count()
+        out = StringIO()
+        call_command('benchmark_sessions', requests=2, engine=['db', 'cache'], stdout=out)
+        output = out.getvalue()
+        self.assertIn('db ', output)
+        self.assertIn('cache ', output)
+        self.assertEqual(User.objects.count(), users)
@@ -0,0 +1,179 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+r = redis.from_url(settings.REDIS_URL)
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# Token buckets stored as hashes {tokens, ts}. Every bucket of a request is
+# refilled for the time elapsed, and a token is taken from all of them only if
+# each has one, so a denied request costs nothing. Returns {allowed, wait ms}.
+# ARGV holds (capacity, tokens per ms) per key.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - last) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+end
+local allowed = wait == 0 and 1 or 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local available = tokens[i] - allowed
+    redis.call('HSET', key, 'tokens', tostring(available), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil((capacity - available) / rate) + 1000)
+end
+return {allowed, wait}
+"""
+token_bucket = r.register_script(TOKEN_BUCKET_SCRIPT)
+
+
+def parse_rate(rate):
+    """'30/m' -> (capacity 30, 0.0005 tokens per millisecond)."""
+    count, period = rate.split("/")
+    count = int(count)
+    return count, count / (PERIODS[period[0]] * 1000)
+
+
+class LocalBuckets:
+    """
+    In-process token buckets with the same semantics as the Lua script, used
+    while Redis is unavailable. Limits then apply per process. The least
+    recently used buckets are dropped beyond `max_size`.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, buckets):
+        now = time.monotonic() * 1000
+        with self.lock:
+            tokens = []
+            wait = 0
+            for key, capacity, rate in buckets:
+                available, last = self.buckets.get(key, (capacity, now))
+                available = min(capacity, available + max(0, now - last) * rate)
+                tokens.append(available)
+                if available < 1:
+                    wait = max(wait, math.ceil((1 - available) / rate))
+            allowed = wait == 0
+            for (key, capacity, rate), available in zip(buckets, tokens):
+                self.buckets[key] = (available - allowed, now)
+                self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_size:
+                self.buckets.popitem(last=False)
+            return allowed, wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+local_buckets = LocalBuckets()
+
+
+def client_ip(request):
+    """
+    The client address: REMOTE_ADDR, or the address THROTTLE_PROXY_COUNT hops
+    from the end of X-Forwarded-For behind that many trusted proxies.
+    """
+    proxies = settings.THROTTLE_PROXY_COUNT
+    if proxies:
+        forwarded = [part.strip() for part in request.headers.get("X-Forwarded-For", "").split(",") if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _account(request):
+    # The account a login targets, before anyone is authenticated.
+    username = request.POST.get("username", "").strip().lower()
+    return hashlib.sha256(username.encode()).hexdigest()[:32] if username else None
+
+
+def _user(request):
+    return str(request.user.pk) if request.user.is_authenticated else None
+
+
+KEY_FUNCTIONS = {"ip": client_ip, "account": _account, "user": _user}
+
+
+def take_tokens(buckets):
+    """
+    Take a token from each (key, capacity, tokens per ms) bucket, or from none.
+    Returns (allowed, milliseconds until a retry can succeed).
+    """
+    try:
+        allowed, wait = token_bucket(
+            keys=[key for key, _, _ in buckets],
+            args=[value for _, capacity, rate in buckets for value in (capacity, rate)],
+        )
+        return bool(allowed), int(wait)
+    except Exception:
+        return local_buckets.take(buckets)
+
+
+def throttle(scope, methods=("POST",), as_json=True, **rates):
+    """
+    Rate limit a view with token buckets, one per keyword: 'ip' (client
+    address), 'account' (the POSTed username) or 'user' (the authenticated
+    user), each with a rate like '30/m' (a burst of 30, refilled over a
+    minute). THROTTLE_RATES[scope] overrides the rates. A request is allowed
+    only when every bucket has a token; otherwise the view is not called and a
+    429 with Retry-After is returned. Only `methods` are counted.
+
+        @throttle("like", user="60/m", ip="300/m")
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods or not settings.THROTTLE_ENABLED:
+                return view(request, *args, **kwargs)
+            buckets = []
+            for name, rate in {**rates, **settings.THROTTLE_RATES.get(scope, {})}.items():
+                value = KEY_FUNCTIONS[name](request)
+                if value:
+                    capacity, per_ms = parse_rate(rate)
+                    buckets.append((f"throttle:{scope}:{name}:{value}", capacity, per_ms))
+            if buckets:
+                allowed, wait = take_tokens(buckets)
+                if not allowed:
+                    return too_many_requests(math.ceil(wait / 1000), as_json)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def too_many_requests(retry_after, as_json=True):
+    retry_after = max(1, retry_after)
+    message = f"Too many requests. Try again in {retry_after} seconds."
+    if as_json:
+        response = JsonResponse({"status": "error", "message": message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(retry_after)
+    return response
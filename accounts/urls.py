@@ -6,13 +6,17 @@ from .views import (
     dashboard,
     disconnect_social,
     edit,
+    login,
     register,
+    user_autocomplete,
     user_detail,
     user_follow,
     user_list,
 )
 
 urlpatterns = [
+    # Overrides the login view of django.contrib.auth.urls.
+    path("login/", login, name="login"),
     path("", include("django.contrib.auth.urls")),
     path("", dashboard, name="dashboard"),
     path("register/", register, name="register"),
@@ -20,6 +24,7 @@ urlpatterns = [
     path("disconnect/<str:backend>/", disconnect_social, name="disconnect_social"),
     path("users/", user_list, name="user_list"),
     path("users/follow/", user_follow, name="user_follow"),
+    path("users/autocomplete/", user_autocomplete, name="user_autocomplete"),
     path("users/<str:username>/", user_detail, name="user_detail"),
 ]
 
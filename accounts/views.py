@@ -1,36 +1,47 @@
-import os
-
-import redis
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from social_django.models import UserSocialAuth
 
-from actions.models import Action
 from actions.utils import create_action
+from images.pagination import InvalidCursor, paginate
+from images.uploads import UploadError, finish_upload, request_files
+from images.views import attach_view_counts
+from pages.conditional import conditional_page, user_version
 
+from .autocomplete import complete
+from .dashboard import bookmarklet_code, get_snapshot
 from .forms import ProfileEditForm, UserEditForm, UserRegistrationForm
 from .models import Contact, Profile
+from .throttling import throttle
+
 
-# Initialize Redis connection
-r = redis.from_url(settings.REDIS_URL)
+# Password checks are deliberately slow; limit attempts per client and per
+# targeted account before they reach the authentication backends.
+login = throttle("login", as_json=False, ip="20/m", account="5/m")(auth_views.LoginView.as_view())
 
 
 @login_required
 def edit(request):
     """Edit user profile"""
     if request.method == "POST":
+        try:
+            files, upload = request_files(request, "photo")
+        except UploadError as e:
+            messages.error(request, str(e))
+            files, upload = request.FILES, None
         user_form = UserEditForm(instance=request.user, data=request.POST)
         profile_form = ProfileEditForm(
-            instance=request.user.profile, data=request.POST, files=request.FILES
+            instance=request.user.profile, data=request.POST, files=files
         )
         if user_form.is_valid() and profile_form.is_valid():
             user_form.save()
             profile_form.save()
+            if upload:
+                finish_upload(upload)
             messages.success(request, "Profile updated successfully")
             return redirect("dashboard")
         else:
@@ -48,51 +59,22 @@ def edit(request):
 
 @login_required
 def dashboard(request):
-    """Display user dashboard with bookmarklet code."""
-
-    # Retrieve actions only from users that the current user follows.
-    following_ids = request.user.following.values_list("id", flat=True)
-    if following_ids:
-        # Retrieve actions from users that the current user follows,
-        # and also include the current user's own actions.
-        user_ids = list(following_ids)
-        user_ids.append(request.user.id)
-        actions = (
-            Action.objects.filter(user_id__in=user_ids)
-            .select_related("user", "user__profile")
-            .prefetch_related("target")
-            .order_by("-created")[:10]
-        )
-    else:
-        # If the user follows no one, show an empty action list.
-        actions = Action.objects.none()
-    
-    # Fetch view counts from Redis for user's images
-    user_images = request.user.image_set.all()[:6]
-    try:
-        for image in user_images:
-            views = r.get(f"image:{image.id}:views")
-            image.views = int(views) if views else 0
-    except Exception:
-        # Redis might not be available, default to 0 views for each image
-        for image in user_images:
-            image.views = 0
-    
-    # Load bookmarklet code from file
-    bookmarklet_file = os.path.join(
-        settings.BASE_DIR, "static", "js", "bookmarklet_launcher.js"
-    )
-    with open(bookmarklet_file, "r") as f:
-        bookmarklet_code = "javascript:" + f.read().strip()
-
+    """
+    Display user dashboard with bookmarklet code. The activity stream, the
+    user's recent images and follow counts come from a cached per-user
+    snapshot (accounts/dashboard.py).
+    """
+    snapshot = get_snapshot(request.user)
     return render(
         request,
         "accounts/dashboard.html",
         {
             "section": "dashboard",
-            "bookmarklet_code": bookmarklet_code,
-            "actions": actions,
-            "user_images": user_images,
+            "bookmarklet_code": bookmarklet_code(),
+            "actions": snapshot["actions"],
+            "user_images": snapshot["user_images"],
+            "followers_count": snapshot["followers_count"],
+            "following_count": snapshot["following_count"],
         },
     )
 
@@ -153,54 +135,49 @@ def user_list(request):
 
 
 @login_required
+def user_autocomplete(request):
+    """
+    JSON list of up to 8 active users whose username or name starts with 'q',
+    with their avatar thumbnail URLs (accounts/autocomplete.py).
+    """
+    return JsonResponse({"users": complete(request.GET.get("q", ""))})
+
+
+@login_required
+@conditional_page(
+    lambda request, username: ["images", f"user:{username}", user_version(request.user)]
+)
 def user_detail(request, username):
     user = get_object_or_404(User, username=username, is_active=True)
     
-    # Fetch view counts from Redis for user's images using pipeline for efficiency
-    user_images = user.image_set.prefetch_related("users_like").all()
-
-    # Pagination
-    paginator = Paginator(user_images, 8)
-    page = request.GET.get("page")
+    images_only = request.GET.get("images_only")
     try:
-        images = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        images = paginator.page(1)
-    except EmptyPage:
-        if request.GET.get("images_only"):
-            # If images_only is True and page is out of range, return empty response
+        images = paginate(user.image_set.all(), request.GET.get("cursor"), 8)
+    except InvalidCursor:
+        if images_only:
             return HttpResponse("")
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        images = paginator.page(paginator.num_pages)
+        images = paginate(user.image_set.all(), None, 8)
 
-    try:
-        pipeline = r.pipeline()
-        for image in images:
-            pipeline.get(f"image:{image.id}:views")
-        view_counts = pipeline.execute()
-        
-        # Attach view counts to image objects
-        for image, views in zip(images, view_counts):
-            image.views = int(views) if views else 0
-    except Exception:
-        # If Redis is unavailable, set all view counts to 0
-        for image in images:
-            image.views = 0
-    
-    if request.GET.get("images_only"):
-        return render(
+    attach_view_counts(images)
+
+    if images_only:
+        response = render(
             request,
             "includes/list_images_subset.html",
             {"section": "people", "user": user, "images": images},
         )
+        response["X-Next-Cursor"] = images.next_cursor or ""
+        return response
 
     return render(
-        request, "accounts/user/detail.html", {"section": "people", "user": user, "images": images}
+        request,
+        "accounts/user/detail.html",
+        {"section": "people", "user": user, "images": images, "next_cursor": images.next_cursor},
     )
 
 
 @login_required
+@throttle("follow", user="30/m", ip="300/m")
 def user_follow(request):
     """Handle follow/unfollow actions via AJAX."""
     if request.method == "POST":
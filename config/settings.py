@@ -184,11 +184,27 @@ else:
 
 # Authentication settings
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
+    "accounts.authentication.CachedModelBackend",
     "accounts.authentication.EmailAuthBackend",
     "social_core.backends.google.GoogleOAuth2",
 ]
 
+# Seconds the user and profile of a session are cached between requests
+# (accounts/authentication.py:cached_user); 0 loads them from the database
+AUTH_USER_CACHE_TIMEOUT = config("AUTH_USER_CACHE_TIMEOUT", default=5 * 60, cast=int)
+
+# Token-bucket rate limits (accounts/throttling.py). Rates are set per view;
+# THROTTLE_RATES overrides them by scope, e.g. {"login": {"ip": "60/m"}}
+THROTTLE_ENABLED = config("THROTTLE_ENABLED", default=True, cast=bool)
+THROTTLE_RATES = {}
+# Trusted reverse proxies in front of the app; the client address is taken from
+# X-Forwarded-For that many hops from the end instead of REMOTE_ADDR. Production
+# defaults to 1 for the Heroku router: with 0 there, every client shares the
+# router's address and one "ip" bucket, so a few failed logins would lock
+# everyone out. Set 0 when clients connect directly, or X-Forwarded-For can be
+# forged to dodge the limits.
+THROTTLE_PROXY_COUNT = config("THROTTLE_PROXY_COUNT", default=0 if DEBUG else 1, cast=int)
+
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = config("GOOGLE_OAUTH2_KEY", default="")
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = config("GOOGLE_OAUTH2_SECRET", default="")
 
@@ -227,12 +243,81 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Easy Thumbnails configuration
 THUMBNAIL_DEBUG = DEBUG
+# Aliases targeted at a field are generated for every file by the thumbnail
+# worker (images/thumbnails.py)
 THUMBNAIL_ALIASES = {
-    "": {
+    "accounts.Profile.photo": {
         "avatar": {"size": (64, 64), "crop": "center"},
         "avatar_large": {"size": (200, 200), "crop": "center"},
+        "action": {"size": (80, 80), "crop": "100%"},
+    },
+    "images.Image.image": {
+        "card": {"size": (500, 500), "crop": "smart", "quality": 90},
+        "action": {"size": (80, 80), "crop": "100%"},
     },
 }
+# Responsive variants: narrower renditions of these aliases, each also encoded in
+# THUMBNAIL_VARIANT_FORMATS, served through {% responsive_thumbnail %}
+THUMBNAIL_VARIANT_WIDTHS = {
+    "card": (240, 360, 500),
+    "avatar_large": (48, 96, 200),
+}
+THUMBNAIL_VARIANT_FORMATS = config(
+    "THUMBNAIL_VARIANT_FORMATS", default="avif,webp", cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+# Remember generated thumbnail sizes so templates don't reopen the files
+THUMBNAIL_CACHE_DIMENSIONS = True
+# Resolved thumbnail URL/size cache (images/thumbnails.py): shared entries live in
+# the Django cache, recently used ones also in a small per-process LRU
+THUMBNAIL_URL_CACHE_TIMEOUT = config("THUMBNAIL_URL_CACHE_TIMEOUT", default=24 * 60 * 60, cast=int)
+THUMBNAIL_URL_LOCAL_CACHE_SIZE = config("THUMBNAIL_URL_LOCAL_CACHE_SIZE", default=2048, cast=int)
+THUMBNAIL_URL_LOCAL_CACHE_TIMEOUT = config("THUMBNAIL_URL_LOCAL_CACHE_TIMEOUT", default=60, cast=int)
+# Rendered image cards (images/cards.py). A card is re-rendered when its view
+# count moves into the next bucket of this many views
+IMAGE_CARD_CACHE_TIMEOUT = config("IMAGE_CARD_CACHE_TIMEOUT", default=24 * 60 * 60, cast=int)
+IMAGE_CARD_VIEW_BUCKET = config("IMAGE_CARD_VIEW_BUCKET", default=10, cast=int)
+# Decode originals through the local originals cache (images/originals.py)
+THUMBNAIL_SOURCE_GENERATORS = ("images.originals.cached_pil_image",)
+
+# Remote image downloads (ImageCreateForm / bookmarklet)
+IMAGE_DOWNLOAD_MAX_BYTES = config("IMAGE_DOWNLOAD_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+IMAGE_DOWNLOAD_CHUNK_SIZE = config("IMAGE_DOWNLOAD_CHUNK_SIZE", default=64 * 1024, cast=int)
+IMAGE_DOWNLOAD_RETRIES = config("IMAGE_DOWNLOAD_RETRIES", default=2, cast=int)
+IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST = config("IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST", default=4, cast=int)
+# On-disk cache for conditional re-fetches; set to an empty string to disable
+IMAGE_DOWNLOAD_CACHE_DIR = config("IMAGE_DOWNLOAD_CACHE_DIR", default=str(BASE_DIR / ".cache" / "downloads"))
+IMAGE_DOWNLOAD_CACHE_MAX_BYTES = config("IMAGE_DOWNLOAD_CACHE_MAX_BYTES", default=256 * 1024 * 1024, cast=int)
+# Local read-through cache of stored originals for thumbnailing and backfills.
+# Off by default with local storage, where it would only duplicate MEDIA_ROOT
+IMAGE_ORIGINALS_CACHE_DIR = config(
+    "IMAGE_ORIGINALS_CACHE_DIR", default="" if DEBUG else str(BASE_DIR / ".cache" / "originals")
+)
+IMAGE_ORIGINALS_CACHE_MAX_BYTES = config("IMAGE_ORIGINALS_CACHE_MAX_BYTES", default=1024 * 1024 * 1024, cast=int)
+
+# Chunked, resumable uploads (images/uploads.py, static/js/chunked_upload.js).
+# Chunks must stay below DATA_UPLOAD_MAX_MEMORY_SIZE
+IMAGE_UPLOAD_MAX_BYTES = config("IMAGE_UPLOAD_MAX_BYTES", default=50 * 1024 * 1024, cast=int)
+IMAGE_UPLOAD_CHUNK_SIZE = config("IMAGE_UPLOAD_CHUNK_SIZE", default=1024 * 1024, cast=int)
+# Unfinished uploads older than this (seconds) are removed by clean_uploads
+IMAGE_UPLOAD_STALE_AFTER = config("IMAGE_UPLOAD_STALE_AFTER", default=24 * 60 * 60, cast=int)
+
+# Ingest normalization: originals larger than this (px, longest side) are downscaled
+IMAGE_MAX_DIMENSION = config("IMAGE_MAX_DIMENSION", default=2560, cast=int)
+IMAGE_NORMALIZE_QUALITY = config("IMAGE_NORMALIZE_QUALITY", default=85, cast=int)
+IMAGE_NORMALIZE_WEBP = config("IMAGE_NORMALIZE_WEBP", default=False, cast=bool)
+
+# Trending #tags (images/tags.py): uses lose half their weight every
+# TAG_TRENDING_HALF_LIFE seconds; Redis keeps the top TAG_TRENDING_SIZE tags
+TAG_TRENDING_HALF_LIFE = config("TAG_TRENDING_HALF_LIFE", default=6 * 60 * 60, cast=int)
+TAG_TRENDING_SIZE = config("TAG_TRENDING_SIZE", default=1000, cast=int)
+TAG_TRENDING_CACHE_TIMEOUT = config("TAG_TRENDING_CACHE_TIMEOUT", default=60, cast=int)
+
+# Max Hamming distance between perceptual hashes for images to count as near duplicates
+IMAGE_NEAR_DUPLICATE_DISTANCE = config("IMAGE_NEAR_DUPLICATE_DISTANCE", default=6, cast=int)
+
+# Cached per-user dashboard data (accounts/dashboard.py), invalidated by follows,
+# actions and uploads. Also how long the view counts it shows may lag
+DASHBOARD_SNAPSHOT_TIMEOUT = config("DASHBOARD_SNAPSHOT_TIMEOUT", default=5 * 60, cast=int)
 
 
 # Customizing user profile URLs
@@ -248,6 +333,52 @@ INTERNAL_IPS = [
 # Redis settings
 REDIS_URL = config("REDISCLOUD_URL", default="redis://localhost:6379/0")
 
+# Sessions. SESSION_STORE picks where they live:
+# - "cached_db" (default): read from the "sessions" cache and written through to
+#   the django_session table, which still serves them while Redis is down.
+# - "cache": Redis only, so an evicted or flushed session logs its user out.
+# - "db": the django_session table, read on every request.
+# Session keys expire with their session, so a volatile-lru maxmemory-policy on
+# SESSION_REDIS_URL evicts them before keys without a TTL. In development the
+# "sessions" cache is in memory and culls beyond SESSION_CACHE_MAX_ENTRIES.
+# Expired rows are deleted with `python manage.py clearsessions`.
+SESSION_STORE = config("SESSION_STORE", default="cached_db")
+SESSION_ENGINE = {
+    "cached_db": "accounts.sessions",
+    "cache": "django.contrib.sessions.backends.cache",
+    "db": "django.contrib.sessions.backends.db",
+}[SESSION_STORE]
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_COOKIE_AGE = config("SESSION_COOKIE_AGE", default=60 * 60 * 24 * 14, cast=int)
+SESSION_REDIS_URL = config("SESSION_REDIS_URL", default=REDIS_URL)
+SESSION_CACHE_MAX_ENTRIES = config("SESSION_CACHE_MAX_ENTRIES", default=10000, cast=int)
+
+# Django cache: per-process memory in development, shared Redis in production
+if DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "sessions": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "sessions",
+            "OPTIONS": {"MAX_ENTRIES": SESSION_CACHE_MAX_ENTRIES},
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "social_app",
+        },
+        "sessions": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": SESSION_REDIS_URL,
+            "KEY_PREFIX": "social_app",
+        },
+    }
+
 # Django Messages - Tailwind styling
 MESSAGE_TAGS = {
     message_constants.DEBUG: 'bg-gray-600 text-white',
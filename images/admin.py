@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Image
+from . import search
+from .models import Image, ImageBlob, Tag
 
 
 @admin.register(Image)
@@ -11,3 +12,23 @@ class ImageAdmin(admin.ModelAdmin):
     filter_horizontal = ("users_like",)
     ordering = ("-created",)
     readonly_fields = ("created",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans where there is one.
+        ids = search.matching_ids(search_term)
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=ids), False
+
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "file", "size", "ref_count", "created")
+    search_fields = ("sha256",)
+    readonly_fields = ("sha256", "file", "size", "ref_count", "created")
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    search_fields = ("name",)
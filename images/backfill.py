@@ -0,0 +1,63 @@
+"""
+Shared driver of the backfill_* commands. Originals are read from storage in a
+thread pool (I/O bound), a value is computed from each file's bytes in a
+process pool (CPU bound), and the results are saved with bulk_update one batch
+at a time. Models are not imported here, so worker processes can unpickle the
+compute function without setting up Django.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from itertools import islice
+
+from .originals import read_original
+
+
+def read_stored_file(name):
+    try:
+        return read_original(name)
+    except Exception:
+        return None
+
+
+def compute_from_bytes(compute, data):
+    """Runs in a worker process; None for missing files or ones `compute` cannot decode."""
+    if data is None:
+        return None
+    try:
+        return compute(BytesIO(data))
+    except Exception:
+        return None
+
+
+def add_arguments(parser):
+    parser.add_argument("--processes", type=int, default=None, help="Defaults to the CPU count.")
+    parser.add_argument("--io-workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=200)
+
+
+def backfill_images(images, compute, apply, fields, batch_size=200, processes=None, io_workers=8):
+    """
+    Run `compute(file)` on the original of each image in the `images` queryset
+    and save the results. `compute` must be a module-level function (it is
+    pickled into the process pool); `apply(image, value)` sets the model
+    `fields` from a value. Yields (images updated, number failed) per batch,
+    after the batch is saved.
+    """
+    images = images.exclude(image="").only("id", "image").order_by("id").iterator(chunk_size=batch_size)
+    compute_file = partial(compute_from_bytes, compute)
+    with (
+        ThreadPoolExecutor(max_workers=io_workers) as io_pool,
+        ProcessPoolExecutor(max_workers=processes) as cpu_pool,
+    ):
+        while batch := list(islice(images, batch_size)):
+            contents = io_pool.map(read_stored_file, [image.image.name for image in batch])
+            updated = []
+            for image, value in zip(batch, cpu_pool.map(compute_file, contents)):
+                if value is not None:
+                    apply(image, value)
+                    updated.append(image)
+            if updated:
+                type(updated[0]).objects.bulk_update(updated, fields)
+            yield updated, len(batch) - len(updated)
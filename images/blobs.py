@@ -0,0 +1,89 @@
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from easy_thumbnails.files import get_thumbnailer
+
+from .models import ImageBlob
+from .originals import discard_original
+from .thumbnails import invalidate_thumbnails
+
+
+def blob_name(sha256, extension):
+    """Storage path for a blob, fanned out by hash prefix to keep listings small."""
+    return f"images/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+
+def hash_file(file, chunk_size=64 * 1024):
+    """Return the SHA-256 hex digest of a Django File, reading it in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks(chunk_size):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def store_blob(file, sha256, extension, size=None):
+    """
+    Return the ImageBlob for this content, uploading `file` only if no image with
+    the same hash has been stored before.
+    """
+    blob = ImageBlob.objects.filter(sha256=sha256).first()
+    if blob:
+        return blob
+    name = save_blob_file(file, sha256, extension)
+    return create_blob(sha256, name, file.size if size is None else size)
+
+
+def save_blob_file(file, sha256, extension):
+    """Upload blob content to storage unless it is already there. Touches no database rows."""
+    name = blob_name(sha256, extension)
+    # The name is derived from the content, so an existing object is identical.
+    if not default_storage.exists(name):
+        file.seek(0)
+        name = default_storage.save(name, file)
+    return name
+
+
+def create_blob(sha256, name, size):
+    try:
+        with transaction.atomic():
+            return ImageBlob.objects.create(sha256=sha256, file=name, size=size)
+    except IntegrityError:
+        # Another request stored the same content concurrently.
+        return ImageBlob.objects.get(sha256=sha256)
+
+
+def acquire_blob(blob_id, count=1):
+    """Record `count` more Images referencing the blob."""
+    ImageBlob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") + count)
+
+
+def release_blob(blob_id):
+    """
+    Drop one reference to the blob. When the last image is gone, delete the blob
+    row, its stored file and every thumbnail generated from it.
+    """
+    with transaction.atomic():
+        ImageBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1
+        )
+        blob = (
+            ImageBlob.objects.select_for_update()
+            .filter(pk=blob_id, ref_count=0)
+            .first()
+        )
+        if blob is None:
+            return
+        thumbnailer = get_thumbnailer(blob.file)
+        blob.delete()
+        transaction.on_commit(lambda: delete_stored_file(thumbnailer))
+
+
+def delete_stored_file(thumbnailer):
+    """Remove a source file and its thumbnails from storage."""
+    thumbnailer.delete_thumbnails()
+    thumbnailer.storage.delete(thumbnailer.name)
+    invalidate_thumbnails(thumbnailer.name, "images.Image.image")
+    discard_original(thumbnailer.name)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.dateformat import format as format_date
+from django.utils.safestring import mark_safe
+from django.utils.timezone import localtime
+
+from . import thumbnails
+
+CARD_TEMPLATE = "includes/image_card.html"
+# Bump when image_card.html changes so cached cards are re-rendered.
+CARD_TEMPLATE_VERSION = 1
+
+
+def card_version(image):
+    """
+    Version of an image's card: a digest of everything the card shows. Editing
+    the image, a like (total_likes) or its view count moving into another
+    IMAGE_CARD_VIEW_BUCKET produces a new version, so cards never need to be
+    invalidated and a page finds all of its cards in one get_many.
+    """
+    views = getattr(image, "views", 0) or 0
+    parts = (
+        CARD_TEMPLATE_VERSION,
+        image.title,
+        image.slug,
+        image.image.name,
+        image.placeholder,
+        # Focal points change the thumbnail names.
+        image.focal_x,
+        image.focal_y,
+        image.total_likes,
+        views // settings.IMAGE_CARD_VIEW_BUCKET,
+        image.created.isoformat(),
+    )
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def card_cache_key(image):
+    return f"image_card:{image.pk}:{card_version(image)}"
+
+
+def liked_image_ids(user, images):
+    if user is None or not user.is_authenticated or not images:
+        return []
+    return sorted(user.images_liked.filter(id__in=[image.pk for image in images]).values_list("id", flat=True))
+
+
+def render_cards(images, user=None):
+    """
+    Render the cards of a page of images. Cards are shared by all users and
+    cached per image version; only the ones missing from the cache are
+    rendered, and only those whose thumbnails are all generated are stored, so
+    a placeholder is never cached. The user's likes follow as a JSON blob that
+    likes.js applies to the cards.
+    """
+    images = list(images)
+    keys = [card_cache_key(image) for image in images]
+    try:
+        cards = cache.get_many(keys)
+    except Exception:
+        # The cache is an optimisation; render everything.
+        cards = {}
+
+    missing = [(key, image) for key, image in zip(keys, images) if key not in cards]
+    if missing:
+        # Resolve every variant of the missing cards in one batch; the render
+        # below is then answered from the in-process thumbnail cache.
+        requests, owners = [], []
+        for index, (_, image) in enumerate(missing):
+            if image.image:
+                for variant in thumbnails.alias_variants(image.image, "card"):
+                    requests.append((image.image, variant))
+                    owners.append(index)
+        complete = [bool(image.image) for _, image in missing]
+        for index, info in zip(owners, thumbnails.lookup_variants(requests)):
+            if info is None:
+                complete[index] = False
+
+        rendered = {}
+        for (key, image), is_complete in zip(missing, complete):
+            cards[key] = render_to_string(CARD_TEMPLATE, {"image": image})
+            if is_complete:
+                rendered[key] = cards[key]
+        if rendered:
+            try:
+                cache.set_many(rendered, settings.IMAGE_CARD_CACHE_TIMEOUT)
+            except Exception:
+                pass
+
+    liked = json.dumps(liked_image_ids(user, images))
+    return mark_safe(
+        f'<script type="application/json" data-liked-images>{liked}</script>'
+        + "".join(cards[key] for key in keys)
+    )
+
+
+def card_records(images, user=None):
+    """
+    Minimal JSON records for the image feed; the client renders them with the
+    <template> in includes/image_card_template.html.
+    """
+    images = list(images)
+    requests = [
+        (image.image, variant)
+        for image in images
+        if image.image
+        for variant in thumbnails.alias_variants(image.image, "card")
+    ]
+    thumbnails.lookup_variants(requests)
+    liked = set(liked_image_ids(user, images))
+    records = []
+    for image in images:
+        picture = thumbnails.picture_sources(image.image, "card")
+        fallback = picture["fallback"]
+        records.append(
+            {
+                "id": image.pk,
+                "title": image.title,
+                "url": image.get_absolute_url(),
+                "thumbnail": {
+                    "url": fallback.url,
+                    "width": fallback.width,
+                    "height": fallback.height,
+                    "srcset": picture["srcset"],
+                    "sources": picture["sources"],
+                }
+                if fallback
+                else None,
+                "placeholder": image.placeholder,
+                "likes": image.total_likes,
+                "views": getattr(image, "views", 0) or 0,
+                "liked": image.pk in liked,
+                "created": format_date(localtime(image.created), "M d, Y"),
+            }
+        )
+    return records
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import threading
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .filecache import DiskCache, record_cache_read
+
+# Leading bytes of the image formats we accept, mapped to (extension, mime type).
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ("jpg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+    (b"GIF87a", ("gif", "image/gif")),
+    (b"GIF89a", ("gif", "image/gif")),
+)
+
+# Enough bytes to recognise every signature above (and RIFF/WEBP).
+SNIFF_BYTES = 12
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+class ImageDownloadError(Exception):
+    """Raised when a remote image cannot be downloaded or is rejected."""
+
+
+class DownloadedImage:
+    """A remote image spooled to a temporary file, plus what we learned about it."""
+
+    def __init__(self, file, size, sha256, extension, content_type):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self.extension = extension
+        self.content_type = content_type
+
+    def as_file(self, name):
+        """Wrap the spooled data in a Django File that storages can stream from."""
+        self.file.seek(0)
+        django_file = File(self.file, name=name)
+        django_file.size = self.size
+        return django_file
+
+    def close(self):
+        self.file.close()
+
+
+def sniff_image_type(header):
+    """
+    Return (extension, mime type) for the image format starting with `header`,
+    or None if the bytes don't look like an image we accept.
+    """
+    for signature, image_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ("webp", "image/webp")
+    return None
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide requests.Session. Its connection pools are reused
+    across bookmarks, so repeat fetches from the same host skip DNS, TCP and TLS
+    setup. pool_block caps concurrent connections per host.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retries = Retry(
+                    total=settings.IMAGE_DOWNLOAD_RETRIES,
+                    backoff_factor=0.3,
+                    status_forcelist=(429, 502, 503, 504),
+                    allowed_methods=("GET",),
+                    respect_retry_after_header=True,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=32,
+                    pool_maxsize=settings.IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST,
+                    pool_block=True,
+                    max_retries=retries,
+                )
+                session = requests.Session()
+                session.headers.update(DOWNLOAD_HEADERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+class DownloadCache(DiskCache):
+    """
+    Small on-disk HTTP cache for remote images. A response carrying an ETag or
+    Last-Modified header is kept as `<url hash>.json` metadata pointing at a
+    `<content sha256>.body` file, and the next fetch of the same URL becomes a
+    conditional GET. Only bodies count towards `max_bytes` and are evicted; a
+    body never changes once written, so metadata never points at the wrong one.
+    """
+
+    suffix = ".body"
+
+    @classmethod
+    def from_settings(cls):
+        if not settings.IMAGE_DOWNLOAD_CACHE_DIR:
+            return None
+        return cls(settings.IMAGE_DOWNLOAD_CACHE_DIR, settings.IMAGE_DOWNLOAD_CACHE_MAX_BYTES)
+
+    def _meta_path(self, url):
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def _body_path(self, sha256):
+        return self.path(sha256)
+
+    def lookup(self, url):
+        """Return the stored metadata for `url`, or None."""
+        try:
+            return json.loads(self._meta_path(url).read_text())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def validators(meta):
+        """Request headers that turn the next fetch into a conditional GET."""
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def open(self, meta):
+        """Open the cached body as a DownloadedImage, or None if it was evicted."""
+        f = self.open_entry(self._body_path(meta["sha256"]))
+        if f is None:
+            return None
+        return DownloadedImage(
+            f, meta["size"], meta["sha256"], meta["extension"], meta["content_type"]
+        )
+
+    def store(self, url, headers, downloaded):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not (etag or last_modified) or downloaded.size > self.max_bytes:
+            return
+        body_path = self._body_path(downloaded.sha256)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": downloaded.size,
+            "sha256": downloaded.sha256,
+            "extension": downloaded.extension,
+            "content_type": downloaded.content_type,
+        }
+        try:
+            if not body_path.exists():
+                downloaded.file.seek(0)
+                self.write(body_path, downloaded.file)
+            self.write(self._meta_path(url), BytesIO(json.dumps(meta).encode()))
+            self.evict()
+        except OSError:
+            # The cache is an optimisation; a full or read-only disk must not fail the bookmark.
+            pass
+        finally:
+            downloaded.file.seek(0)
+
+
+def download_image(url, max_bytes=None, chunk_size=None, timeout=10):
+    """
+    Stream a remote image into a spooled temporary file.
+
+    The body is read `chunk_size` bytes at a time, so at most one chunk is held in
+    memory before the spool rolls over to disk. The download is aborted as soon as
+    the first bytes are not a known image signature or the body grows past
+    `max_bytes`. A SHA-256 digest is computed while streaming.
+
+    Requests go through the shared session. If the URL is in the download cache
+    the request is conditional, and a 304 is served from the cached body.
+    """
+    max_bytes = max_bytes or settings.IMAGE_DOWNLOAD_MAX_BYTES
+    chunk_size = chunk_size or settings.IMAGE_DOWNLOAD_CHUNK_SIZE
+    cache = DownloadCache.from_settings()
+    cached = cache.lookup(url) if cache else None
+
+    headers = DownloadCache.validators(cached) if cached else {}
+    response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        if response.status_code == 304 and cached:
+            downloaded = cache.open(cached)
+            if downloaded is not None:
+                record_cache_read("downloads", True, downloaded.size)
+                return downloaded
+            # The body was evicted between lookup and open; fetch it unconditionally.
+            response.close()
+            response = get_session().get(url, timeout=timeout, stream=True)
+
+        downloaded = _stream_response(response, max_bytes, chunk_size)
+    finally:
+        response.close()
+
+    record_cache_read("downloads", False, downloaded.size)
+    if cache:
+        cache.store(url, response.headers, downloaded)
+    return downloaded
+
+
+def _stream_response(response, max_bytes, chunk_size):
+    if response.status_code != 200:
+        raise ImageDownloadError(
+            f"Unable to download image. Server returned status {response.status_code}."
+        )
+
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ImageDownloadError("Image is too large to download.")
+
+    spool = SpooledTemporaryFile(max_size=chunk_size)
+    digest = hashlib.sha256()
+    size = 0
+    image_type = None
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            if image_type is None:
+                # Sniff the magic number on the first chunk before buffering anything.
+                image_type = sniff_image_type(chunk[:SNIFF_BYTES])
+                if image_type is None:
+                    raise ImageDownloadError("The URL does not point to a supported image.")
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageDownloadError("Image is too large to download.")
+            digest.update(chunk)
+            spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+
+    if image_type is None:
+        spool.close()
+        raise ImageDownloadError("The URL returned an empty response.")
+
+    spool.seek(0)
+    extension, content_type = image_type
+    return DownloadedImage(spool, size, digest.hexdigest(), extension, content_type)
@@ -0,0 +1,111 @@
+"""
+Size-capped local disk caches (the download cache in images/downloads.py and
+the originals cache in images/originals.py) and their hit/miss counters.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import redis
+from django.conf import settings
+
+r = redis.from_url(settings.REDIS_URL)
+
+
+class DiskCache:
+    """
+    A directory of entries named `<key><suffix>`. Files are copied to a
+    temporary name and renamed into place, and readers keep the file open, so
+    concurrent processes never see a partial entry and eviction by another
+    process does not break a read in progress. The least recently used entries
+    are evicted once they add up to more than `max_bytes`.
+    """
+
+    suffix = ""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return self.directory / f"{key}{self.suffix}"
+
+    def open_entry(self, path):
+        """Open the entry at `path` for reading, or return None if it is not cached."""
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        # Touch the entry so eviction treats it as recently used.
+        os.utime(path)
+        return f
+
+    def write(self, path, source, keep_open=False):
+        """
+        Copy the file object `source` to `path`. With `keep_open` the entry is
+        returned opened for reading; it is opened before the rename, so a
+        concurrent eviction cannot remove it first. Raises OSError.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = tempfile.NamedTemporaryFile(dir=self.directory, delete=False)
+        f = None
+        try:
+            with tmp:
+                shutil.copyfileobj(source, tmp)
+            if keep_open:
+                f = open(tmp.name, "rb")
+            os.replace(tmp.name, path)
+        except OSError:
+            if f is not None:
+                f.close()
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+        return f
+
+    def evict(self, keep=None):
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # Open readers keep their copy; the next read just fetches it again.
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+STAT_KEYS = ["cache_hits", "cache_misses", "bytes_saved", "bytes_downloaded"]
+
+
+def record_cache_read(prefix, cache_hit, size):
+    """Count cache hits/misses and bytes not re-downloaded under `prefix`, in Redis."""
+    try:
+        pipeline = r.pipeline()
+        if cache_hit:
+            pipeline.incr(f"{prefix}:cache_hits")
+            pipeline.incrby(f"{prefix}:bytes_saved", size)
+        else:
+            pipeline.incr(f"{prefix}:cache_misses")
+            pipeline.incrby(f"{prefix}:bytes_downloaded", size)
+        pipeline.execute()
+    except Exception:
+        # Metrics are best effort if Redis is unavailable
+        pass
+
+
+def get_cache_stats(prefix):
+    """Return the counters recorded by record_cache_read() under `prefix`."""
+    try:
+        values = r.mget([f"{prefix}:{key}" for key in STAT_KEYS])
+    except Exception:
+        values = [None] * len(STAT_KEYS)
+    return {key: int(value) if value else 0 for key, value in zip(STAT_KEYS, values)}
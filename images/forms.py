@@ -1,9 +1,15 @@
 import requests
 from django import forms
-from django.core.files.base import ContentFile
 from django.utils.text import slugify
+from PIL import Image as PILImage
 
+from .blobs import store_blob
+from .downloads import ImageDownloadError, download_image
+from .focal import focal_point
 from .models import Image
+from .phash import dhash, find_near_duplicates, set_phash
+from .placeholders import placeholder_data_uri
+from .processing import normalize_image
 
 
 class ImageCreateForm(forms.ModelForm):
@@ -48,42 +54,58 @@ class ImageCreateForm(forms.ModelForm):
         
         name = slugify(image.title)
 
+        downloaded = None
+        source = sha256 = None
         if image_file:
-            # If file is uploaded, save it directly
-            image.image = image_file
+            # If file is uploaded, normalize and store it directly. Assembled
+            # chunked uploads arrive already hashed.
+            source, sha256 = image_file, getattr(image_file, "sha256", None)
         elif image_url:
-            # If URL is provided, download it
+            # If URL is provided, stream it to a temporary file
             try:
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
-                response = requests.get(image_url, headers=headers, timeout=10)
-                if response.status_code != 200:
-                    raise forms.ValidationError(
-                        f"Unable to download image. Server returned status {response.status_code}."
-                    )
-                
-                # Determine extension from content-type or URL
-                content_type = response.headers.get("Content-Type", "")
-                extension = "jpg" # Default
-                if "image/jpeg" in content_type:
-                    extension = "jpg"
-                elif "image/png" in content_type:
-                    extension = "png"
-                elif "." in image_url.split("/")[-1]:
-                     # Fallback to URL extension if available
-                     ext = image_url.rsplit(".", 1)[-1].lower()
-                     if ext in ["jpg", "jpeg", "png"]:
-                         extension = ext
-
-                image_name = f"{name}.{extension}"
-                image.image.save(image_name, ContentFile(response.content), save=False)
+                downloaded = download_image(image_url)
+            except ImageDownloadError as e:
+                raise forms.ValidationError(str(e))
             except requests.exceptions.Timeout:
                 raise forms.ValidationError(
                     "Image download timed out. URL may be slow or invalid."
                 )
             except requests.exceptions.RequestException as e:
                 raise forms.ValidationError(f"Error downloading image: {str(e)}")
+            source, sha256 = downloaded.file, downloaded.sha256
+
+        if source is not None:
+            normalized = None
+            try:
+                try:
+                    normalized = normalize_image(source, sha256=sha256)
+                except (OSError, SyntaxError, ValueError, PILImage.DecompressionBombError):
+                    raise forms.ValidationError("The file is not a valid image.")
+                set_phash(image, dhash(normalized.file))
+                image.focal_x, image.focal_y = focal_point(normalized.file)
+                image.placeholder = placeholder_data_uri(normalized.file)
+                # Images with the same content share the stored file and its thumbnails.
+                image.blob = store_blob(
+                    normalized.as_file(f"{name}.{normalized.extension}"),
+                    normalized.sha256,
+                    normalized.extension,
+                    size=normalized.size,
+                )
+                image.image = image.blob.file.name
+                image.width = normalized.width
+                image.height = normalized.height
+                image.mime_type = normalized.content_type
+                image.byte_size = normalized.size
+            finally:
+                if downloaded:
+                    downloaded.close()
+                if normalized is not None and normalized.file is not image_file:
+                    normalized.close()
+
+        # Resized or recompressed copies of already bookmarked images, for the view to flag.
+        self.near_duplicates = []
+        if image.phash is not None:
+            self.near_duplicates = find_near_duplicates(image.phash, exclude_id=image.id)
 
         if commit:
             image.save()
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from images import backfill
+from images.focal import focal_point
+from images.models import Image
+from images.thumbnails import image_job, invalidate_thumbnails, queue_thumbnails
+from pages.conditional import bump_versions
+
+
+def set_focal_point(image, point):
+    image.focal_x, image.focal_y = point
+
+
+class Command(BaseCommand):
+    help = "Compute focal points for images that do not have one yet and queue their thumbnails."
+
+    def add_arguments(self, parser):
+        backfill.add_arguments(parser)
+        parser.add_argument("--all", action="store_true", help="Recompute focal points that are already set.")
+
+    def handle(self, *args, **options):
+        images = Image.objects.all()
+        if not options["all"]:
+            images = images.filter(focal_x__isnull=True)
+        computed = failed = 0
+        for updated, batch_failed in backfill.backfill_images(
+            images,
+            focal_point,
+            set_focal_point,
+            ["focal_x", "focal_y"],
+            batch_size=options["batch_size"],
+            processes=options["processes"],
+            io_workers=options["io_workers"],
+        ):
+            # Cached smart-cropped thumbnails are replaced by focal point crops.
+            for image in updated:
+                invalidate_thumbnails(image.image.name, "images.Image.image")
+            queue_thumbnails([image_job(image.pk) for image in updated], inline_fallback=False)
+            computed += len(updated)
+            failed += batch_failed
+            self.stdout.write(f"Computed {computed} focal points...")
+
+        if computed:
+            # bulk_update sends no signals, and cards change with the focal point.
+            bump_versions("images")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{computed} focal points computed, {failed} failed. Thumbnails were queued "
+                "for thumbnail_worker."
+            )
+        )
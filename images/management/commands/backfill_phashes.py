@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from images import backfill
+from images.models import Image
+from images.phash import PHASH_FIELDS, dhash, set_phash
+
+
+class Command(BaseCommand):
+    help = "Compute perceptual hashes for images that do not have one yet."
+
+    def add_arguments(self, parser):
+        backfill.add_arguments(parser)
+
+    def handle(self, *args, **options):
+        hashed = failed = 0
+        for updated, batch_failed in backfill.backfill_images(
+            Image.objects.filter(phash__isnull=True),
+            dhash,
+            set_phash,
+            PHASH_FIELDS,
+            batch_size=options["batch_size"],
+            processes=options["processes"],
+            io_workers=options["io_workers"],
+        ):
+            hashed += len(updated)
+            failed += batch_failed
+            self.stdout.write(f"Hashed {hashed} images...")
+
+        self.stdout.write(self.style.SUCCESS(f"{hashed} images hashed, {failed} failed."))
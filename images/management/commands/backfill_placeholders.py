@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from images import backfill
+from images.models import Image
+from images.placeholders import placeholder_data_uri
+from pages.conditional import bump_versions
+
+
+def set_placeholder(image, value):
+    image.placeholder = value
+
+
+class Command(BaseCommand):
+    help = "Compute inline placeholder previews for images that do not have one yet."
+
+    def add_arguments(self, parser):
+        backfill.add_arguments(parser)
+
+    def handle(self, *args, **options):
+        computed = failed = 0
+        for updated, batch_failed in backfill.backfill_images(
+            Image.objects.filter(placeholder=""),
+            placeholder_data_uri,
+            set_placeholder,
+            ["placeholder"],
+            batch_size=options["batch_size"],
+            processes=options["processes"],
+            io_workers=options["io_workers"],
+        ):
+            computed += len(updated)
+            failed += batch_failed
+            self.stdout.write(f"Computed {computed} placeholders...")
+
+        if computed:
+            # bulk_update sends no signals; cards show the new previews.
+            bump_versions("images")
+
+        self.stdout.write(self.style.SUCCESS(f"{computed} placeholders computed, {failed} failed."))
@@ -0,0 +1,38 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from images.models import Image
+from images.tags import sync_tags
+from pages.conditional import bump_versions
+
+
+class Command(BaseCommand):
+    help = "Parse #tags out of the descriptions of existing images into ImageTag rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        images = (
+            Image.objects.filter(description__contains="#")
+            .only("id", "description", "created")
+            .order_by("id")
+            .iterator(chunk_size=options["batch_size"])
+        )
+        processed = tagged = 0
+        while batch := list(islice(images, options["batch_size"])):
+            with transaction.atomic():
+                for image in batch:
+                    # Old uses would only distort the trending scores.
+                    if sync_tags(image, trending=False):
+                        tagged += 1
+            processed += len(batch)
+            self.stdout.write(f"Processed {processed} images...")
+
+        if tagged:
+            # Tag pages list the new ImageTag rows.
+            bump_versions("images")
+
+        self.stdout.write(self.style.SUCCESS(f"{tagged} of {processed} images have tags."))
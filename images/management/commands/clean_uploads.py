@@ -0,0 +1,70 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from images.models import ChunkedUpload
+from images.uploads import UPLOAD_PREFIX, delete_chunks
+
+
+class Command(BaseCommand):
+    help = "Remove chunked uploads that were abandoned before being used, and their stored chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=None,
+            help="Seconds since the last chunk. Defaults to IMAGE_UPLOAD_STALE_AFTER.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed.")
+
+    def handle(self, *args, **options):
+        older_than = options["older_than"]
+        if older_than is None:
+            older_than = settings.IMAGE_UPLOAD_STALE_AFTER
+        cutoff = timezone.now() - timedelta(seconds=older_than)
+        stale = list(ChunkedUpload.objects.filter(updated__lt=cutoff).values_list("id", flat=True))
+
+        # Chunk directories whose row is already gone, e.g. after a crash mid-cleanup.
+        # Rows are created before their first chunk, so a listed directory without
+        # one is never an upload in progress.
+        try:
+            directories, _ = default_storage.listdir(UPLOAD_PREFIX)
+        except FileNotFoundError:
+            directories = []
+        live = {
+            str(upload_id)
+            for upload_id in ChunkedUpload.objects.filter(
+                id__in=[name for name in directories if _is_uuid(name)]
+            ).values_list("id", flat=True)
+        }
+        orphaned = [name for name in directories if name not in live]
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Would remove {len(stale)} stale uploads and {len(orphaned)} orphaned chunk directories."
+            )
+            return
+
+        for upload_id in stale:
+            delete_chunks(upload_id)
+        ChunkedUpload.objects.filter(id__in=stale).delete()
+        for name in orphaned:
+            delete_chunks(name)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {len(stale)} stale uploads and {len(orphaned)} orphaned chunk directories."
+            )
+        )
+
+
+def _is_uuid(name):
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from easy_thumbnails.files import get_thumbnailer
+
+from images.blobs import acquire_blob, delete_stored_file, hash_file, store_blob
+from images.downloads import SNIFF_BYTES, sniff_image_type
+from images.models import Image, ImageBlob
+
+
+def inspect_stored_image(name):
+    """Hash a stored original and detect its type. Runs in a worker thread."""
+    try:
+        with default_storage.open(name) as f:
+            image_type = sniff_image_type(f.read(SNIFF_BYTES))
+            f.seek(0)
+            sha256 = hash_file(f)
+            size = f.size
+    except Exception as e:
+        return name, None, None, None, e
+    extension = image_type[0] if image_type else name.rsplit(".", 1)[-1].lower()
+    return name, sha256, extension, size, None
+
+
+class Command(BaseCommand):
+    help = "Move existing images into content-addressed blobs so identical files are stored once."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many duplicates and bytes would be reclaimed.",
+        )
+        parser.add_argument(
+            "--keep-originals",
+            action="store_true",
+            help="Do not delete the old files after they have been moved into blobs.",
+        )
+
+    def handle(self, *args, **options):
+        images = (
+            Image.objects.filter(blob__isnull=True)
+            .exclude(image="")
+            .only("id", "image")
+            .order_by("id")
+            .iterator(chunk_size=options["batch_size"])
+        )
+        seen = set()
+        processed = duplicates = reclaimed = failed = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while batch := list(islice(images, options["batch_size"])):
+                results = pool.map(inspect_stored_image, [image.image.name for image in batch])
+                obsolete = []
+                for image, (name, sha256, extension, size, error) in zip(batch, results):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"Skipping image {image.id} ({name}): {error}")
+                        continue
+                    processed += 1
+                    exists = sha256 in seen or ImageBlob.objects.filter(sha256=sha256).exists()
+                    if exists:
+                        duplicates += 1
+                        reclaimed += size
+                    seen.add(sha256)
+                    if options["dry_run"]:
+                        continue
+
+                    with default_storage.open(name) as f:
+                        blob = store_blob(f, sha256, extension, size=size)
+                    Image.objects.filter(pk=image.pk).update(blob=blob, image=blob.file.name)
+                    acquire_blob(blob.pk)
+                    if name != blob.file.name and not options["keep_originals"]:
+                        obsolete.append(get_thumbnailer(image.image))
+
+                list(pool.map(delete_stored_file, obsolete))
+                self.stdout.write(f"Processed {processed} images...")
+
+        verb = "Would reclaim" if options["dry_run"] else "Reclaimed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{processed} images hashed, {duplicates} duplicates, {failed} failed. "
+                f"{verb} {reclaimed} bytes."
+            )
+        )
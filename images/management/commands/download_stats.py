@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from images.filecache import get_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show remote image download and local originals cache hits and bytes saved."
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats("downloads")
+        requests_total = stats["cache_hits"] + stats["cache_misses"]
+        hit_rate = stats["cache_hits"] / requests_total if requests_total else 0
+        self.stdout.write(f"Cache hits:       {stats['cache_hits']}")
+        self.stdout.write(f"Cache misses:     {stats['cache_misses']}")
+        self.stdout.write(f"Hit rate:         {hit_rate:.1%}")
+        self.stdout.write(f"Bytes saved:      {stats['bytes_saved']}")
+        self.stdout.write(f"Bytes downloaded: {stats['bytes_downloaded']}")
+
+        stats = get_cache_stats("originals")
+        reads_total = stats["cache_hits"] + stats["cache_misses"]
+        hit_rate = stats["cache_hits"] / reads_total if reads_total else 0
+        self.stdout.write("")
+        self.stdout.write("Originals cache (thumbnailing and backfills):")
+        self.stdout.write(f"Cache hits:       {stats['cache_hits']}")
+        self.stdout.write(f"Cache misses:     {stats['cache_misses']}")
+        self.stdout.write(f"Hit rate:         {hit_rate:.1%}")
+        self.stdout.write(f"Bytes saved:      {stats['bytes_saved']}")
+        self.stdout.write(f"Bytes downloaded: {stats['bytes_downloaded']}")
@@ -0,0 +1,174 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from easy_thumbnails.models import Source, Thumbnail
+from easy_thumbnails.storage import thumbnail_default_storage
+
+from images.models import ImageBlob
+from images.thumbnails import SOURCES, thumbnail_names
+
+# Derivative names produced by easy_thumbnails' default namer:
+# <source name>.<width>x<height>_q<quality>[_<options>].<extension>
+THUMBNAIL_NAME_RE = re.compile(r"\.\d+x\d+_q\d+[^/]*\.[a-z0-9]+$")
+
+
+def walk_storage(storage, path):
+    """Yield every file name below `path`, one directory listing at a time."""
+    try:
+        directories, files = storage.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for name in files:
+        yield f"{path}/{name}" if path else name
+    for directory in directories:
+        yield from walk_storage(storage, f"{path}/{directory}" if path else directory)
+
+
+def keyset_pages(queryset, size):
+    """
+    Yield lists of up to `size` rows ordered by id, one query per page, so rows
+    can be deleted between pages without holding a cursor open.
+    """
+    last_id = 0
+    while page := list(queryset.filter(id__gt=last_id).order_by("id")[:size]):
+        yield page
+        last_id = page[-1].id
+
+
+def stored_size(name):
+    try:
+        return thumbnail_default_storage.size(name)
+    except Exception:
+        return 0
+
+
+def delete_stored(name):
+    try:
+        thumbnail_default_storage.delete(name)
+    except Exception:
+        pass
+
+
+def stored_before(name, moment):
+    """Whether the file was last written before `moment`; False if that is unknown."""
+    try:
+        return thumbnail_default_storage.get_modified_time(name) < moment
+    except Exception:
+        return False
+
+
+def live_sources(names):
+    """
+    Of the source file `names`, return (those still in use, the thumbnail names
+    expected for them). Only these names are looked up, so memory stays
+    proportional to one page.
+    """
+    names = set(names)
+    live = set(ImageBlob.objects.filter(file__in=names).values_list("file", flat=True))
+    expected = set()
+    for model_label, field_name in SOURCES.values():
+        model = apps.get_model(model_label)
+        for instance in model.objects.filter(**{f"{field_name}__in": names}).only("pk", field_name):
+            fieldfile = getattr(instance, field_name)
+            live.add(fieldfile.name)
+            expected.update(thumbnail_names(fieldfile))
+    return live, expected
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete thumbnails whose source is gone or that no active alias produces, "
+        "from both the easy_thumbnails tables and storage. Sources are swept a page "
+        "at a time, and thumbnails written after the run started are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=16, help="Threads for storage calls.")
+        parser.add_argument(
+            "--prefix",
+            action="append",
+            help="Storage directory to scan for unrecorded thumbnails (repeatable). "
+            "Defaults to the upload directories of images and profile photos.",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.batch_size = options["batch_size"]
+        self.deleted_count = self.deleted_bytes = 0
+        # Anything written after this, e.g. for an image uploaded during the run, is kept.
+        self.started = timezone.now()
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as self.pool:
+            self.sweep_sources()
+            prefixes = options["prefix"] or self.upload_prefixes()
+            for prefix in prefixes:
+                self.sweep_listing(prefix)
+
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {self.deleted_count} thumbnails, "
+                f"{self.deleted_bytes / 1024 / 1024:.1f} MB reclaimed."
+            )
+        )
+
+    def upload_prefixes(self):
+        prefixes = []
+        for model_label, field_name in SOURCES.values():
+            upload_to = apps.get_model(model_label)._meta.get_field(field_name).upload_to
+            prefixes.append(upload_to.split("/")[0])
+        return prefixes
+
+    def sweep_sources(self):
+        """
+        Walk the source rows a page at a time. Thumbnails of sources no longer in
+        use, or that no alias produces, are deleted, then the dead source rows.
+        """
+        for sources in keyset_pages(Source.objects.only("id", "name", "modified"), self.batch_size):
+            live, expected = live_sources(source.name for source in sources)
+            rows = Thumbnail.objects.filter(
+                source__in=sources, modified__lt=self.started
+            ).select_related("source").only("id", "name", "source__name")
+            orphans = [row for row in rows if row.source.name not in live or row.name not in expected]
+            if orphans:
+                self.delete_batch([row.name for row in orphans])
+                if not self.dry_run:
+                    Thumbnail.objects.filter(id__in=[row.id for row in orphans]).delete()
+            stale = [
+                source.id for source in sources
+                if source.name not in live and source.modified < self.started
+            ]
+            if stale and not self.dry_run:
+                Source.objects.filter(id__in=stale).delete()
+
+    def sweep_listing(self, prefix):
+        """
+        Find thumbnail files in storage that no row tracks (e.g. from a lost
+        database) and that are not expected for a live source.
+        """
+        names = (name for name in walk_storage(thumbnail_default_storage, prefix) if THUMBNAIL_NAME_RE.search(name))
+        while page := list(islice(names, self.batch_size)):
+            tracked = set(Thumbnail.objects.filter(name__in=page).values_list("name", flat=True))
+            untracked = [name for name in page if name not in tracked]
+            _, expected = live_sources(name[: THUMBNAIL_NAME_RE.search(name).start()] for name in untracked)
+            candidates = [name for name in untracked if name not in expected]
+            old = list(self.pool.map(stored_before, candidates, [self.started] * len(candidates)))
+            orphans = [name for name, is_old in zip(candidates, old) if is_old]
+            if orphans:
+                self.delete_batch(orphans)
+
+    def delete_batch(self, names):
+        sizes = list(self.pool.map(stored_size, names))
+        if not self.dry_run:
+            list(self.pool.map(delete_stored, names))
+        self.deleted_count += len(names)
+        self.deleted_bytes += sum(sizes)
+        self.stdout.write(
+            f"{'Found' if self.dry_run else 'Deleted'} {self.deleted_count} orphaned thumbnails so far..."
+        )
@@ -0,0 +1,228 @@
+import csv
+import hashlib
+import json
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from actions.utils import create_action
+from images.blobs import acquire_blob, create_blob, save_blob_file
+from images.downloads import download_image
+from images.focal import focal_point
+from images.models import Image, ImageBlob
+from images.phash import dhash, phash_fields
+from images.placeholders import placeholder_data_uri
+from images.processing import normalize_image
+from images.search import index_images
+from images.tags import sync_tags
+from images.thumbnails import image_job, queue_thumbnails
+from pages.conditional import bump_versions
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+def read_records(source):
+    """
+    Yield dicts with `url` or `path`, plus optional `title` and `description`,
+    from a CSV file, a JSONL file or a directory of images.
+    """
+    source = Path(source)
+    if source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                yield {"path": str(path), "title": path.stem.replace("-", " ").replace("_", " ")}
+    elif source.suffix.lower() == ".jsonl":
+        with open(source) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(source, newline="") as f:
+            yield from csv.DictReader(f)
+
+
+def fetch_record(record):
+    """Read a record's bytes from disk or the network. Runs in a worker thread."""
+    try:
+        if record.get("url"):
+            downloaded = download_image(record["url"])
+            try:
+                return downloaded.file.read(), downloaded.sha256, None
+            finally:
+                downloaded.close()
+        with open(record["path"], "rb") as f:
+            data = f.read()
+        return data, hashlib.sha256(data).hexdigest(), None
+    except Exception as e:
+        return None, None, e
+
+
+def init_worker():
+    django.setup()
+
+
+def prepare_image(data, sha256):
+    """Decode, normalize and hash an image. Runs in a worker process."""
+    if data is None:
+        return None
+    try:
+        normalized = normalize_image(BytesIO(data), sha256=sha256)
+        content = normalized.file.read()
+        normalized.file.seek(0)
+        return {
+            "content": content,
+            "sha256": normalized.sha256,
+            "extension": normalized.extension,
+            "content_type": normalized.content_type,
+            "width": normalized.width,
+            "height": normalized.height,
+            "size": normalized.size,
+            "phash": dhash(normalized.file),
+            "focal": focal_point(normalized.file),
+            "placeholder": placeholder_data_uri(normalized.file),
+        }
+    except Exception as e:
+        return {"error": e}
+
+
+def upload_blob_file(prepared):
+    """Upload a prepared image to blob storage. Runs in a worker thread."""
+    return save_blob_file(ContentFile(prepared["content"]), prepared["sha256"], prepared["extension"])
+
+
+class Command(BaseCommand):
+    help = "Bulk import images from a CSV file, a JSONL file or a directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="CSV or JSONL file with url/path,title,description, or a directory.")
+        parser.add_argument("--user", required=True, help="Username that will own the imported images.")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--io-workers", type=int, default=16)
+        parser.add_argument("--processes", type=int, default=None, help="Defaults to the CPU count.")
+        parser.add_argument(
+            "--state-file",
+            help="Where progress is recorded for --resume. Defaults to <source>.import-state.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip records that a previous run already committed.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+
+        state_file = Path(options["state_file"] or f"{options['source'].rstrip('/')}.import-state")
+        start = 0
+        if options["resume"] and state_file.exists():
+            start = int(state_file.read_text() or 0)
+            self.stdout.write(f"Resuming after {start} records.")
+
+        records = islice(read_records(options["source"]), start, None)
+        position = start
+        imported = failed = total_bytes = 0
+        started = time.monotonic()
+
+        with (
+            ThreadPoolExecutor(max_workers=options["io_workers"]) as io_pool,
+            ProcessPoolExecutor(max_workers=options["processes"], initializer=init_worker) as cpu_pool,
+        ):
+            while batch := list(islice(records, options["batch_size"])):
+                fetched = list(io_pool.map(fetch_record, batch))
+                prepared = list(
+                    cpu_pool.map(prepare_image, [data for data, _, _ in fetched], [sha for _, sha, _ in fetched])
+                )
+
+                ready = []
+                for index, (record, (_, _, error), result) in enumerate(zip(batch, fetched, prepared)):
+                    error = error or (result or {}).get("error")
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"Record {position + index + 1} failed: {error}")
+                        continue
+                    ready.append((record, result))
+
+                # Only content we have not stored before is uploaded; blob rows are
+                # written from this thread so workers never hold database connections.
+                blobs = ImageBlob.objects.in_bulk(
+                    {result["sha256"] for _, result in ready}, field_name="sha256"
+                )
+                missing = {
+                    result["sha256"]: result for _, result in ready if result["sha256"] not in blobs
+                }
+                names = io_pool.map(upload_blob_file, missing.values())
+                for result, name in zip(missing.values(), names):
+                    blobs[result["sha256"]] = create_blob(result["sha256"], name, result["size"])
+
+                images = []
+                for record, result in ready:
+                    blob = blobs[result["sha256"]]
+                    title = (record.get("title") or Path(record.get("url") or record.get("path")).stem)[:255]
+                    images.append(
+                        Image(
+                            user=user,
+                            title=title,
+                            slug=slugify(title),
+                            description=record.get("description") or "",
+                            url=record.get("url") or "",
+                            image=blob.file.name,
+                            blob=blob,
+                            **phash_fields(result["phash"]),
+                            focal_x=result["focal"][0],
+                            focal_y=result["focal"][1],
+                            placeholder=result["placeholder"],
+                            width=result["width"],
+                            height=result["height"],
+                            mime_type=result["content_type"],
+                            byte_size=result["size"],
+                        )
+                    )
+                    total_bytes += result["size"]
+
+                with transaction.atomic():
+                    # bulk_create skips post_save, so reference counts, the search
+                    # index and tags are updated here.
+                    created = Image.objects.bulk_create(images)
+                    for blob_id, count in Counter(image.blob_id for image in created).items():
+                        acquire_blob(blob_id, count)
+                    index_images(created)
+                    for image in created:
+                        if image.description:
+                            sync_tags(image)
+                    if created:
+                        create_action(user, f"bookmarked {len(created)} images", created[0])
+                queue_thumbnails([image_job(image.pk) for image in created])
+                if created:
+                    # bulk_create sends no post_save, so pages listing images are told here.
+                    bump_versions("images")
+
+                imported += len(created)
+                position += len(batch)
+                state_file.write_text(str(position))
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{position} records read, {imported} imported, {failed} failed "
+                    f"({imported / elapsed:.1f} images/s)"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} images ({total_bytes / 1024 / 1024:.1f} MB) in {elapsed:.1f}s, "
+                f"{imported / elapsed if elapsed else 0:.1f} images/s. {failed} failed."
+            )
+        )
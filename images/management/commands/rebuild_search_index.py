@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from images import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index of images (images/search.py) from the images table."
+
+    def handle(self, *args, **options):
+        if search.backend() is None:
+            self.stdout.write(self.style.WARNING("This database has no search index; search uses icontains."))
+            return
+        with transaction.atomic():
+            indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"{indexed} images indexed."))
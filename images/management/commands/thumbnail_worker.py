@@ -0,0 +1,84 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts.models import Profile
+from images.models import Image
+from images.thumbnails import (
+    finish_thumbnail_batch,
+    generate_thumbnails,
+    image_job,
+    pop_thumbnail_batch,
+    queue_thumbnails,
+    recover_thumbnail_jobs,
+)
+
+
+def init_worker():
+    django.setup()
+
+
+def generate(job):
+    """Runs in a worker process; one bad original must not stop the batch."""
+    try:
+        return job, generate_thumbnails(job), None
+    except Exception as e:
+        return job, 0, e
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail aliases and their variants for queued images and avatars using a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=None, help="Defaults to the CPU count.")
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Queue every image and profile photo first, e.g. after adding or changing an alias.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for more work.",
+        )
+
+    def handle(self, *args, **options):
+        recovered = recover_thumbnail_jobs()
+        if recovered:
+            self.stdout.write(f"Requeued {recovered} jobs of an interrupted worker.")
+        if options["all"]:
+            image_ids = Image.objects.exclude(image="").values_list("id", flat=True).order_by("id")
+            profile_ids = Profile.objects.exclude(photo="").values_list("id", flat=True).order_by("id")
+            queue_thumbnails(
+                [image_job(image_id) for image_id in image_ids.iterator(chunk_size=1000)]
+                + [f"profile:{profile_id}" for profile_id in profile_ids.iterator(chunk_size=1000)],
+                inline_fallback=False,
+            )
+            self.stdout.write(f"Queued {image_ids.count()} images and {profile_ids.count()} profile photos.")
+
+        # Forked workers must not inherit the parent's open database connections.
+        connections.close_all()
+        generated = failed = 0
+        with ProcessPoolExecutor(max_workers=options["processes"], initializer=init_worker) as pool:
+            while True:
+                batch = pop_thumbnail_batch(options["batch_size"])
+                if not batch:
+                    if options["once"]:
+                        break
+                    continue
+                try:
+                    for job, count, error in pool.map(generate, batch):
+                        if error:
+                            failed += 1
+                            self.stderr.write(f"{job} failed: {error}")
+                        else:
+                            generated += count
+                finally:
+                    # Also when the pool breaks: the next render requeues what is missing.
+                    finish_thumbnail_batch(batch)
+                self.stdout.write(f"{generated} thumbnails generated, {failed} sources failed.")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {generated} thumbnails, {failed} failures."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0009_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='focal_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='focal_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
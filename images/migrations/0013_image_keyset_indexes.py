@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0012_chunkedupload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='image',
+            name='images_imag_created_d57897_idx',
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['-created', '-id'], name='images_imag_created_2f5292_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['user', '-created', '-id'], name='images_imag_user_id_a31810_idx'),
+        ),
+    ]
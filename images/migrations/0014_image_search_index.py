@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import migrations
+
+# Full-text index of images (images/search.py). Only SQLite (FTS5) and
+# PostgreSQL (tsvector + GIN) get one; other databases fall back to icontains.
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE images_image_fts USING fts5(
+    title, username, description, tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+SQLITE_FILL = """
+INSERT INTO images_image_fts (rowid, title, username, description)
+SELECT i.id, i.title, u.username, i.description
+FROM images_image i JOIN {users} u ON u.id = i.user_id
+"""
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE images_image_search (
+        image_id bigint PRIMARY KEY REFERENCES images_image (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX images_image_search_document_idx ON images_image_search USING gin (document)",
+]
+POSTGRES_FILL = """
+INSERT INTO images_image_search (image_id, document)
+SELECT i.id, setweight(to_tsvector('simple', i.title), 'A')
+    || setweight(to_tsvector('simple', u.username), 'B')
+    || setweight(to_tsvector('simple', i.description), 'C')
+FROM images_image i JOIN {users} u ON u.id = i.user_id
+"""
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    users = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    if vendor == "sqlite":
+        statements = [SQLITE_CREATE, SQLITE_FILL.format(users=users)]
+    elif vendor == "postgresql":
+        statements = POSTGRES_CREATE + [POSTGRES_FILL.format(users=users)]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS images_image_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP TABLE IF EXISTS images_image_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0013_image_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
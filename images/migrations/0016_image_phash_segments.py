@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:29
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def split_hashes(apps, schema_editor):
+    # Bitwise AND on the signed hash keeps the same low bits as on the unsigned one.
+    Image = apps.get_model("images", "Image")
+    phash = F("phash")
+    Image.objects.filter(phash__isnull=False).update(
+        phash_0=phash.bitand(0xFFFF),
+        phash_1=phash.bitrightshift(16).bitand(0xFFFF),
+        phash_2=phash.bitrightshift(32).bitand(0xFFFF),
+        phash_3=phash.bitrightshift(48).bitand(0xFFFF),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0015_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='phash_0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='phash_1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='phash_2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='phash_3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(split_hashes, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,27 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
 
 
+class ImageBlob(models.Model):
+    """
+    A stored original, addressed by the SHA-256 of its content. Every Image with
+    the same content points at the same blob, so the file and its thumbnails are
+    stored once. ref_count tracks how many images still use it.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.ImageField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class Image(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -16,10 +34,36 @@ class Image(models.Model):
         settings.AUTH_USER_MODEL, related_name="images_liked", blank=True
     )
     total_likes = models.PositiveIntegerField(default=0)
+    blob = models.ForeignKey(
+        ImageBlob,
+        related_name="images",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    # 64-bit difference hash (stored signed) used to spot near-duplicate images.
+    phash = models.BigIntegerField(null=True, blank=True, db_index=True)
+    # The hash's four 16-bit segments, lowest bits first (images/phash.py).
+    phash_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    # Recorded at ingest so templates can size images without opening the file.
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    mime_type = models.CharField(max_length=50, blank=True)
+    byte_size = models.PositiveBigIntegerField(null=True, blank=True)
+    # Most salient point as fractions of width/height; smart-cropped aliases crop around it.
+    focal_x = models.FloatField(null=True, blank=True)
+    focal_y = models.FloatField(null=True, blank=True)
+    # Tiny inline preview (WebP data URI) painted while the thumbnail loads.
+    placeholder = models.TextField(blank=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=["-created"]),
+            # Keyset pagination walks (created, id); see images/pagination.py.
+            models.Index(fields=["-created", "-id"]),
+            models.Index(fields=["user", "-created", "-id"]),
             models.Index(fields=['-total_likes'])
         ]
         ordering = ["-created"]
@@ -34,3 +78,57 @@ class Image(models.Model):
         if not self.slug:
             self.slug = slugify(self.title)
         super().save(*args, **kwargs)
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload in progress. Chunks are stored as separate objects under
+    uploads/<id>/ until the form that uses the upload is submitted; `offset` is
+    the number of bytes received so far.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["updated"])]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def complete(self):
+        return self.offset == self.size
+
+
+class Tag(models.Model):
+    """A #hashtag, stored lowercased without the '#'."""
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+    def get_absolute_url(self):
+        return reverse("images:tag", args=[self.name])
+
+
+class ImageTag(models.Model):
+    """
+    A tag used in an image's description. `created` copies the image's, so a
+    tag's images are listed newest first straight from the (tag, -created)
+    index without joining or scanning images.
+    """
+    tag = models.ForeignKey(Tag, related_name="image_tags", on_delete=models.CASCADE)
+    image = models.ForeignKey(Image, related_name="image_tags", on_delete=models.CASCADE)
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["tag", "image"], name="unique_image_tag")]
+        indexes = [models.Index(fields=["tag", "-created", "-id"])]
+
+    def __str__(self):
+        return f"{self.tag} on {self.image}"
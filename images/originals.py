@@ -0,0 +1,103 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from easy_thumbnails.source_generators import pil_image
+
+from .filecache import DiskCache, record_cache_read
+
+
+class OriginalsCache(DiskCache):
+    """
+    Local read-through disk cache of original images kept in the default storage
+    (Azure in production), so thumbnailing and image analysis don't download the
+    same original again for every size or backfill. Entries are keyed by storage
+    name and have to be dropped when the file is deleted, or replaced under the
+    same name (profile photos on overwriting storages). Image originals are
+    content-addressed blobs, so their entries never go stale otherwise.
+    """
+
+    suffix = ".original"
+
+    @classmethod
+    def from_settings(cls):
+        if not settings.IMAGE_ORIGINALS_CACHE_DIR:
+            return None
+        return cls(settings.IMAGE_ORIGINALS_CACHE_DIR, settings.IMAGE_ORIGINALS_CACHE_MAX_BYTES)
+
+    def _path(self, name):
+        return self.path(hashlib.sha256(name.encode()).hexdigest())
+
+    def open(self, name, storage=None):
+        """
+        Return a File with the contents of `name`, read from local disk if it is
+        cached and copied there from `storage` otherwise.
+        """
+        storage = storage or default_storage
+        path = self._path(name)
+        f = self.open_entry(path)
+        if f is not None:
+            record_cache_read("originals", True, os.fstat(f.fileno()).st_size)
+            return File(f, name=name)
+
+        with storage.open(name, "rb") as source:
+            try:
+                f = self.write(path, source, keep_open=True)
+            except OSError:
+                # The cache is an optimisation; a full or read-only disk must not fail the read.
+                source.seek(0)
+                data = source.read()
+                record_cache_read("originals", False, len(data))
+                return File(_spool(data), name=name)
+        record_cache_read("originals", False, os.fstat(f.fileno()).st_size)
+        self.evict(keep=path)
+        return File(f, name=name)
+
+    def read(self, name, storage=None):
+        with self.open(name, storage) as f:
+            return f.read()
+
+    def discard(self, name):
+        self._path(name).unlink(missing_ok=True)
+
+
+def _spool(data):
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.IMAGE_DOWNLOAD_CHUNK_SIZE)
+    spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+def open_original(name, storage=None):
+    """Open a stored original through the local cache, if one is configured."""
+    cache = OriginalsCache.from_settings()
+    if cache is None:
+        return (storage or default_storage).open(name, "rb")
+    return cache.open(name, storage)
+
+
+def read_original(name, storage=None):
+    with open_original(name, storage) as f:
+        return f.read()
+
+
+def discard_original(name):
+    cache = OriginalsCache.from_settings()
+    if cache is not None:
+        cache.discard(name)
+
+
+def cached_pil_image(source, **options):
+    """
+    easy_thumbnails source generator (THUMBNAIL_SOURCE_GENERATORS) that decodes
+    the original from the local cache instead of reading it from the storage.
+    """
+    name = getattr(source, "name", None)
+    storage = getattr(source, "source_storage", None)
+    if not source or not name or storage is None:
+        return pil_image(source, **options)
+    with open_original(name, storage) as f:
+        return pil_image(f, **options)
@@ -0,0 +1,72 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(Exception):
+    """Raised for a cursor token that was not produced by encode_cursor()."""
+
+
+def encode_cursor(position):
+    """Opaque, URL-safe token for a position in a listing."""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+
+class KeysetPage:
+    """A page of a keyset-paginated listing; iterate it like a Paginator page."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def paginate(queryset, cursor, per_page):
+    """
+    Return the KeysetPage of `queryset`, newest first, that starts after
+    `cursor` (None for the first page).
+
+    Rows are ordered by (created, id) and a page continues with a
+    `(created, id) < (last created, last id)` filter instead of an OFFSET, so
+    every page costs the same index range scan and no COUNT(*) is run. One
+    extra row is fetched to tell whether another page follows. Raises
+    InvalidCursor for a malformed cursor.
+    """
+    queryset = queryset.order_by("-created", "-id")
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            created = parse_datetime(position["created"])
+            last_id = int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if created is None:
+            raise InvalidCursor(cursor)
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=last_id))
+    items = list(queryset[: per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor({"created": last.created.isoformat(), "id": last.pk})
+    return KeysetPage(items, next_cursor)
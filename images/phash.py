@@ -0,0 +1,95 @@
+from itertools import combinations
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from PIL import Image as PILImage
+
+HASH_BITS = 64
+UNSIGNED_MASK = (1 << HASH_BITS) - 1
+# Near-duplicate lookups go through four indexed 16-bit slices of the hash
+# (Image.phash_0 .. phash_3); see find_near_duplicates().
+SEGMENTS = 4
+SEGMENT_BITS = HASH_BITS // SEGMENTS
+SEGMENT_MASK = (1 << SEGMENT_BITS) - 1
+SEGMENT_FIELDS = [f"phash_{i}" for i in range(SEGMENTS)]
+PHASH_FIELDS = ["phash", *SEGMENT_FIELDS]
+
+
+def dhash(file, hash_size=8):
+    """
+    Compute a 64-bit difference hash: shrink to (hash_size+1) x hash_size greyscale
+    and record whether each pixel is brighter than its right neighbour. Resized or
+    recompressed copies of an image end up a few bits apart.
+    """
+    with PILImage.open(file) as img:
+        # Let the JPEG decoder downscale while decoding; we only need a thumbnail.
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize(
+            (hash_size + 1, hash_size), PILImage.Resampling.LANCZOS
+        )
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return to_signed(value)
+
+
+def to_signed(value):
+    """Map an unsigned 64-bit hash onto the range of a BigIntegerField."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def hamming(a, b):
+    return ((a ^ b) & UNSIGNED_MASK).bit_count()
+
+
+def hash_segments(value):
+    """Split a hash into SEGMENTS unsigned 16-bit pieces, lowest bits first."""
+    unsigned = value & UNSIGNED_MASK
+    return [(unsigned >> (SEGMENT_BITS * i)) & SEGMENT_MASK for i in range(SEGMENTS)]
+
+
+def phash_fields(value):
+    """Image field values for the hash `value`: the hash and its indexed segments."""
+    segments = hash_segments(value) if value is not None else [None] * SEGMENTS
+    return {"phash": value, **dict(zip(SEGMENT_FIELDS, segments))}
+
+
+def set_phash(image, value):
+    for field, field_value in phash_fields(value).items():
+        setattr(image, field, field_value)
+
+
+def segment_variants(segment, radius):
+    """All 16-bit values within `radius` bits of `segment`."""
+    variants = []
+    for distance in range(radius + 1):
+        for bits in combinations(range(SEGMENT_BITS), distance):
+            variants.append(segment ^ sum(1 << bit for bit in bits))
+    return variants
+
+
+def find_near_duplicates(value, limit=5, exclude_id=None, radius=None):
+    """
+    Return up to `limit` existing images within `radius` bits of the hash
+    `value`, nearest first. Two hashes that differ in at most `radius` bits
+    differ in at most radius // SEGMENTS bits in one of their segments, so the
+    database looks up candidates through the segment indexes and only those are
+    compared bit for bit.
+    """
+    from .models import Image
+
+    if radius is None:
+        radius = settings.IMAGE_NEAR_DUPLICATE_DISTANCE
+    segment_radius = radius // SEGMENTS
+    candidates = Q()
+    for field, segment in zip(SEGMENT_FIELDS, hash_segments(value)):
+        candidates |= Q(**{f"{field}__in": segment_variants(segment, segment_radius)})
+    rows = Image.objects.filter(candidates).exclude(id=exclude_id).values_list("id", "phash")
+    matches = sorted(
+        (distance, image_id)
+        for image_id, phash in rows
+        if (distance := hamming(value, phash)) <= radius
+    )[:limit]
+    images = Image.objects.in_bulk([image_id for _, image_id in matches])
+    return [images[image_id] for _, image_id in matches if image_id in images]
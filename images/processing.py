@@ -0,0 +1,121 @@
+import hashlib
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from .downloads import DownloadedImage
+
+# Pillow format name -> (extension, mime type) for formats we store as-is.
+STORED_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "GIF": ("gif", "image/gif"),
+    "WEBP": ("webp", "image/webp"),
+}
+
+EXIF_ORIENTATION = 0x0112
+
+
+class NormalizedImage(DownloadedImage):
+    """An image ready for storage, with the dimensions recorded on Image."""
+
+    def __init__(self, file, size, sha256, extension, content_type, width, height):
+        super().__init__(file, size, sha256, extension, content_type)
+        self.width = width
+        self.height = height
+
+
+def normalize_image(file, sha256=None):
+    """
+    Prepare an uploaded or downloaded original for storage.
+
+    The image is rotated according to its EXIF orientation, downscaled to fit
+    IMAGE_MAX_DIMENSION and re-encoded without EXIF/XMP metadata. With
+    IMAGE_NORMALIZE_WEBP it is also transcoded to WebP. Originals that need none of
+    this are kept byte for byte, so they are not recompressed. Animated images are
+    also kept as they are.
+
+    `sha256` is the digest of `file` if the caller already has it. Raises the
+    usual Pillow errors (OSError, DecompressionBombError) for files that cannot
+    be decoded.
+    """
+    max_dimension = settings.IMAGE_MAX_DIMENSION
+    file.seek(0)
+    img = PILImage.open(file)
+    img.load()
+    source_format = img.format
+    width, height = img.size
+
+    needs_reencode = (
+        settings.IMAGE_NORMALIZE_WEBP
+        or source_format not in STORED_FORMATS
+        or max(width, height) > max_dimension
+        or EXIF_ORIENTATION in img.getexif()
+        or "exif" in img.info
+        or "xmp" in img.info
+    )
+    if getattr(img, "is_animated", False) and source_format in STORED_FORMATS:
+        needs_reencode = False
+
+    if not needs_reencode:
+        extension, content_type = STORED_FORMATS[source_format]
+        file.seek(0)
+        size = file.size if hasattr(file, "size") else _file_size(file)
+        if sha256 is None:
+            sha256 = _hash(file)
+        return NormalizedImage(file, size, sha256, extension, content_type, width, height)
+
+    img = ImageOps.exif_transpose(img)
+    if max(img.size) > max_dimension:
+        img.thumbnail((max_dimension, max_dimension), PILImage.Resampling.LANCZOS)
+
+    has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+    if settings.IMAGE_NORMALIZE_WEBP:
+        output_format = "WEBP"
+    elif source_format in ("JPEG", "PNG", "WEBP"):
+        output_format = source_format
+    else:
+        output_format = "PNG" if has_alpha else "JPEG"
+
+    if output_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif output_format in ("PNG", "WEBP") and img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+    save_kwargs = {"format": output_format}
+    if output_format in ("JPEG", "WEBP"):
+        save_kwargs["quality"] = settings.IMAGE_NORMALIZE_QUALITY
+    if output_format == "JPEG":
+        save_kwargs["optimize"] = True
+    if output_format == "PNG":
+        save_kwargs["optimize"] = True
+    # Keep the colour profile; every other piece of metadata is dropped.
+    if img.info.get("icc_profile"):
+        save_kwargs["icc_profile"] = img.info["icc_profile"]
+
+    output = SpooledTemporaryFile(max_size=settings.IMAGE_DOWNLOAD_CHUNK_SIZE)
+    img.save(output, **save_kwargs)
+    size = output.tell()
+    output.seek(0)
+    extension, content_type = STORED_FORMATS[output_format]
+    return NormalizedImage(
+        output, size, _hash(output), extension, content_type, img.width, img.height
+    )
+
+
+def _hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _file_size(file):
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(0)
+    return size
@@ -0,0 +1,212 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Image
+from .pagination import InvalidCursor, KeysetPage, decode_cursor, encode_cursor
+from .pagination import paginate as paginate_by_date
+
+# The index is created by migration 0014 for the database in use: an FTS5 table
+# on SQLite, a tsvector table with a GIN index on PostgreSQL. Rows are kept in
+# sync by images/signals.py; rebuild_search_index recreates them.
+FTS_TABLE = "images_image_fts"
+TSV_TABLE = "images_image_search"
+# The 'simple' configuration does not stem, so prefixes match like FTS5's.
+TS_CONFIG = "simple"
+# Relative weight of matches in the title, the username and the description.
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+MAX_TERMS = 8
+
+SEARCH_FIELDS = frozenset({"title", "description", "user", "user_id"})
+
+
+def backend():
+    """'sqlite' or 'postgresql' when the database has a search index, else None."""
+    return connection.vendor if connection.vendor in ("sqlite", "postgresql") else None
+
+
+def query_terms(query):
+    """Words of a search query; each is matched as a prefix."""
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def _match_expression(terms):
+    if backend() == "sqlite":
+        return " ".join(f'"{term}"*' for term in terms)
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _document(image):
+    return image.title, image.user.get_username(), image.description
+
+
+def index_image(image):
+    """Add or replace the index entry of an image."""
+    index_images([image])
+
+
+def index_images(images):
+    """
+    Add or replace the index entries of several images, one statement batch
+    each, e.g. for rows created with bulk_create (which sends no post_save).
+    """
+    vendor = backend()
+    documents = [(image.pk, *_document(image)) for image in images]
+    if vendor is None or not documents:
+        return
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[pk] for pk, *_ in documents])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, username, description) VALUES (%s, %s, %s, %s)",
+                documents,
+            )
+        else:
+            cursor.executemany(
+                f"""
+                INSERT INTO {TSV_TABLE} (image_id, document)
+                VALUES (%s, setweight(to_tsvector(%s, %s), 'A')
+                    || setweight(to_tsvector(%s, %s), 'B')
+                    || setweight(to_tsvector(%s, %s), 'C'))
+                ON CONFLICT (image_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                [
+                    [pk, TS_CONFIG, title, TS_CONFIG, username, TS_CONFIG, description]
+                    for pk, title, username, description in documents
+                ],
+            )
+
+
+def unindex_image(image_id):
+    vendor = backend()
+    if vendor is None:
+        return
+    table, column = (FTS_TABLE, "rowid") if vendor == "sqlite" else (TSV_TABLE, "image_id")
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = %s", [image_id])
+
+
+def _index_from_table(cursor, vendor, user_id=None):
+    # Index entries built in SQL from the images table, for every image or
+    # those of one user. Existing entries must be removed first on SQLite.
+    images = Image._meta.db_table
+    users = get_user_model()._meta.db_table
+    where, params = ("WHERE i.user_id = %s", [user_id]) if user_id is not None else ("", [])
+    if vendor == "sqlite":
+        cursor.execute(
+            f"""
+            INSERT INTO {FTS_TABLE} (rowid, title, username, description)
+            SELECT i.id, i.title, u.username, i.description
+            FROM {images} i JOIN {users} u ON u.id = i.user_id {where}
+            """,
+            params,
+        )
+    else:
+        cursor.execute(
+            f"""
+            INSERT INTO {TSV_TABLE} (image_id, document)
+            SELECT i.id, setweight(to_tsvector(%s, i.title), 'A')
+                || setweight(to_tsvector(%s, u.username), 'B')
+                || setweight(to_tsvector(%s, i.description), 'C')
+            FROM {images} i JOIN {users} u ON u.id = i.user_id {where}
+            ON CONFLICT (image_id) DO UPDATE SET document = EXCLUDED.document
+            """,
+            [TS_CONFIG] * 3 + params,
+        )
+    return cursor.rowcount
+
+
+def rebuild_index():
+    """Recreate every index entry from the images table; returns the number indexed."""
+    vendor = backend()
+    if vendor is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}" if vendor == "sqlite" else f"TRUNCATE {TSV_TABLE}")
+        return _index_from_table(cursor, vendor)
+
+
+def reindex_user_images(user_id):
+    """Rebuild the entries of a user's images, e.g. after a username change."""
+    vendor = backend()
+    if vendor is None:
+        return 0
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM {Image._meta.db_table} WHERE user_id = %s)",
+                [user_id],
+            )
+        return _index_from_table(cursor, vendor, user_id)
+
+
+def matching_ids(query):
+    """
+    Subquery of the ids of images matching every term of `query`, for
+    `Image.objects.filter(id__in=...)`. Returns None for an empty query.
+    """
+    terms = query_terms(query)
+    if not terms or backend() is None:
+        return None
+    if backend() == "sqlite":
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    else:
+        sql = f"SELECT image_id FROM {TSV_TABLE} WHERE document @@ to_tsquery('{TS_CONFIG}', %s)"
+    return RawSQL(sql, [_match_expression(terms)])
+
+
+def _ranked_sql():
+    # Both backends yield (id, score) with higher scores ranking first. ts_rank
+    # returns a float4, which the float8 cursor score would never compare equal to.
+    if backend() == "sqlite":
+        weights = ", ".join(str(weight) for weight in SQLITE_WEIGHTS)
+        return f"SELECT rowid AS id, -bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    return (
+        f"SELECT image_id AS id, ts_rank(document, query)::float8 AS score "
+        f"FROM {TSV_TABLE}, to_tsquery('{TS_CONFIG}', %s) query WHERE document @@ query"
+    )
+
+
+def search_images(query, cursor=None, per_page=8):
+    """
+    Return the KeysetPage of images matching every word of `query` (as a
+    prefix), best match first. Pages continue after the (score, id) of the last
+    result, so a page never re-reads the rows before it. Without a search index
+    the images are filtered with icontains and listed newest first. Raises
+    InvalidCursor for a malformed cursor.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return KeysetPage([], None)
+    if backend() is None:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(user__username__icontains=term)
+        return paginate_by_date(Image.objects.filter(condition), cursor, per_page)
+
+    sql = f"SELECT id, score FROM ({_ranked_sql()}) ranked"
+    params = [_match_expression(terms)]
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            score, last_id = float(position["score"]), int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        sql += " WHERE score < %s OR (score = %s AND id > %s)"
+        params += [score, score, last_id]
+    sql += " ORDER BY score DESC, id LIMIT %s"
+    params.append(per_page + 1)
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        rows = db.fetchall()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor({"score": rows[-1][1], "id": rows[-1][0]})
+    images = Image.objects.select_related("user").in_bulk([image_id for image_id, _ in rows])
+    # An entry whose image was deleted in another transaction is skipped.
+    return KeysetPage([images[image_id] for image_id, _ in rows if image_id in images], next_cursor)
@@ -1,9 +1,66 @@
-from django.db.models.signals import m2m_changed
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
+
+from accounts.models import Profile
+
+from .blobs import acquire_blob, release_blob
 from .models import Image
+from .originals import discard_original
+from .search import SEARCH_FIELDS, index_image, reindex_user_images, unindex_image
+from .tags import sync_tags
+from .thumbnails import image_job, invalidate_thumbnails, queue_thumbnails, source_job
 
 @receiver(m2m_changed, sender=Image.users_like.through)
 def users_like_changed(sender, instance, action, **kwargs):
     instance.total_likes = instance.users_like.count()
-    instance.save()
-    
\ No newline at end of file
+    instance.save(update_fields=["total_likes"])
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & update_fields:
+        index_image(instance)
+    if update_fields is None or "description" in update_fields:
+        sync_tags(instance)
+    if created and instance.blob_id:
+        acquire_blob(instance.blob_id)
+    if created and instance.image:
+        # Generate the thumbnail aliases once the row is visible to the worker.
+        transaction.on_commit(lambda: queue_thumbnails([image_job(instance.pk)]))
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    unindex_image(instance.pk)
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+@receiver(pre_save, sender=get_user_model())
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Remember the stored username, so user_renamed() can tell a change.
+    if instance.pk and (update_fields is None or "username" in update_fields):
+        instance._stored_username = (
+            sender.objects.filter(pk=instance.pk).values_list("username", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_renamed(sender, instance, **kwargs):
+    # The username is part of every search document of the user's images.
+    stored = instance.__dict__.pop("_stored_username", None)
+    if stored is not None and stored != instance.username:
+        reindex_user_images(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    # A photo stored under an existing name (overwriting storages) would otherwise
+    # keep serving the old cached thumbnails and original.
+    if instance.photo:
+        invalidate_thumbnails(instance.photo.name, instance.photo)
+        discard_original(instance.photo.name)
+        job = source_job(instance.photo)
+        transaction.on_commit(lambda: queue_thumbnails([job]))
@@ -0,0 +1,153 @@
+import re
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from pages.conditional import bump_versions
+
+from .models import ImageTag, Tag
+from .pagination import KeysetPage, paginate
+
+r = redis.from_url(settings.REDIS_URL)
+
+# A '#' not preceded by a word character, '&' (HTML entities) or another '#',
+# followed by a word with at least one letter.
+TAG_RE = re.compile(r"(?<![\w&#])#(\w*[^\W\d_]\w*)")
+MAX_TAG_LENGTH = 50
+MAX_TAGS_PER_IMAGE = 30
+
+TRENDING_KEY = "tags:trending:{epoch}"
+TRENDING_CACHE_KEY = "tags:trending"
+# The last list served, kept without expiry to tell when the list changes.
+TRENDING_LAST_KEY = "tags:trending:last"
+# Content version (pages/conditional.py) of the trending list.
+TRENDING_VERSION = "tags:trending"
+# How many trending names are cached for trending_tags().
+TRENDING_CACHED = 50
+# Scores are kept in a sorted set per epoch of this many half-lives, so the
+# growing weights stay below 2**EPOCH_HALF_LIVES.
+EPOCH_HALF_LIVES = 16
+
+
+def extract_tags(text):
+    """Normalized (lowercased) tag names in `text`, in order of first use."""
+    names = []
+    for match in TAG_RE.finditer(text or ""):
+        name = match.group(1).lower()
+        if len(name) <= MAX_TAG_LENGTH and name not in names:
+            names.append(name)
+    return names[:MAX_TAGS_PER_IMAGE]
+
+
+def sync_tags(image, trending=True):
+    """
+    Make the image's ImageTag rows match the tags in its description. Tags used
+    for the first time on the image count towards trending once committed,
+    unless `trending` is False.
+    """
+    names = extract_tags(image.description)
+    existing = dict(image.image_tags.values_list("tag__name", "id"))
+    removed = [image_tag_id for name, image_tag_id in existing.items() if name not in names]
+    if removed:
+        ImageTag.objects.filter(id__in=removed).delete()
+    added = [name for name in names if name not in existing]
+    if added:
+        Tag.objects.bulk_create([Tag(name=name) for name in added], ignore_conflicts=True)
+        ImageTag.objects.bulk_create(
+            [ImageTag(tag=tag, image=image, created=image.created) for tag in Tag.objects.filter(name__in=added)],
+            ignore_conflicts=True,
+        )
+        if trending:
+            transaction.on_commit(lambda: record_tag_uses(added))
+    return names
+
+
+def tag_images(tag, cursor=None, per_page=8):
+    """
+    KeysetPage of the images tagged `tag`, newest first, read from the
+    (tag, -created) index of ImageTag. Raises InvalidCursor for a bad cursor.
+    """
+    page = paginate(ImageTag.objects.filter(tag=tag).select_related("image"), cursor, per_page)
+    return KeysetPage([image_tag.image for image_tag in page], page.next_cursor)
+
+
+def _epoch_length():
+    return settings.TAG_TRENDING_HALF_LIFE * EPOCH_HALF_LIVES
+
+
+def use_weight(now):
+    """
+    Forward-decay weight of a use at `now` within its epoch: it doubles every
+    half-life, so older uses count relatively less without rewriting scores.
+    """
+    epoch = int(now // _epoch_length())
+    return epoch, 2 ** ((now - epoch * _epoch_length()) / settings.TAG_TRENDING_HALF_LIFE)
+
+
+def record_tag_uses(names, now=None):
+    """Add a use of each tag to the trending scores in Redis."""
+    epoch, weight = use_weight(time.time() if now is None else now)
+    key = TRENDING_KEY.format(epoch=epoch)
+    try:
+        pipeline = r.pipeline()
+        for name in names:
+            pipeline.zincrby(key, weight, name)
+        # Keep the top tags only; the previous epoch is still read for a while.
+        pipeline.zremrangebyrank(key, 0, -settings.TAG_TRENDING_SIZE - 1)
+        pipeline.expire(key, 2 * int(_epoch_length()))
+        pipeline.execute()
+    except Exception:
+        # Trending is best effort.
+        pass
+
+
+def merge_trending(current, previous, limit):
+    """
+    Combine (name, score) pairs of the current and previous epochs into the
+    top `limit` names. Previous scores are scaled into the current epoch's
+    weights, where they are EPOCH_HALF_LIVES half-lives old.
+    """
+    scores = {}
+    for name, score in previous:
+        scores[name] = score / 2**EPOCH_HALF_LIVES
+    for name, score in current:
+        scores[name] = scores.get(name, 0) + score
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [name for name, _ in ranked[:limit]]
+
+
+def trending_tags(limit=10):
+    """The currently trending tag names; cached for TAG_TRENDING_CACHE_TIMEOUT."""
+    names = cache.get(TRENDING_CACHE_KEY)
+    if names is None:
+        epoch, _ = use_weight(time.time())
+        try:
+            pipeline = r.pipeline()
+            pipeline.zrevrange(TRENDING_KEY.format(epoch=epoch), 0, -1, withscores=True)
+            pipeline.zrevrange(TRENDING_KEY.format(epoch=epoch - 1), 0, -1, withscores=True)
+            current, previous = pipeline.execute()
+        except Exception:
+            current, previous = [], []
+        names = merge_trending(
+            [(name.decode(), score) for name, score in current],
+            [(name.decode(), score) for name, score in previous],
+            TRENDING_CACHED,
+        )
+        cache.set(TRENDING_CACHE_KEY, names, settings.TAG_TRENDING_CACHE_TIMEOUT)
+        if cache.get(TRENDING_LAST_KEY) != names:
+            cache.set(TRENDING_LAST_KEY, names, None)
+            bump_versions(TRENDING_VERSION)
+    return names[:limit]
+
+
+def trending_version():
+    """
+    Name of the version of the trending list, for conditional_page(). An
+    expired list is refreshed first, so pages answered with 304 still pick up
+    a change within TAG_TRENDING_CACHE_TIMEOUT.
+    """
+    trending_tags()
+    return TRENDING_VERSION
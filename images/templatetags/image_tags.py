@@ -0,0 +1,120 @@
+from django import template
+from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from images import cards, thumbnails
+from images.tags import MAX_TAG_LENGTH, TAG_RE
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(fieldfile, alias):
+    """
+    {% ready_thumbnail image.image "card" as im %}
+
+    Look up a thumbnail the worker has already generated. Evaluates to None
+    until it exists, so the template can render a placeholder instead.
+    """
+    return thumbnails.ready_thumbnail(fieldfile, alias)
+
+
+@register.simple_tag
+def cached_thumbnail(fieldfile, alias):
+    """
+    {% cached_thumbnail user.profile.photo "avatar_large" as im %}
+
+    Cached thumbnail lookup that generates the thumbnail if it is missing.
+    """
+    return thumbnails.cached_thumbnail(fieldfile, alias)
+
+
+def _resolve_path(obj, path):
+    for attr in path.split("."):
+        try:
+            obj = getattr(obj, attr)
+        except (AttributeError, ObjectDoesNotExist):
+            return None
+        if obj is None:
+            return None
+    return obj
+
+
+@register.simple_tag
+def prefetch_thumbnails(objects, path, alias, generate=False):
+    """
+    {% prefetch_thumbnails images "image" "card" %}
+    {% prefetch_thumbnails actions "user.profile.photo" "avatar_large" generate=True %}
+
+    Resolve the thumbnails (every responsive variant) a page is about to render
+    in one batch, so the per-object tags that follow are answered from the
+    in-process cache.
+    """
+    requests = []
+    for obj in objects:
+        fieldfile = _resolve_path(obj, path)
+        if fieldfile:
+            requests.extend(
+                (fieldfile, variant) for variant in thumbnails.alias_variants(fieldfile, alias)
+            )
+    thumbnails.lookup_variants(requests, generate=generate)
+    return ""
+
+
+@register.inclusion_tag("includes/picture.html")
+def responsive_thumbnail(
+    fieldfile, alias, sizes="100vw", alt="", classes="", generate=False, loading="lazy", placeholder=""
+):
+    """
+    {% responsive_thumbnail image.image "card" sizes="(min-width: 640px) 50vw, 100vw" alt=image.title %}
+
+    Render a <picture> with a <source> per modern format and an <img> in the
+    default format, each with a srcset of the ready widths. Falls back to a
+    placeholder until the worker has generated the thumbnail. `placeholder` is
+    an inline preview (Image.placeholder) painted behind the image while it
+    loads, and instead of the grey placeholder.
+    """
+    return {
+        **thumbnails.picture_sources(fieldfile, alias, generate=generate),
+        "sizes": sizes,
+        "alt": alt,
+        "classes": classes,
+        "loading": loading,
+        "placeholder": placeholder,
+    }
+
+
+@register.simple_tag(takes_context=True)
+def image_cards(context, images):
+    """
+    {% image_cards images %}
+
+    Render a page of image cards from the shared card cache (images/cards.py),
+    followed by the current user's liked ids for likes.js.
+    """
+    request = context.get("request")
+    return cards.render_cards(images, getattr(request, "user", None))
+
+
+@register.filter(needs_autoescape=True)
+def link_tags(text, autoescape=True):
+    """
+    {{ image.description|link_tags|linebreaks }}
+
+    Link each #tag in the text to its tag page.
+    """
+    text = conditional_escape(text) if autoescape else text
+
+    def link(match):
+        name = match.group(1).lower()
+        if len(name) > MAX_TAG_LENGTH:
+            return match.group(0)
+        return format_html(
+            '<a href="{}" class="text-blue-600 hover:underline">{}</a>',
+            reverse("images:tag", args=[name]),
+            match.group(0),
+        )
+
+    return mark_safe(TAG_RE.sub(link, text))
@@ -1,17 +1,66 @@
-from io import BytesIO
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
 from unittest.mock import MagicMock, patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from easy_thumbnails.files import get_thumbnailer
+from easy_thumbnails.models import Source, Thumbnail
+import numpy as np
 from PIL import Image as PILImage
 
 from accounts.models import Profile
 from actions.models import Action
 
+from .downloads import ImageDownloadError, download_image
+from .focal import focal_point
 from .forms import ImageCreateForm
-from .models import Image
+from .cards import card_cache_key
+from .models import ChunkedUpload, Image, ImageBlob, Tag
+from .originals import OriginalsCache, read_original
+from .pagination import InvalidCursor, encode_cursor, paginate
+from .phash import dhash, find_near_duplicates, hamming, hash_segments, phash_fields
+from .placeholders import placeholder_data_uri
+from .processing import normalize_image
+from .search import search_images
+from .tags import (
+    EPOCH_HALF_LIVES,
+    extract_tags,
+    merge_trending,
+    tag_images,
+    trending_tags,
+    trending_version,
+    use_weight,
+)
+from .thumbnails import (
+    LRUCache,
+    generate_thumbnails,
+    get_variant,
+    image_job,
+    invalidate_thumbnails,
+    local_cache,
+    lookup_thumbnails,
+    queue_thumbnails,
+    ready_thumbnail,
+    recover_thumbnail_jobs,
+    responsive_thumbnails,
+)
 
 User = get_user_model()
 
@@ -247,6 +296,1268 @@ class ImageCreateFormTests(TestCase):
         )
 
 
+class ImageDownloadTests(TestCase):
+    """Test streaming remote image downloads"""
+    
+    @staticmethod
+    def _mock_response(body, content_type='image/png', status_code=200):
+        """Helper to build a streamed response returning body in small chunks"""
+        response = MagicMock()
+        response.status_code = status_code
+        response.headers = {'Content-Type': content_type}
+        response.iter_content.side_effect = lambda chunk_size: (
+            body[i:i + chunk_size] for i in range(0, len(body), chunk_size)
+        )
+        return response
+    
+    @staticmethod
+    def _png_bytes(size=(100, 100)):
+        image_io = BytesIO()
+        PILImage.new('RGB', size, color='red').save(image_io, format='PNG')
+        return image_io.getvalue()
+    
+    @patch('images.downloads.get_session')
+    def test_download_streams_and_hashes(self, mock_session):
+        """Test download is sniffed, hashed and spooled chunk by chunk"""
+        body = self._png_bytes()
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = self._mock_response(body)
+        
+        downloaded = download_image('http://example.com/image.png', chunk_size=64)
+        self.assertEqual(downloaded.extension, 'png')
+        self.assertEqual(downloaded.size, len(body))
+        self.assertEqual(downloaded.sha256, hashlib.sha256(body).hexdigest())
+        self.assertEqual(downloaded.as_file('image.png').read(), body)
+        self.assertTrue(mock_get.call_args.kwargs['stream'])
+        downloaded.close()
+    
+    @patch('images.downloads.get_session')
+    def test_download_rejects_non_image(self, mock_session):
+        """Test download aborts when the magic number is not an image"""
+        mock_session.return_value.get.return_value = self._mock_response(b'<html>' + b'x' * 1000, 'image/png')
+        with self.assertRaises(ImageDownloadError):
+            download_image('http://example.com/image.png', chunk_size=64)
+    
+    @patch('images.downloads.get_session')
+    def test_download_aborts_over_size_limit(self, mock_session):
+        """Test download aborts once the byte limit is exceeded"""
+        body = self._png_bytes(size=(400, 400))
+        response = self._mock_response(body)
+        mock_session.return_value.get.return_value = response
+        with self.assertRaises(ImageDownloadError):
+            download_image('http://example.com/image.png', max_bytes=256, chunk_size=64)
+        response.close.assert_called_once()
+    
+    @patch('images.downloads.get_session')
+    def test_form_saves_downloaded_image(self, mock_session):
+        """Test ImageCreateForm stores the streamed download"""
+        mock_session.return_value.get.return_value = self._mock_response(self._png_bytes())
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        form = ImageCreateForm(data={
+            'title': 'Remote Image',
+            'description': '',
+            'url': 'http://example.com/image.png'
+        })
+        self.assertTrue(form.is_valid())
+        image = form.save(commit=False)
+        image.user = user
+        image.save()
+        self.assertTrue(image.image.name.endswith('.png'))
+    
+    @patch('images.downloads.get_session')
+    def test_repeat_download_uses_conditional_get(self, mock_session):
+        """Test a cached URL is revalidated with If-None-Match and served on 304"""
+        body = self._png_bytes()
+        first = self._mock_response(body)
+        first.headers['ETag'] = '"v1"'
+        not_modified = MagicMock(status_code=304, headers={})
+        mock_get = mock_session.return_value.get
+        mock_get.side_effect = [first, not_modified]
+        
+        with tempfile.TemporaryDirectory() as cache_dir, self.settings(IMAGE_DOWNLOAD_CACHE_DIR=cache_dir):
+            download_image('http://example.com/image.png').close()
+            cached = download_image('http://example.com/image.png')
+            self.assertEqual(mock_get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+            self.assertEqual(cached.sha256, hashlib.sha256(body).hexdigest())
+            self.assertEqual(cached.as_file('image.png').read(), body)
+            cached.close()
+        not_modified.iter_content.assert_not_called()
+
+
+class ImageBlobTests(TestCase):
+    """Test content-addressed storage of image originals"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+    
+    def _create_via_form(self, title, color='blue'):
+        image_io = BytesIO()
+        PILImage.new('RGB', (50, 50), color=color).save(image_io, format='PNG')
+        upload = SimpleUploadedFile('upload.png', image_io.getvalue(), content_type='image/png')
+        form = ImageCreateForm(data={'title': title, 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        image = form.save(commit=False)
+        image.user = self.user
+        image.save()
+        return image
+    
+    def test_identical_uploads_share_blob(self):
+        """Test the same content is stored once and reference counted"""
+        first = self._create_via_form('First')
+        second = self._create_via_form('Second')
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith(f'images/blobs/{first.blob.sha256[:2]}/'))
+        self.assertEqual(ImageBlob.objects.get(pk=first.blob_id).ref_count, 2)
+    
+    def test_blob_deleted_with_last_image(self):
+        """Test the blob and its file go away once no image references it"""
+        first = self._create_via_form('First', color='green')
+        second = self._create_via_form('Second', color='green')
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(ImageBlob.objects.get(pk=second.blob_id).ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+    
+    def test_deleted_blob_thumbnails_not_served(self):
+        """Test re-bookmarking deleted content does not serve the deleted thumbnails from cache"""
+        cache.clear()
+        local_cache.clear()
+        upload = SimpleUploadedFile('subject.png', FocalPointTests._subject_at_top_left().read())
+        form = ImageCreateForm(data={'title': 'Subject', 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        image = form.save(commit=False)
+        image.user = self.user
+        image.save()
+        self.assertIsNotNone(image.focal_x)
+        generate_thumbnails(image_job(image.pk))
+        self.assertIsNotNone(ready_thumbnail(image.image, 'card'))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        
+        upload = SimpleUploadedFile('subject.png', FocalPointTests._subject_at_top_left().read())
+        form = ImageCreateForm(data={'title': 'Again', 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        again = form.save(commit=False)
+        again.user = self.user
+        again.save()
+        self.assertEqual(again.image.name, image.image.name)
+        with patch('images.thumbnails.queue_thumbnails'):
+            self.assertIsNone(ready_thumbnail(again.image, 'card'))
+    
+    def test_dedupe_command_merges_existing_images(self):
+        """Test dedupe_images moves legacy files into shared blobs"""
+        content = ImageModelTests._create_image_file().read()
+        first = Image.objects.create(
+            user=self.user, title='One', image=SimpleUploadedFile('one.png', content)
+        )
+        second = Image.objects.create(
+            user=self.user, title='Two', image=SimpleUploadedFile('two.png', content)
+        )
+        call_command('dedupe_images', stdout=StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNotNone(first.blob_id)
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.blob.ref_count, 2)
+        self.assertTrue(default_storage.exists(first.image.name))
+
+
+class NearDuplicateTests(TestCase):
+    """Test perceptual hashing and near-duplicate lookups"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+    
+    @staticmethod
+    def _pattern(size=(256, 256), phase=0.0, fmt='PNG'):
+        """Helper to render a smooth pattern so resized copies hash alike"""
+        y, x = np.mgrid[0:size[1], 0:size[0]] / max(size)
+        pixels = (127 + 127 * np.sin(6 * x + phase) * np.cos(4 * y + phase)).astype('uint8')
+        image_io = BytesIO()
+        PILImage.fromarray(pixels).convert('RGB').save(image_io, format=fmt)
+        image_io.seek(0)
+        return image_io
+    
+    def _image(self, title, value):
+        """Helper to create an image with the given hash"""
+        return Image.objects.create(user=self.user, title=title, image='images/x.png', **phash_fields(value))
+    
+    def test_hash_segments(self):
+        """Test hashes split into 16-bit segments, negative (signed) ones included"""
+        self.assertEqual(hash_segments(0x0004_0003_0002_0001), [1, 2, 3, 4])
+        self.assertEqual(hash_segments(-1), [0xFFFF] * 4)
+    
+    def test_find_near_duplicates_within_radius(self):
+        """Test lookups find hashes within the radius wherever the bits differ, nearest first"""
+        base = 0x1234_5678_9ABC_DEF0
+        # Six differing bits spread so that no segment matches exactly.
+        spread = self._image('Spread', base ^ (0b11 << 0) ^ (0b11 << 16) ^ (0b1 << 32) ^ (0b1 << 48))
+        close = self._image('Close', base ^ (0b111 << 40))
+        same = self._image('Same', base)
+        self._image('Far', base ^ (0b11 << 0) ^ (0b11 << 16) ^ (0b11 << 32) ^ (0b1 << 48))
+        self.assertEqual(find_near_duplicates(base, radius=6), [same, close, spread])
+        self.assertEqual(find_near_duplicates(base, radius=6, exclude_id=same.id, limit=1), [close])
+    
+    def test_find_near_duplicates_signed_hashes(self):
+        """Test hashes stored as negative integers are found too"""
+        image = self._image('Negative', -5)
+        self.assertEqual(find_near_duplicates(-5 ^ 0b101), [image])
+    
+    def test_resized_copy_is_near_duplicate(self):
+        """Test a downscaled JPEG copy stays within the near-duplicate distance"""
+        original = dhash(self._pattern())
+        copy = dhash(self._pattern(size=(128, 128), fmt='JPEG'))
+        different = dhash(self._pattern(phase=2.0))
+        self.assertLessEqual(hamming(original, copy), 6)
+        self.assertGreater(hamming(original, different), 6)
+    
+    def test_form_reports_near_duplicates(self):
+        """Test ImageCreateForm links a resized upload to the existing image"""
+        existing = Image.objects.create(
+            user=self.user,
+            title='Original',
+            image=SimpleUploadedFile('original.png', self._pattern().read()),
+            **phash_fields(dhash(self._pattern())),
+        )
+        upload = SimpleUploadedFile('copy.jpg', self._pattern(size=(128, 128), fmt='JPEG').read())
+        form = ImageCreateForm(data={'title': 'Copy', 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        form.save(commit=False)
+        self.assertEqual(form.near_duplicates, [existing])
+    
+    def test_backfill_command(self):
+        """Test backfill_phashes fills in missing hashes"""
+        image = Image.objects.create(
+            user=self.user,
+            title='Legacy',
+            image=SimpleUploadedFile('legacy.png', self._pattern().read()),
+        )
+        call_command('backfill_phashes', processes=1, stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual(image.phash, dhash(self._pattern()))
+        self.assertEqual(
+            [image.phash_0, image.phash_1, image.phash_2, image.phash_3],
+            hash_segments(image.phash),
+        )
+
+
+class FocalPointTests(TestCase):
+    """Test focal points computed at ingest and used for cropping"""
+    
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+    
+    @staticmethod
+    def _subject_at_top_left():
+        img = PILImage.new('RGB', (400, 300), color='white')
+        img.paste(PILImage.new('RGB', (60, 60), color='red'), (40, 30))
+        image_io = BytesIO()
+        img.save(image_io, format='PNG')
+        image_io.seek(0)
+        return image_io
+    
+    def test_focal_point_finds_subject(self):
+        """Test the focal point lands on the only detailed region"""
+        x, y = focal_point(self._subject_at_top_left())
+        self.assertAlmostEqual(x, 70 / 400, delta=0.08)
+        self.assertAlmostEqual(y, 60 / 300, delta=0.08)
+    
+    def test_flat_image_uses_centre(self):
+        """Test images without any detail are cropped around the centre"""
+        x, y = focal_point(ImageModelTests._create_image_file())
+        self.assertAlmostEqual(x, 0.5, delta=0.02)
+        self.assertAlmostEqual(y, 0.5, delta=0.02)
+    
+    def test_form_stores_focal_point(self):
+        """Test the focal point is recorded when an image is bookmarked"""
+        upload = SimpleUploadedFile('subject.png', self._subject_at_top_left().read(), content_type='image/png')
+        form = ImageCreateForm(data={'title': 'Subject', 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        image = form.save(commit=False)
+        self.assertLess(image.focal_x, 0.3)
+        self.assertLess(image.focal_y, 0.3)
+    
+    def test_smart_crop_replaced_by_focal_target(self):
+        """Test smart-cropped aliases crop around the stored focal point"""
+        image = Image.objects.create(
+            user=self.user, title='Focal', image=ImageModelTests._create_image_file('focal.png', (600, 400)),
+            focal_x=0.2, focal_y=0.75,
+        )
+        options = get_variant(image.image, 'card').options
+        self.assertIs(options['crop'], True)
+        self.assertEqual(options['target'], (20, 75))
+        self.assertNotIn('target', get_variant(image.image, 'action').options)
+        generate_thumbnails(image_job(image.pk))
+        self.assertIn('target-20%2C75', ready_thumbnail(image.image, 'card').url)
+    
+    def test_backfill_command(self):
+        """Test backfill_focal_points fills in missing focal points"""
+        image = Image.objects.create(
+            user=self.user, title='Old',
+            image=SimpleUploadedFile('old.png', self._subject_at_top_left().read()),
+        )
+        with patch('images.management.commands.backfill_focal_points.queue_thumbnails') as mock_queue:
+            call_command('backfill_focal_points', '--processes', '1', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertLess(image.focal_x, 0.3)
+        mock_queue.assert_called_once_with([f'image:{image.pk}'], inline_fallback=False)
+    
+    def test_backfill_all_drops_cached_focal_crops(self):
+        """Test recomputed focal points are not served the previous point's cached crop"""
+        image = Image.objects.create(
+            user=self.user, title='Moved',
+            image=SimpleUploadedFile('moved.png', self._subject_at_top_left().read()),
+            focal_x=0.9, focal_y=0.9,
+        )
+        generate_thumbnails(image_job(image.pk))
+        self.assertIn('target-90%2C90', ready_thumbnail(image.image, 'card').url)
+        with patch('images.management.commands.backfill_focal_points.queue_thumbnails'):
+            call_command('backfill_focal_points', '--all', '--processes', '1', stdout=StringIO())
+        image.refresh_from_db()
+        with patch('images.thumbnails.queue_thumbnails'):
+            self.assertIsNone(ready_thumbnail(image.image, 'card'))
+
+
+class ThumbnailGCTests(TestCase):
+    """Test the gc_thumbnails command"""
+    
+    def setUp(self):
+        # The command scans storage, so it gets a media directory of its own.
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.live = Image.objects.create(
+            user=self.user, title='Live', image=ImageModelTests._create_image_file('live.png', (300, 300))
+        )
+        generate_thumbnails(image_job(self.live.pk))
+        self.live_card = get_thumbnailer(self.live.image).get_existing_thumbnail(get_variant(self.live.image, 'card').options)
+        # A size no alias produces any more
+        self.stale_size = get_thumbnailer(self.live.image).get_thumbnail({'size': (123, 123)})
+        # Thumbnails left behind by a deleted image
+        gone = Image.objects.create(
+            user=self.user, title='Gone', image=ImageModelTests._create_image_file('gone.png', (300, 300))
+        )
+        generate_thumbnails(image_job(gone.pk))
+        self.gone_card = ready_thumbnail(gone.image, 'card')
+        Image.objects.filter(pk=gone.pk).delete()
+        # A derivative nobody recorded
+        self.untracked = default_storage.save(f'{self.live.image.name}.64x64_q85.jpg', ContentFile(b'x' * 10))
+    
+    def _gc(self, *args):
+        out = StringIO()
+        call_command('gc_thumbnails', *args, stdout=out)
+        return out.getvalue()
+    
+    def test_dry_run_reports_without_deleting(self):
+        """Test --dry-run reports reclaimable bytes and keeps every file"""
+        output = self._gc('--dry-run')
+        self.assertIn('Would delete 12 thumbnails', output)
+        self.assertTrue(default_storage.exists(self.stale_size.name))
+        self.assertTrue(default_storage.exists(self.untracked))
+    
+    def test_deletes_orphans_only(self):
+        """Test orphaned derivatives are removed and live aliases are kept"""
+        output = self._gc()
+        self.assertIn('Deleted 12 thumbnails', output)
+        self.assertFalse(default_storage.exists(self.stale_size.name))
+        self.assertFalse(default_storage.exists(self.untracked))
+        self.assertFalse(Thumbnail.objects.filter(name=self.stale_size.name).exists())
+        self.assertFalse(Source.objects.exclude(name=self.live.image.name).exists())
+        self.assertTrue(default_storage.exists(self.live_card.name))
+        self.assertEqual(Thumbnail.objects.count(), 10)
+    
+    def test_keeps_thumbnails_written_during_the_run(self):
+        """Test rows and files newer than the run's start are not treated as orphans"""
+        later = timezone.now() + timedelta(minutes=5)
+        Thumbnail.objects.filter(name=self.stale_size.name).update(modified=later)
+        with patch(
+            'images.management.commands.gc_thumbnails.thumbnail_default_storage.get_modified_time',
+            return_value=later,
+        ):
+            output = self._gc()
+        self.assertIn('Deleted 10 thumbnails', output)
+        self.assertTrue(default_storage.exists(self.stale_size.name))
+        self.assertTrue(default_storage.exists(self.untracked))
+        self.assertEqual(Thumbnail.objects.count(), 11)
+
+
+class OriginalsCacheTests(TestCase):
+    """Test the local read-through cache of stored originals"""
+    
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        # FileSystemStorage stands in for the remote production storage.
+        self.storage = FileSystemStorage(location=media_root.name)
+        for name, size in (('a.bin', 400), ('b.bin', 400), ('c.bin', 400)):
+            self.storage.save(name, ContentFile(name.encode() * (size // 5)))
+    
+    def test_read_through_and_stats(self):
+        """Test the first read copies from storage and later reads stay local"""
+        originals = OriginalsCache(self.cache_dir, 10_000)
+        with patch.object(self.storage, 'open', wraps=self.storage.open) as storage_open, \
+                patch('images.originals.record_cache_read') as record:
+            self.assertEqual(originals.read('a.bin', self.storage), b'a.bin' * 80)
+            self.assertEqual(originals.read('a.bin', self.storage), b'a.bin' * 80)
+            self.assertEqual(originals.read('a.bin', self.storage), b'a.bin' * 80)
+        self.assertEqual(storage_open.call_count, 1)
+        self.assertEqual(
+            [c.args for c in record.call_args_list],
+            [('originals', False, 400), ('originals', True, 400), ('originals', True, 400)],
+        )
+    
+    def test_evicts_least_recently_used(self):
+        """Test the cache stays under its size limit, dropping the oldest entry"""
+        originals = OriginalsCache(self.cache_dir, 900)
+        with patch('images.originals.record_cache_read'):
+            originals.read('a.bin', self.storage)
+            originals.read('b.bin', self.storage)
+            path_a, path_b = originals._path('a.bin'), originals._path('b.bin')
+            os.utime(path_a, (1, 1))
+            os.utime(path_b, (2, 2))
+            originals.read('a.bin', self.storage)  # a is now the most recent
+            originals.read('c.bin', self.storage)
+        self.assertTrue(path_a.exists())
+        self.assertFalse(path_b.exists())
+        self.assertTrue(originals._path('c.bin').exists())
+    
+    def test_thumbnails_read_original_once(self):
+        """Test thumbnail generation downloads the original once for all variants"""
+        with override_settings(IMAGE_ORIGINALS_CACHE_DIR=self.cache_dir, MEDIA_ROOT=self.storage.location):
+            cache.clear()
+            local_cache.clear()
+            user = User.objects.create_user(username='testuser', password='testpass123')
+            image = Image.objects.create(
+                user=user, title='Cached', image=ImageModelTests._create_image_file('cached.png', (600, 400))
+            )
+            with patch('images.originals.record_cache_read') as record:
+                generated = generate_thumbnails(image_job(image.pk))
+        hits = [c.args[1] for c in record.call_args_list]
+        self.assertEqual(hits.count(False), 1)
+        self.assertEqual(hits.count(True), generated - 1)
+    
+    def test_profile_save_discards_cached_photo(self):
+        """Test a saved profile photo is read from storage again, in case it was overwritten"""
+        with override_settings(IMAGE_ORIGINALS_CACHE_DIR=self.cache_dir, MEDIA_ROOT=self.storage.location):
+            user = User.objects.create_user(username='testuser', password='testpass123')
+            profile = Profile.objects.create(user=user, photo=ImageModelTests._create_image_file('me.png'))
+            with patch('images.originals.record_cache_read'):
+                read_original(profile.photo.name)
+            cached = OriginalsCache.from_settings()._path(profile.photo.name)
+            self.assertTrue(cached.exists())
+            profile.save()
+        self.assertFalse(cached.exists())
+
+
+@override_settings(IMAGE_UPLOAD_CHUNK_SIZE=4096)
+class ChunkedUploadTests(TestCase):
+    """Test chunked, resumable uploads end to end with local storage"""
+    
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        # Noise compresses badly, so the PNG spans several chunks.
+        image_io = BytesIO()
+        PILImage.fromarray(np.random.default_rng(0).integers(0, 255, (64, 64, 3), dtype=np.uint8)).save(
+            image_io, format='PNG'
+        )
+        self.data = image_io.getvalue()
+    
+    def _start(self):
+        response = self.client.post(
+            reverse('images:upload_create'), {'filename': 'noise.png', 'size': len(self.data)}
+        )
+        self.assertEqual(response.status_code, 201)
+        return reverse('images:upload_detail', args=[response.json()['id']]), response.json()['id']
+    
+    def _put(self, url, offset, chunk):
+        return self.client.put(
+            url, data=chunk, content_type='application/octet-stream', headers={'Upload-Offset': str(offset)}
+        )
+    
+    def test_upload_resume_and_commit(self):
+        """Test chunks are accepted in order, resumed after a gap and committed by the form"""
+        url, upload_id = self._start()
+        self.assertEqual(self._put(url, 0, self.data[:4096]).json()['offset'], 4096)
+        # A chunk sent past the stored offset is refused with the offset to resume from.
+        response = self._put(url, 8192, self.data[8192:12288])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 4096)
+        # Resuming after an interruption starts from what the server has.
+        offset = self.client.get(url).json()['offset']
+        while offset < len(self.data):
+            offset = self._put(url, offset, self.data[offset:offset + 4096]).json()['offset']
+        self.assertGreater(len(self.data), 8192)
+        
+        response = self.client.post(
+            reverse('images:create'), {'title': 'Noise', 'description': '', 'url': '', 'upload': upload_id}
+        )
+        image = Image.objects.get(title='Noise')
+        self.assertRedirects(response, image.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEqual(image.blob.sha256, hashlib.sha256(self.data).hexdigest())
+        with image.image.open() as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(default_storage.exists(f'uploads/{upload_id}'))
+    
+    def test_rejects_non_images_and_oversized_chunks(self):
+        """Test the first chunk must look like an image and chunks stay within limits"""
+        url, _ = self._start()
+        self.assertEqual(self._put(url, 0, b'not an image' * 10).status_code, 400)
+        self.assertEqual(self._put(url, 0, self.data[:4097]).status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 0)
+    
+    def test_other_users_cannot_use_upload(self):
+        """Test an upload id only works for the user who started it"""
+        url, upload_id = self._start()
+        User.objects.create_user(username='other', password='testpass123')
+        other = Client()
+        other.login(username='other', password='testpass123')
+        self.assertEqual(other.get(url).status_code, 404)
+        self.assertEqual(
+            other.put(url, data=self.data[:4096], content_type='application/octet-stream',
+                      headers={'Upload-Offset': '0'}).status_code,
+            404,
+        )
+    
+    def test_clean_uploads_removes_stale(self):
+        """Test clean_uploads deletes abandoned uploads and their chunks"""
+        stale_url, stale_id = self._start()
+        self._put(stale_url, 0, self.data[:4096])
+        fresh_url, fresh_id = self._start()
+        self._put(fresh_url, 0, self.data[:4096])
+        ChunkedUpload.objects.filter(pk=stale_id).update(updated=timezone.now() - timedelta(days=2))
+        call_command('clean_uploads', stdout=StringIO())
+        self.assertEqual(list(ChunkedUpload.objects.values_list('id', flat=True)), [uuid.UUID(fresh_id)])
+        self.assertFalse(default_storage.exists(f'uploads/{stale_id}'))
+        self.assertTrue(default_storage.exists(f'uploads/{fresh_id}/{0:012d}'))
+
+
+class ImageCardCacheTests(TestCase):
+    """Test the shared per-image card cache"""
+    
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.images = [
+            Image.objects.create(
+                user=self.user, title=f'Card {i}', image=ImageModelTests._create_image_file(f'card{i}.png', (300, 200))
+            )
+            for i in range(3)
+        ]
+        for image in self.images:
+            generate_thumbnails(image_job(image.pk))
+        self.images[0].users_like.add(self.other)
+        self.client = Client()
+        self.client.login(username='other', password='testpass123')
+    
+    def test_warm_page_renders_no_cards(self):
+        """Test a repeat visit serves every card from one cache read"""
+        self.client.get(reverse('images:list'))
+        with patch('images.cards.render_to_string') as render, \
+                patch('images.cards.cache.get_many', wraps=cache.get_many) as get_many:
+            response = self.client.get(reverse('images:list'))
+        render.assert_not_called()
+        card_reads = [c for c in get_many.call_args_list if c.args[0][0].startswith('image_card:')]
+        self.assertEqual(len(card_reads), 1)
+        for image in self.images:
+            self.assertContains(response, image.get_absolute_url())
+    
+    def test_liked_ids_are_per_user(self):
+        """Test the cached cards are shared and the like state comes from the page blob"""
+        response = self.client.get(reverse('images:list'))
+        self.assertContains(response, f'<script type="application/json" data-liked-images>[{self.images[0].pk}]</script>')
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('images:list'))
+        self.assertContains(response, '<script type="application/json" data-liked-images>[]</script>')
+    
+    def test_version_follows_edits_likes_and_view_buckets(self):
+        """Test edits, likes and view bucket changes give a card a new key"""
+        image = Image.objects.get(pk=self.images[1].pk)
+        key = card_cache_key(image)
+        image.views = 5
+        self.assertEqual(card_cache_key(image), key)
+        image.views = 15
+        self.assertNotEqual(card_cache_key(image), key)
+        image.views = 0
+        image.users_like.add(self.other)
+        image.refresh_from_db()
+        self.assertNotEqual(card_cache_key(image), key)
+        image.title = 'Renamed'
+        self.assertNotEqual(card_cache_key(image), key)
+    
+    def test_cards_with_pending_thumbnails_are_not_cached(self):
+        """Test a card still showing a placeholder is rendered again next time"""
+        pending = Image.objects.create(
+            user=self.user, title='Pending', image=ImageModelTests._create_image_file('pending.png', (300, 200))
+        )
+        with patch('images.thumbnails.queue_thumbnails'):
+            self.client.get(reverse('images:list'))
+        pending.views = 0
+        self.assertIsNone(cache.get(card_cache_key(pending)))
+        self.assertIsNotNone(cache.get(card_cache_key(self.images[2])))
+
+
+class ImageFeedTests(TestCase):
+    """Test the JSON image feed used by infinite scroll"""
+    
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        for i in range(10):
+            Image.objects.create(user=self.user if i % 2 else self.other, title=f'Image {i}', image=f'images/{i}.jpg')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+    
+    def _feed(self, **params):
+        with patch('images.thumbnails.queue_thumbnails'):
+            response = self.client.get(reverse('images:feed'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def test_cursor_walks_every_image_once(self):
+        """Test following the next cursors returns each image once, newest first"""
+        first = self._feed()
+        self.assertEqual(len(first['images']), 8)
+        self.assertIsNotNone(first['next'])
+        second = self._feed(cursor=first['next'])
+        self.assertIsNone(second['next'])
+        titles = [record['title'] for record in first['images'] + second['images']]
+        self.assertEqual(titles, [f'Image {i}' for i in range(9, -1, -1)])
+    
+    def test_record_fields(self):
+        """Test records carry what a card shows, including the user's like"""
+        image = Image.objects.get(title='Image 9')
+        image.users_like.add(self.user)
+        record = self._feed()['images'][0]
+        self.assertEqual(record['id'], image.pk)
+        self.assertEqual(record['url'], image.get_absolute_url())
+        self.assertEqual(record['likes'], 1)
+        self.assertTrue(record['liked'])
+        self.assertIsNone(record['thumbnail'])
+        self.assertEqual(
+            set(record), {'id', 'title', 'url', 'thumbnail', 'placeholder', 'likes', 'views', 'liked', 'created'}
+        )
+    
+    def test_thumbnail_record(self):
+        """Test a generated thumbnail is described with its size and sources"""
+        image = Image.objects.create(
+            user=self.user, title='Real', image=ImageModelTests._create_image_file('real.png', (600, 400))
+        )
+        generate_thumbnails(image_job(image.pk))
+        thumbnail = self._feed()['images'][0]['thumbnail']
+        self.assertEqual((thumbnail['width'], thumbnail['height']), (500, 400))
+        self.assertIn('500w', thumbnail['srcset'])
+        self.assertTrue(thumbnail['url'].endswith('.jpg'))
+    
+    def test_user_filter_and_invalid_cursor(self):
+        """Test the feed can list one user's images and rejects bad cursors"""
+        records = self._feed(user='other')['images']
+        self.assertEqual({record['title'] for record in records}, {f'Image {i}' for i in range(0, 10, 2)})
+        response = self.client.get(reverse('images:feed'), {'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_feed_is_compressed(self):
+        """Test the feed is gzipped for clients that accept it"""
+        with patch('images.thumbnails.queue_thumbnails'):
+            response = self.client.get(reverse('images:feed'), headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of image listings"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        for i in range(10):
+            Image.objects.create(user=self.user if i % 2 else self.other, title=f'Image {i}', image=f'images/{i}.jpg')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+    
+    def test_walks_every_row_once_with_equal_timestamps(self):
+        """Test pages never skip or repeat images that share a created time"""
+        Image.objects.update(created=timezone.now())
+        seen, cursor = [], None
+        while True:
+            page = paginate(Image.objects.all(), cursor, 3)
+            seen.extend(image.pk for image in page)
+            cursor = page.next_cursor
+            if not page.has_next():
+                break
+        self.assertEqual(seen, sorted(Image.objects.values_list('id', flat=True), reverse=True))
+    
+    def test_no_count_or_offset(self):
+        """Test a later page is one bounded query without COUNT or OFFSET"""
+        first = paginate(Image.objects.all(), None, 4)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginate(Image.objects.all(), first.next_cursor, 4)
+        self.assertEqual(len(page), 4)
+        self.assertEqual(len(queries.captured_queries), 1)
+        sql = queries.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+    
+    def test_invalid_cursors(self):
+        """Test malformed cursors are rejected"""
+        for cursor in ['!!', encode_cursor({'id': 1}), encode_cursor({'created': 'soon', 'id': 1}), encode_cursor([])]:
+            with self.assertRaises(InvalidCursor):
+                paginate(Image.objects.all(), cursor, 8)
+    
+    def test_image_list_fragments_follow_cursor(self):
+        """Test infinite scroll fragments carry the next cursor in a header"""
+        response = self.client.get(reverse('images:list'))
+        cursor = response.context['next_cursor']
+        self.assertTrue(cursor)
+        fragment = self.client.get(reverse('images:list'), {'images_only': 1, 'cursor': cursor})
+        self.assertEqual([image.title for image in fragment.context['images']], ['Image 1', 'Image 0'])
+        self.assertEqual(fragment['X-Next-Cursor'], '')
+        self.assertEqual(self.client.get(reverse('images:list'), {'images_only': 1, 'cursor': '!!'}).content, b'')
+        self.assertEqual(self.client.get(reverse('images:list'), {'cursor': '!!'}).status_code, 200)
+    
+    def test_user_detail_pages(self):
+        """Test a profile page only pages through that user's images"""
+        response = self.client.get(reverse('user_detail', args=['other']))
+        self.assertEqual(len(response.context['images']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+
+
+class ImageSearchTests(TestCase):
+    """Test full-text image search"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='painter', password='testpass123')
+        self.sunset = Image.objects.create(
+            user=self.user, title='Sunset over the harbour', description='Boats at dusk', image='images/1.jpg'
+        )
+        self.boat = Image.objects.create(
+            user=self.other, title='Fishing boat', description='A red boat in the sunset', image='images/2.jpg'
+        )
+        Image.objects.create(user=self.other, title='Mountain lake', description='Morning mist', image='images/3.jpg')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+    
+    def _titles(self, query, **kwargs):
+        return [image.title for image in search_images(query, **kwargs)]
+    
+    def test_ranked_prefix_matches(self):
+        """Test every word matches as a prefix and title matches rank first"""
+        self.assertEqual(self._titles('sun'), ['Sunset over the harbour', 'Fishing boat'])
+        self.assertEqual(self._titles('boat'), ['Fishing boat', 'Sunset over the harbour'])
+        self.assertEqual(self._titles('sunset harb'), ['Sunset over the harbour'])
+        self.assertEqual(set(self._titles('paint')), {'Fishing boat', 'Mountain lake'})
+        self.assertEqual(self._titles('"*)('), [])
+    
+    def test_index_follows_saves_and_deletes(self):
+        """Test edited and deleted images are reflected in the results"""
+        self.sunset.title = 'Evening harbour'
+        self.sunset.save()
+        self.assertEqual(self._titles('sunset'), ['Fishing boat'])
+        self.boat.delete()
+        self.assertEqual(self._titles('sunset'), [])
+        self.assertEqual(self._titles('evening'), ['Evening harbour'])
+    
+    def test_username_change_reindexes_images(self):
+        """Test a renamed user's images are found by the new name only"""
+        self.other.username = 'sculptor'
+        self.other.save()
+        self.assertEqual(set(self._titles('sculpt')), {'Fishing boat', 'Mountain lake'})
+        self.assertEqual(self._titles('painter'), [])
+        # Saves that keep the name leave the index alone.
+        with patch('images.signals.reindex_user_images') as reindex:
+            self.other.first_name = 'Ann'
+            self.other.save()
+            self.other.save(update_fields=['last_login'])
+        reindex.assert_not_called()
+    
+    def test_keyset_pages(self):
+        """Test cursors walk every match once without repeating"""
+        for i in range(5):
+            Image.objects.create(user=self.user, title=f'Sunset {i}', image=f'images/s{i}.jpg')
+        seen, cursor = [], None
+        while True:
+            page = search_images('sunset', cursor, 3)
+            seen.extend(image.pk for image in page)
+            cursor = page.next_cursor
+            if not page.has_next():
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+    
+    def test_keyset_pages_with_equal_scores(self):
+        """Test ties on the score continue by id across several pages"""
+        ids = [
+            Image.objects.create(user=self.user, title='Lighthouse', image=f'images/l{i}.jpg').pk
+            for i in range(10)
+        ]
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = search_images('lighthouse', cursor, 3)
+            seen.extend(image.pk for image in page)
+            pages += 1
+            cursor = page.next_cursor
+            if not page.has_next():
+                break
+        self.assertEqual(pages, 4)
+        self.assertEqual(seen, ids)
+    
+    def test_rebuild_command(self):
+        """Test rebuild_search_index recreates the index from the images table"""
+        Image.objects.filter(pk=self.boat.pk).update(title='Canoe')
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3 images indexed', out.getvalue())
+        self.assertEqual(self._titles('canoe'), ['Canoe'])
+    
+    def test_search_view(self):
+        """Test the search page and its infinite scroll fragments"""
+        response = self.client.get(reverse('images:search'), {'q': 'boat'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'images/image/search.html')
+        self.assertEqual(len(response.context['images']), 2)
+        fragment = self.client.get(reverse('images:search'), {'q': 'zzz', 'images_only': 1})
+        self.assertContains(fragment, 'No matching images')
+        self.assertEqual(fragment['X-Next-Cursor'], '')
+        self.assertEqual(self.client.get(reverse('images:search')).status_code, 200)
+
+
+class TagTests(TestCase):
+    """Test #tag extraction, tag pages and trending scores"""
+    
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+    
+    def _image(self, title, description):
+        return Image.objects.create(user=self.user, title=title, description=description, image=f'images/{title}.jpg')
+    
+    def test_extract_tags(self):
+        """Test tags are lowercased, deduplicated and need a letter"""
+        self.assertEqual(
+            extract_tags('#Sunset at the #beach, #sunset again. #2024 a#b &#39; ##x #v2'),
+            ['sunset', 'beach', 'v2'],
+        )
+        self.assertEqual(extract_tags(''), [])
+    
+    def test_tags_follow_description(self):
+        """Test saving an image adds and removes its ImageTag rows"""
+        image = self._image('one', 'Trip #Beach #sea')
+        self.assertEqual(set(image.image_tags.values_list('tag__name', flat=True)), {'beach', 'sea'})
+        self.assertEqual(image.image_tags.first().created, image.created)
+        image.description = 'Just #sea'
+        image.save()
+        self.assertEqual(list(image.image_tags.values_list('tag__name', flat=True)), ['sea'])
+        self.assertTrue(Tag.objects.filter(name='beach').exists())
+    
+    def test_tag_pages_walk_newest_first(self):
+        """Test tag pages are keyset paginated and never read descriptions"""
+        for i in range(5):
+            self._image(f'tagged {i}', f'#beach {i}')
+        self._image('other', '#sea')
+        tag = Tag.objects.get(name='beach')
+        with CaptureQueriesContext(connection) as queries:
+            first = tag_images(tag, None, 3)
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries.captured_queries))
+        second = tag_images(tag, first.next_cursor, 3)
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual([image.title for image in list(first) + list(second)], [f'tagged {i}' for i in range(4, -1, -1)])
+    
+    def test_tag_page_and_feed(self):
+        """Test the tag page, its feed and the description links"""
+        image = self._image('one', 'At the #Beach <b>')
+        response = self.client.get(reverse('images:tag', args=['BEACH']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i.pk for i in response.context['images']], [image.pk])
+        self.assertEqual(self.client.get(reverse('images:tag', args=['nothing'])).status_code, 404)
+        with patch('images.thumbnails.queue_thumbnails'):
+            feed = self.client.get(reverse('images:feed'), {'tag': 'beach'}).json()
+        self.assertEqual([record['id'] for record in feed['images']], [image.pk])
+        rendered = Template('{% load image_tags %}{{ text|link_tags }}').render(Context({'text': image.description}))
+        self.assertIn(f'<a href="{reverse("images:tag", args=["beach"])}"', rendered)
+        self.assertIn('&lt;b&gt;', rendered)
+    
+    def test_trending_decay(self):
+        """Test recent uses outweigh older ones across epochs"""
+        half_life = 6 * 60 * 60
+        with self.settings(TAG_TRENDING_HALF_LIFE=half_life):
+            epoch, weight = use_weight(0)
+            self.assertEqual((epoch, weight), (0, 1))
+            self.assertEqual(use_weight(2 * half_life)[1], 4)
+            self.assertEqual(use_weight(EPOCH_HALF_LIVES * half_life), (1, 1))
+        # Uses at the start of this epoch count as the previous epoch's scaled down.
+        previous = [('old', 3 * 2**EPOCH_HALF_LIVES)]
+        current = [('new', 2.0), ('old', 0.0)]
+        self.assertEqual(merge_trending(current, previous, 10), ['old', 'new'])
+        self.assertEqual(merge_trending([('new', 4.0)], previous, 1), ['new'])
+    
+    def test_trending_changes_revalidate_tag_pages(self):
+        """Test tag pages get a new version only when the trending list changes"""
+        with patch('images.tags.merge_trending', return_value=['beach']), \
+                patch('images.tags.bump_versions') as bump:
+            self.assertEqual(trending_version(), 'tags:trending')
+            cache.delete('tags:trending')
+            self.assertEqual(trending_tags(), ['beach'])
+        bump.assert_called_once_with('tags:trending')
+        cache.delete('tags:trending')
+        with patch('images.tags.merge_trending', return_value=['sea']), \
+                patch('images.tags.bump_versions') as bump:
+            self.assertEqual(trending_tags(), ['sea'])
+        bump.assert_called_once_with('tags:trending')
+
+
+class PlaceholderTests(TestCase):
+    """Test inline placeholder previews"""
+    
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+    
+    @staticmethod
+    def _split_image():
+        img = PILImage.new('RGB', (400, 200), color=(255, 0, 0))
+        img.paste(PILImage.new('RGB', (200, 200), color=(0, 0, 255)), (200, 0))
+        image_io = BytesIO()
+        img.save(image_io, format='PNG')
+        image_io.seek(0)
+        return image_io
+    
+    def test_placeholder_is_tiny_average(self):
+        """Test the preview is a small data URI of the averaged colours"""
+        uri = placeholder_data_uri(self._split_image())
+        self.assertTrue(uri.startswith('data:image/webp;base64,'))
+        self.assertLess(len(uri), 400)
+        preview = PILImage.open(BytesIO(base64.b64decode(uri.split(',', 1)[1]))).convert('RGB')
+        self.assertEqual(preview.size, (12, 6))
+        left, right = preview.getpixel((0, 3)), preview.getpixel((11, 3))
+        self.assertGreater(left[0], 200)
+        self.assertGreater(right[2], 200)
+    
+    def test_list_renders_placeholder_inline(self):
+        """Test cards paint the stored preview while the thumbnail is pending"""
+        upload = SimpleUploadedFile('split.png', self._split_image().read(), content_type='image/png')
+        form = ImageCreateForm(data={'title': 'Split', 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        image = form.save(commit=False)
+        image.user = self.user
+        image.save()
+        self.assertTrue(image.placeholder.startswith('data:image/webp'))
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+        with patch('images.thumbnails.queue_thumbnails'):
+            response = client.get(reverse('images:list'))
+        self.assertContains(response, f'<img src="{image.placeholder}" alt="Split"')
+    
+    def test_backfill_command(self):
+        """Test backfill_placeholders fills in missing previews"""
+        image = Image.objects.create(
+            user=self.user, title='Old', image=SimpleUploadedFile('old.png', self._split_image().read())
+        )
+        with patch('images.management.commands.backfill_placeholders.bump_versions') as bump:
+            call_command('backfill_placeholders', '--processes', '1', stdout=StringIO())
+        bump.assert_called_once_with('images')
+        image.refresh_from_db()
+        self.assertTrue(image.placeholder.startswith('data:image/webp'))
+
+
+class ImageNormalizationTests(TestCase):
+    """Test ingest-time normalization of originals"""
+    
+    @staticmethod
+    def _jpeg_with_orientation(size=(300, 200)):
+        exif = PILImage.Exif()
+        exif[0x0112] = 6  # Rotate 90 degrees clockwise when displayed
+        image_io = BytesIO()
+        PILImage.new('RGB', size, color='red').save(image_io, format='JPEG', exif=exif)
+        image_io.seek(0)
+        return image_io
+    
+    @override_settings(IMAGE_MAX_DIMENSION=100)
+    def test_orientation_applied_downscaled_and_metadata_stripped(self):
+        """Test EXIF rotation is applied, the image shrunk and EXIF removed"""
+        normalized = normalize_image(self._jpeg_with_orientation())
+        self.assertEqual((normalized.width, normalized.height), (67, 100))
+        self.assertEqual(normalized.content_type, 'image/jpeg')
+        with PILImage.open(normalized.file) as img:
+            self.assertEqual(img.size, (67, 100))
+            self.assertNotIn(0x0112, img.getexif())
+        normalized.close()
+    
+    def test_clean_image_kept_byte_for_byte(self):
+        """Test an image that needs no changes is not recompressed"""
+        original = ImageModelTests._create_image_file()
+        content = original.read()
+        normalized = normalize_image(original)
+        self.assertIs(normalized.file, original)
+        self.assertEqual(normalized.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual((normalized.width, normalized.height), (100, 100))
+    
+    @override_settings(IMAGE_NORMALIZE_WEBP=True)
+    def test_webp_transcoding(self):
+        """Test originals are transcoded to WebP when enabled"""
+        normalized = normalize_image(ImageModelTests._create_image_file())
+        self.assertEqual(normalized.extension, 'webp')
+        self.assertEqual(normalized.file.read(12)[8:], b'WEBP')
+        normalized.close()
+    
+    @override_settings(IMAGE_MAX_DIMENSION=100)
+    def test_form_records_dimensions(self):
+        """Test ImageCreateForm stores dimensions, mime type and size"""
+        upload = SimpleUploadedFile('photo.jpg', self._jpeg_with_orientation().read())
+        form = ImageCreateForm(data={'title': 'Photo', 'description': '', 'url': ''}, files={'file': upload})
+        self.assertTrue(form.is_valid())
+        image = form.save(commit=False)
+        self.assertEqual((image.width, image.height), (67, 100))
+        self.assertEqual(image.mime_type, 'image/jpeg')
+        self.assertEqual(image.byte_size, image.blob.size)
+        self.assertEqual(default_storage.size(image.image.name), image.byte_size)
+
+
+class ImportImagesCommandTests(TestCase):
+    """Test the import_images bulk import command"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for name, color in [('sunset-one.png', 'red'), ('sunset_two.png', 'red'), ('forest.png', 'green')]:
+            PILImage.new('RGB', (40, 40), color=color).save(f'{self.directory.name}/{name}')
+    
+    def _import(self, *args):
+        call_command(
+            'import_images', self.directory.name, '--user', 'importer', '--processes', '1',
+            '--state-file', f'{self.directory.name}.state', *args,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+    
+    def test_directory_import(self):
+        """Test images are bulk created with blobs, slugs and one action per batch"""
+        with patch('images.management.commands.import_images.bump_versions') as bump:
+            self._import('--batch-size', '2')
+        self.assertEqual(bump.call_count, 2)
+        images = Image.objects.filter(user=self.user)
+        self.assertEqual(images.count(), 3)
+        self.assertTrue(images.filter(slug='sunset-one', width=40, height=40).exists())
+        self.assertEqual(ImageBlob.objects.count(), 2)
+        self.assertEqual(sorted(ImageBlob.objects.values_list('ref_count', flat=True)), [1, 2])
+        self.assertEqual(Action.objects.filter(user=self.user).count(), 2)
+    
+    def test_imported_images_are_searchable(self):
+        """Test bulk created images enter the full-text index"""
+        self._import()
+        self.assertEqual(
+            {image.title for image in search_images('sunset')}, {'sunset one', 'sunset two'}
+        )
+    
+    def test_imported_descriptions_are_tagged(self):
+        """Test tags in imported descriptions reach tag pages and trending"""
+        records = f'{self.directory.name}/records.jsonl'
+        with open(records, 'w') as f:
+            f.write(json.dumps({'path': f'{self.directory.name}/forest.png', 'title': 'Forest', 'description': 'Pines #Forest #mist'}) + '\n')
+        with patch('images.tags.record_tag_uses') as record_uses, self.captureOnCommitCallbacks(execute=True):
+            call_command('import_images', records, '--user', 'importer', '--processes', '1', stdout=StringIO(), stderr=StringIO())
+        image = Image.objects.get(title='Forest')
+        self.assertEqual(list(tag_images(Tag.objects.get(name='forest'))), [image])
+        record_uses.assert_called_once_with(['forest', 'mist'])
+    
+    def test_resume_skips_committed_records(self):
+        """Test --resume continues after the last committed batch"""
+        self._import()
+        self._import('--resume')
+        self.assertEqual(Image.objects.filter(user=self.user).count(), 3)
+
+
+class ThumbnailTests(TestCase):
+    """Test eager thumbnail generation and ready-only lookups"""
+    
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.image = Image.objects.create(
+            user=self.user, title='Thumb', image=ImageModelTests._create_image_file('thumb.png', (600, 400))
+        )
+    
+    def test_generate_thumbnails_creates_aliases(self):
+        """Test the worker generates every Image.image alias and card variant"""
+        with patch('images.thumbnails.queue_thumbnails'):
+            self.assertIsNone(ready_thumbnail(self.image.image, 'card'))
+        self.assertEqual(generate_thumbnails(image_job(self.image.pk)), 10)
+        card = ready_thumbnail(self.image.image, 'card')
+        self.assertEqual((card.width, card.height), (500, 400))
+        action = ready_thumbnail(self.image.image, 'action')
+        self.assertEqual((action.width, action.height), (80, 80))
+    
+    def test_missing_thumbnail_is_queued_not_generated(self):
+        """Test a template lookup miss queues the image without rendering inline"""
+        with patch('images.thumbnails.r') as mock_redis:
+            mock_redis.pipeline.return_value.execute.return_value = [1]
+            self.assertIsNone(ready_thumbnail(self.image.image, 'card'))
+        mock_redis.rpush.assert_called_once_with('thumbnails:queue', f'image:{self.image.pk}')
+        self.assertIsNone(ready_thumbnail(self.image.image, 'card'))
+    
+    def test_queue_skips_pending_images(self):
+        """Test images already waiting in the queue are not pushed again"""
+        with patch('images.thumbnails.r') as mock_redis:
+            mock_redis.pipeline.return_value.execute.return_value = [0]
+            queue_thumbnails([image_job(self.image.pk)])
+        mock_redis.rpush.assert_not_called()
+    
+    def test_queue_falls_back_to_inline_generation(self):
+        """Test thumbnails are generated in-process when Redis is unavailable"""
+        with patch('images.thumbnails.r') as mock_redis:
+            mock_redis.pipeline.side_effect = ConnectionError
+            queue_thumbnails([image_job(self.image.pk)])
+            self.assertIsNotNone(ready_thumbnail(self.image.image, 'card'))
+    
+    def test_worker_releases_batch_when_pool_fails(self):
+        """Test a batch leaves the pending set even if generating it raises"""
+        command = 'images.management.commands.thumbnail_worker'
+        with patch(f'{command}.recover_thumbnail_jobs', return_value=0) as recover, \
+                patch(f'{command}.pop_thumbnail_batch', side_effect=[['image:1'], []]), \
+                patch(f'{command}.finish_thumbnail_batch') as finish, \
+                patch(f'{command}.ProcessPoolExecutor') as executor:
+            executor.return_value.__enter__.return_value.map.side_effect = RuntimeError('pool broke')
+            with self.assertRaises(RuntimeError):
+                call_command('thumbnail_worker', once=True, stdout=StringIO())
+        recover.assert_called_once_with()
+        finish.assert_called_once_with(['image:1'])
+    
+    def test_recover_requeues_interrupted_jobs(self):
+        """Test jobs left in the processing list go back to the queue"""
+        with patch('images.thumbnails.r') as mock_redis:
+            mock_redis.lmove.side_effect = [b'image:1', b'image:2', None]
+            self.assertEqual(recover_thumbnail_jobs(), 2)
+        mock_redis.lmove.assert_called_with('thumbnails:processing', 'thumbnails:queue', 'RIGHT', 'LEFT')
+    
+    def test_new_image_queues_thumbnails_on_commit(self):
+        """Test saving a new image schedules its thumbnails after commit"""
+        with patch('images.signals.queue_thumbnails') as mock_queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                image = Image.objects.create(
+                    user=self.user, title='New', image=ImageModelTests._create_image_file()
+                )
+        mock_queue.assert_called_once_with([f'image:{image.pk}'])
+    
+    def test_page_lookups_are_cached(self):
+        """Test resolved thumbnails are served without database queries"""
+        images = [self.image] + [
+            Image.objects.create(user=self.user, title=f'More {i}', image=ImageModelTests._create_image_file())
+            for i in range(2)
+        ]
+        for image in images:
+            generate_thumbnails(image_job(image.pk))
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            first = lookup_thumbnails([image.image for image in images], 'card')
+        with patch('images.thumbnails.cache') as mock_cache:
+            self.assertEqual(lookup_thumbnails([image.image for image in images], 'card'), first)
+        mock_cache.get_many.assert_not_called()
+    
+    def test_invalidate_drops_cached_entries(self):
+        """Test a changed source is resolved again instead of served from cache"""
+        generate_thumbnails(image_job(self.image.pk))
+        ready_thumbnail(self.image.image, 'card')
+        invalidate_thumbnails(self.image.image.name, self.image.image)
+        with self.assertNumQueries(1):
+            # The thumbnail row is looked up again
+            self.assertIsNotNone(ready_thumbnail(self.image.image, 'card'))
+    
+    def test_responsive_variants(self):
+        """Test card variants come in every width and format"""
+        generate_thumbnails(image_job(self.image.pk))
+        variants = responsive_thumbnails(self.image.image, 'card')
+        self.assertEqual(set(variants), {None, 'avif', 'webp'})
+        self.assertEqual([info.width for info in variants['webp']], [240, 360, 500])
+        self.assertTrue(variants['avif'][0].url.endswith('.avif'))
+        with default_storage.open(variants['webp'][0].url.removeprefix('/media/')) as f:
+            self.assertEqual(PILImage.open(f).format, 'WEBP')
+    
+    def test_picture_tag_renders_srcset(self):
+        """Test the responsive tag emits a <picture> with srcset and sizes"""
+        generate_thumbnails(image_job(self.image.pk))
+        html = Template(
+            '{% load image_tags %}{% responsive_thumbnail image.image "card" sizes="50vw" alt="Thumb" %}'
+        ).render(Context({'image': self.image}))
+        self.assertIn('<source type="image/avif"', html)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(' 240w, ', html)
+        self.assertIn('sizes="50vw"', html)
+    
+    def test_avatar_served_small(self):
+        """Test avatars get narrow variants once the worker has run"""
+        profile = Profile.objects.create(user=self.user, photo=ImageModelTests._create_image_file('me.png', (300, 300)))
+        generate_thumbnails(f'profile:{profile.pk}')
+        html = Template('{% include "includes/avatar.html" %}').render(Context({'user': self.user}))
+        self.assertIn(' 48w, ', html)
+        self.assertIn('sizes="40px"', html)
+    
+    def test_lru_evicts_least_recently_used(self):
+        """Test the in-process cache is size bounded"""
+        lru = LRUCache(maxsize=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+    
+    def test_list_renders_placeholder_until_ready(self):
+        """Test the grid shows a placeholder instead of rendering a thumbnail"""
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+        with patch('images.thumbnails.queue_thumbnails'):
+            response = client.get(reverse('images:list'))
+        self.assertContains(response, 'animate-pulse')
+        generate_thumbnails(image_job(self.image.pk))
+        response = client.get(reverse('images:list'))
+        self.assertContains(response, ready_thumbnail(self.image.image, 'card').url)
+
+
 class ImagesViewsTests(TestCase):
     """Test images views"""
     
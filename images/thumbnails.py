@@ -0,0 +1,447 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import redis
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.conf import settings as easy_thumbnails_settings
+from easy_thumbnails.files import get_thumbnailer
+
+from .focal import focal_target
+
+r = redis.from_url(settings.REDIS_URL)
+
+QUEUE_KEY = "thumbnails:queue"
+PENDING_KEY = "thumbnails:pending"
+PROCESSING_KEY = "thumbnails:processing"
+
+# What templates need from a thumbnail, without touching storage or the database.
+ThumbnailInfo = namedtuple("ThumbnailInfo", ["url", "width", "height"])
+
+
+class LRUCache:
+    """Thread-safe in-process LRU whose entries also expire after `timeout` seconds."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache(
+    settings.THUMBNAIL_URL_LOCAL_CACHE_SIZE, settings.THUMBNAIL_URL_LOCAL_CACHE_TIMEOUT
+)
+
+
+# Models whose files get thumbnails from the worker: job label -> (model, field name).
+SOURCES = {
+    "image": ("images.Image", "image"),
+    "profile": ("accounts.Profile", "photo"),
+}
+
+
+def source_job(fieldfile):
+    """Worker job ("image:42") for the instance owning `fieldfile`, or None."""
+    model_label = fieldfile.instance._meta.label
+    for label, (source_model, field_name) in SOURCES.items():
+        if model_label == source_model and fieldfile.field.name == field_name:
+            return f"{label}:{fieldfile.instance.pk}"
+    return None
+
+
+def image_job(image_id):
+    return f"image:{image_id}"
+
+
+class Variant(namedtuple("Variant", ["alias", "options", "extension"])):
+    """
+    One rendition of an alias: its (possibly narrower) easy_thumbnails options
+    and the file format, where None means easy_thumbnails' default (JPEG/PNG).
+    """
+
+    @property
+    def width(self):
+        return self.options["size"][0]
+
+
+def get_variant(target, alias, width=None, extension=None):
+    """`target` is a field file or an alias target such as "images.Image.image"."""
+    options = aliases.get(alias, target=target)
+    if options is None:
+        return None
+    options = dict(options, ALIAS=alias)
+    base_width, base_height = options["size"]
+    if width is not None and width != base_width:
+        # Keep the alias' aspect ratio (a 0 height means "proportional")
+        height = round(base_height * width / base_width) if base_height else 0
+        options["size"] = (width, height)
+    focal = focal_target(getattr(target, "instance", None))
+    if focal is not None and options.get("crop") == "smart":
+        # Crop around the focal point found at ingest instead of letting
+        # easy_thumbnails search the full-size original for entropy.
+        options["crop"] = True
+        options["target"] = focal
+    if extension == "avif":
+        # easy_thumbnails passes JPEG-style integer subsampling, which Pillow's
+        # AVIF encoder rejects.
+        options["subsampling"] = "4:2:0"
+    return Variant(alias, options, extension)
+
+
+def alias_variants(target, alias):
+    """
+    Every rendition of `alias`: each width in THUMBNAIL_VARIANT_WIDTHS in the
+    default format and in each of THUMBNAIL_VARIANT_FORMATS. Aliases without
+    configured widths have a single default-format variant.
+    """
+    base = get_variant(target, alias)
+    if base is None:
+        return []
+    widths = settings.THUMBNAIL_VARIANT_WIDTHS.get(alias)
+    if not widths:
+        return [base]
+    formats = [None, *settings.THUMBNAIL_VARIANT_FORMATS]
+    return [
+        get_variant(target, alias, width, extension)
+        for extension in formats
+        for width in sorted(widths)
+    ]
+
+
+def thumbnail_cache_key(source_name, options, extension=None):
+    """
+    Cache key for one source file rendered with one set of options and format.
+    The focal point `target` is left out: it is derived from the (content-addressed)
+    source, and backfill_focal_points invalidates the entries it changes.
+    """
+    options = {key: value for key, value in options.items() if key not in ("ALIAS", "target")}
+    raw = f"{source_name}\0{sorted(options.items())!r}\0{extension}"
+    return f"thumbnail:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _cached_options(options):
+    """
+    Every set of options a variant may have been cached under. An image with a
+    focal point has its smart crop replaced by a crop around the point (see
+    get_variant()), and whether it has one can change, so both are covered.
+    """
+    if options.get("crop") != "smart" and "target" not in options:
+        return [options]
+    smart = {key: value for key, value in options.items() if key != "target"}
+    return [dict(smart, crop="smart"), dict(smart, crop=True)]
+
+
+def _set_format(thumbnailer, extension):
+    """Point `thumbnailer` at a variant's output format (None: the configured defaults)."""
+    thumbnailer.thumbnail_extension = extension or easy_thumbnails_settings.THUMBNAIL_EXTENSION
+    thumbnailer.thumbnail_transparency_extension = (
+        extension or easy_thumbnails_settings.THUMBNAIL_TRANSPARENCY_EXTENSION
+    )
+    thumbnailer.thumbnail_preserve_extensions = (
+        None if extension else easy_thumbnails_settings.THUMBNAIL_PRESERVE_EXTENSIONS
+    )
+    return thumbnailer
+
+
+def _info(thumbnail):
+    return ThumbnailInfo(thumbnail.url, thumbnail.width, thumbnail.height)
+
+
+def _resolve(fieldfile, variant, generate):
+    # get_thumbnailer() returns a fresh thumbnailer for a FieldFile, so changing
+    # its format does not affect other lookups.
+    thumbnailer = _set_format(get_thumbnailer(fieldfile), variant.extension)
+    thumbnail = thumbnailer.get_existing_thumbnail(variant.options)
+    if thumbnail is None and generate:
+        thumbnail = thumbnailer.get_thumbnail(variant.options)
+    if thumbnail is None:
+        return None
+    return _info(thumbnail)
+
+
+def lookup_variants(requests, generate=False):
+    """
+    Resolve a list of (fieldfile, Variant) pairs in one pass and return a list
+    of ThumbnailInfo (or None) in the same order.
+
+    Each lookup is tried against the per-process LRU, then all remaining ones
+    against the shared cache in a single get_many. Only what is still unknown
+    goes to easy_thumbnails (its database tables and storage). Missing
+    thumbnails are generated if `generate` is set, otherwise their source is
+    queued for the worker. Misses are not cached, so a thumbnail shows up as
+    soon as it exists.
+    """
+    results = [None] * len(requests)
+    pending = {}
+    for index, (fieldfile, variant) in enumerate(requests):
+        key = thumbnail_cache_key(fieldfile.name, variant.options, variant.extension)
+        info = local_cache.get(key)
+        if info is not None:
+            results[index] = info
+        else:
+            pending.setdefault(key, []).append((index, fieldfile, variant))
+    if not pending:
+        return results
+
+    try:
+        found = cache.get_many(list(pending))
+    except Exception:
+        # The shared cache is an optimisation; resolve everything directly.
+        found = {}
+    resolved = {}
+    missing_jobs = set()
+    for key, entries in pending.items():
+        info = found.get(key)
+        if info is None:
+            _, fieldfile, variant = entries[0]
+            # Only the default-format full-size thumbnail is worth rendering inline;
+            # smaller and modern-format variants always come from the worker.
+            base = variant.extension is None and variant.options == get_variant(
+                fieldfile, variant.alias
+            ).options
+            info = _resolve(fieldfile, variant, generate and base)
+            if info is not None:
+                resolved[key] = info
+            elif job := source_job(fieldfile):
+                missing_jobs.add(job)
+        if info is not None:
+            local_cache.set(key, info)
+        for index, _, _ in entries:
+            results[index] = info
+    if resolved:
+        try:
+            cache.set_many(resolved, settings.THUMBNAIL_URL_CACHE_TIMEOUT)
+        except Exception:
+            pass
+    if missing_jobs:
+        queue_thumbnails(sorted(missing_jobs), inline_fallback=False)
+    return results
+
+
+def lookup_thumbnails(fieldfiles, alias, generate=False):
+    """Resolve the `alias` thumbnail of every field file; see lookup_variants()."""
+    requests = []
+    indexes = []
+    for index, fieldfile in enumerate(fieldfiles):
+        variant = get_variant(fieldfile, alias) if fieldfile else None
+        if variant is not None:
+            requests.append((fieldfile, variant))
+            indexes.append(index)
+    results = [None] * len(fieldfiles)
+    for index, info in zip(indexes, lookup_variants(requests, generate)):
+        results[index] = info
+    return results
+
+
+def invalidate_thumbnails(source_name, target):
+    """
+    Forget every cached thumbnail of `source_name` for the aliases of `target`
+    (a field file or e.g. "images.Image.image"), for when the source file is
+    replaced or deleted. Other processes drop their LRU copy within
+    THUMBNAIL_URL_LOCAL_CACHE_TIMEOUT seconds.
+    """
+    keys = []
+    for alias in aliases.all(target):
+        for variant in alias_variants(target, alias):
+            for options in _cached_options(variant.options):
+                keys.append(thumbnail_cache_key(source_name, options, variant.extension))
+    for key in keys:
+        local_cache.delete(key)
+    try:
+        cache.delete_many(keys)
+    except Exception:
+        pass
+
+
+def generate_thumbnails(job):
+    """
+    Generate every variant of every alias targeted at the job's model field
+    (THUMBNAIL_ALIASES["images.Image.image"] etc.) that does not exist yet.
+    Runs in the thumbnail worker. Returns the number of variants processed.
+    """
+    label, pk = job.split(":")
+    model_label, field_name = SOURCES[label]
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    fieldfile = getattr(instance, field_name, None)
+    if not fieldfile:
+        return 0
+    # One thumbnailer for the whole job, so the original is read from storage once.
+    thumbnailer = get_thumbnailer(fieldfile)
+    generated = {}
+    for alias in aliases.all(fieldfile, include_global=False):
+        for variant in alias_variants(fieldfile, alias):
+            thumbnail = _set_format(thumbnailer, variant.extension).get_thumbnail(variant.options)
+            key = thumbnail_cache_key(fieldfile.name, variant.options, variant.extension)
+            generated[key] = _info(thumbnail)
+    # Templates find the new thumbnails without asking easy_thumbnails again.
+    try:
+        cache.set_many(generated, settings.THUMBNAIL_URL_CACHE_TIMEOUT)
+    except Exception:
+        pass
+    return len(generated)
+
+
+def thumbnail_names(fieldfile):
+    """
+    Storage names of every thumbnail the worker would generate for `fieldfile`
+    (each variant of each targeted alias, with and without transparency).
+    Computed from the options alone, without touching storage.
+    """
+    thumbnailer = get_thumbnailer(fieldfile)
+    names = set()
+    for alias in aliases.all(fieldfile, include_global=False):
+        for variant in alias_variants(fieldfile, alias):
+            _set_format(thumbnailer, variant.extension)
+            names.add(thumbnailer.get_thumbnail_name(variant.options))
+            names.add(thumbnailer.get_thumbnail_name(variant.options, transparent=True))
+    return names
+
+
+def queue_thumbnails(jobs, inline_fallback=True):
+    """
+    Ask the thumbnail worker to generate thumbnails for `jobs` (see source_job()).
+    The pending set makes repeated requests for the same source (e.g. every
+    render of a card that is still missing its thumbnail) enqueue it only
+    once. If Redis is unavailable the thumbnails are generated in this process
+    instead, unless `inline_fallback` is False.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    try:
+        pipeline = r.pipeline()
+        for job in jobs:
+            pipeline.sadd(PENDING_KEY, job)
+        added = pipeline.execute()
+        new_jobs = [job for job, is_new in zip(jobs, added) if is_new]
+        if new_jobs:
+            r.rpush(QUEUE_KEY, *new_jobs)
+    except Exception:
+        if inline_fallback:
+            for job in jobs:
+                generate_thumbnails(job)
+
+
+def pop_thumbnail_batch(batch_size, timeout=5):
+    """
+    Block until work is queued, then return up to `batch_size` jobs. The jobs
+    move to the processing list until finish_thumbnail_batch(), so those of a
+    worker killed mid-batch are not lost (see recover_thumbnail_jobs()).
+    """
+    job = r.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "LEFT", "RIGHT")
+    if job is None:
+        return []
+    pipeline = r.pipeline()
+    for _ in range(batch_size - 1):
+        pipeline.lmove(QUEUE_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+    rest = [item for item in pipeline.execute() if item is not None]
+    return [item.decode() for item in [job, *rest]]
+
+
+def finish_thumbnail_batch(jobs):
+    """Drop finished (or failed) jobs, so the sources can be queued again."""
+    pipeline = r.pipeline()
+    for job in jobs:
+        pipeline.lrem(PROCESSING_KEY, 1, job)
+    pipeline.srem(PENDING_KEY, *jobs)
+    pipeline.execute()
+
+
+def recover_thumbnail_jobs():
+    """
+    Move jobs left in the processing list back to the front of the queue and
+    return how many. Called when a worker starts; jobs still in flight on
+    other workers are requeued too, which only generates them twice.
+    """
+    recovered = 0
+    while r.lmove(PROCESSING_KEY, QUEUE_KEY, "RIGHT", "LEFT") is not None:
+        recovered += 1
+    return recovered
+
+
+def ready_thumbnail(fieldfile, alias):
+    """
+    Return the already generated thumbnail for `alias` as a ThumbnailInfo, or
+    None. Never generates anything; a miss is queued for the worker so the next
+    render finds it.
+    """
+    return lookup_thumbnails([fieldfile], alias)[0]
+
+
+def cached_thumbnail(fieldfile, alias):
+    """Like ready_thumbnail(), but generates a missing thumbnail inline (e.g. avatars)."""
+    return lookup_thumbnails([fieldfile], alias, generate=True)[0]
+
+
+def responsive_thumbnails(fieldfile, alias, generate=False):
+    """
+    Return the ready variants of `alias` grouped by format, as
+    {extension or None: [ThumbnailInfo, ...] narrowest first}. With `generate`,
+    a missing full-size default-format thumbnail is rendered inline.
+    """
+    if not fieldfile:
+        return {}
+    variants = alias_variants(fieldfile, alias)
+    infos = lookup_variants([(fieldfile, variant) for variant in variants], generate)
+    grouped = {}
+    for variant, info in zip(variants, infos):
+        if info is not None:
+            grouped.setdefault(variant.extension, []).append(info)
+    return grouped
+
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpg": "image/jpeg", "png": "image/png"}
+
+
+def _srcset(infos):
+    return ", ".join(f"{info.url} {info.width}w" for info in infos)
+
+
+def picture_sources(fieldfile, alias, generate=False):
+    """
+    What a <picture> needs for `alias`: a {"type", "srcset"} source per modern
+    format, the largest default-format thumbnail as "fallback" (None until it
+    exists) and the "srcset" of the default-format widths.
+    """
+    variants = responsive_thumbnails(fieldfile, alias, generate=generate)
+    fallback = variants.pop(None, [])
+    return {
+        "sources": [
+            {"type": MIME_TYPES.get(extension, f"image/{extension}"), "srcset": _srcset(infos)}
+            for extension, infos in variants.items()
+        ],
+        "fallback": fallback[-1] if fallback else None,
+        "srcset": _srcset(fallback) if len(fallback) > 1 else "",
+    }
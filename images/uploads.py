@@ -0,0 +1,153 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils import timezone
+
+from .downloads import SNIFF_BYTES, sniff_image_type
+from .models import ChunkedUpload
+
+UPLOAD_PREFIX = "uploads/"
+
+
+class UploadError(Exception):
+    """Raised when a chunk or a chunked upload is rejected."""
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the upload left off; the client should resume."""
+
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk at offset {offset}.")
+        self.offset = offset
+
+
+def chunk_prefix(upload_id):
+    return f"{UPLOAD_PREFIX}{upload_id}/"
+
+
+def chunk_name(upload_id, offset):
+    # Zero padded so a directory listing sorts chunks in upload order.
+    return f"{chunk_prefix(upload_id)}{offset:012d}"
+
+
+def start_upload(user, filename, size):
+    if size <= 0:
+        raise UploadError("The file is empty.")
+    if size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise UploadError("Image is too large to upload.")
+    return ChunkedUpload.objects.create(user=user, filename=filename[:255], size=size)
+
+
+def append_chunk(upload, offset, data):
+    """
+    Store `data` as the chunk starting at `offset` and advance the upload.
+    Chunks must arrive in order; a retried chunk simply replaces the stored one.
+    """
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    if not data:
+        raise UploadError("The chunk is empty.")
+    if len(data) > settings.IMAGE_UPLOAD_CHUNK_SIZE:
+        raise UploadError("The chunk is too large.")
+    if offset + len(data) > upload.size:
+        raise UploadError("The chunk runs past the declared file size.")
+    if offset == 0 and sniff_image_type(data[:SNIFF_BYTES]) is None:
+        raise UploadError("The file is not a supported image.")
+
+    name = chunk_name(upload.id, offset)
+    # Storages pick a new name instead of overwriting, so drop a previous attempt first.
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+    # Conditional on the offset, so of two racing requests for the same chunk only one advances it.
+    advanced = ChunkedUpload.objects.filter(pk=upload.pk, offset=offset).update(
+        offset=offset + len(data), updated=timezone.now()
+    )
+    if not advanced:
+        upload.refresh_from_db(fields=["offset"])
+        raise OffsetMismatch(upload.offset)
+    upload.offset = offset + len(data)
+    return upload
+
+
+def get_upload(user, upload_id):
+    """Return the user's upload with this id (a string from the client), or None."""
+    try:
+        upload_id = uuid.UUID(str(upload_id))
+    except ValueError:
+        return None
+    return ChunkedUpload.objects.filter(pk=upload_id, user=user).first()
+
+
+def assemble_upload(upload):
+    """
+    Stream the stored chunks, in order, into a temporary file while hashing them.
+    Returns a TemporaryUploadedFile that forms validate like any multipart upload,
+    with the content digest as its `sha256` attribute.
+    """
+    if not upload.complete:
+        raise UploadError("The upload is incomplete. Please try again.")
+    prefix = chunk_prefix(upload.id)
+    _, names = default_storage.listdir(prefix)
+    assembled = TemporaryUploadedFile(upload.filename, "application/octet-stream", upload.size, None)
+    digest = hashlib.sha256()
+    try:
+        for name in sorted(names):
+            with default_storage.open(prefix + name) as chunk:
+                for data in chunk.chunks(settings.IMAGE_DOWNLOAD_CHUNK_SIZE):
+                    digest.update(data)
+                    assembled.write(data)
+        if assembled.tell() != upload.size:
+            raise UploadError("The upload is incomplete. Please try again.")
+        assembled.seek(0)
+        image_type = sniff_image_type(assembled.read(SNIFF_BYTES))
+        assembled.seek(0)
+    except Exception:
+        assembled.close()
+        raise
+    if image_type is not None:
+        assembled.content_type = image_type[1]
+    assembled.sha256 = digest.hexdigest()
+    return assembled
+
+
+def request_files(request, field_name):
+    """
+    Return (files, upload) for a form submission. If the request names a chunked
+    upload in POST["upload"], it is assembled and attached to the files as
+    `field_name`; pass the upload to finish_upload() once the form is saved.
+    """
+    upload_id = request.POST.get("upload")
+    if not upload_id:
+        return request.FILES, None
+    upload = get_upload(request.user, upload_id)
+    if upload is None:
+        raise UploadError("The upload has expired. Please choose the file again.")
+    files = request.FILES.copy()
+    files[field_name] = assemble_upload(upload)
+    return files, upload
+
+
+def delete_chunks(upload_id):
+    prefix = chunk_prefix(upload_id)
+    try:
+        _, names = default_storage.listdir(prefix)
+    except FileNotFoundError:
+        return
+    for name in names:
+        default_storage.delete(prefix + name)
+    try:
+        # Local storage leaves the empty directory behind.
+        default_storage.delete(prefix.rstrip("/"))
+    except OSError:
+        pass
+
+
+def finish_upload(upload):
+    """Remove a committed or abandoned upload and its chunks."""
+    delete_chunks(upload.id)
+    upload.delete()
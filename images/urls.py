@@ -1,12 +1,28 @@
 from django.urls import path
-from .views import image_create, image_detail, image_like, image_list, image_ranking
+from .views import (
+    image_create,
+    image_detail,
+    image_feed,
+    image_like,
+    image_list,
+    image_ranking,
+    image_search,
+    tag_detail,
+    upload_create,
+    upload_detail,
+)
 
 app_name = "images"
 
 urlpatterns = [
     path("create/", image_create, name="create"),
     path("", image_list, name="list"),
+    path("feed/", image_feed, name="feed"),
+    path("search/", image_search, name="search"),
+    path("tags/<str:name>/", tag_detail, name="tag"),
     path("<int:id>/<slug:slug>/", image_detail, name="detail"),
     path("ranking/", image_ranking, name="ranking"),
     path("like/", image_like, name="like"),
+    path("uploads/", upload_create, name="upload_create"),
+    path("uploads/<uuid:id>/", upload_detail, name="upload_detail"),
 ]
@@ -2,18 +2,51 @@ import redis
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_POST
+from django.utils.html import format_html
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_http_methods, require_POST
 
+from accounts.throttling import throttle
 from actions.utils import create_action
+from pages.conditional import bump_versions, conditional_page, user_version
 
+from .cards import card_records
 from .forms import ImageCreateForm
-from .models import Image
+from .models import Image, Tag
+from .pagination import InvalidCursor, paginate
+from .search import search_images
+from .tags import tag_images, trending_tags, trending_version
+from .uploads import (
+    OffsetMismatch,
+    UploadError,
+    append_chunk,
+    finish_upload,
+    get_upload,
+    request_files,
+    start_upload,
+)
 
 r = redis.from_url(settings.REDIS_URL)
 
+
+def attach_view_counts(images):
+    """Set `views` on each image from the Redis counters, in one pipeline."""
+    try:
+        pipeline = r.pipeline()
+        for image in images:
+            pipeline.get(f"image:{image.id}:views")
+        view_counts = pipeline.execute()
+
+        for image, views in zip(images, view_counts):
+            image.views = int(views) if views else 0
+    except Exception:
+        # If Redis is unavailable, set all view counts to 0
+        for image in images:
+            image.views = 0
+
+
 @login_required
 def image_create(request):
     """
@@ -21,15 +54,31 @@ def image_create(request):
     pre-filled data from GET parameters. On POST requests, validate and save
     """
     if request.method == "POST":
-        form = ImageCreateForm(data=request.POST, files=request.FILES)
+        try:
+            files, upload = request_files(request, "file")
+        except UploadError as e:
+            messages.error(request, str(e))
+            files, upload = request.FILES, None
+        form = ImageCreateForm(data=request.POST, files=files)
         if form.is_valid():
             new_image = form.save(commit=False)
 
             new_image.user = request.user
             new_image.save()
             create_action(request.user, "bookmarked image", new_image)
+            if upload:
+                finish_upload(upload)
 
             messages.success(request, "Image added successfully")
+            for duplicate in form.near_duplicates[:1]:
+                messages.info(
+                    request,
+                    format_html(
+                        'This looks like an image that was already bookmarked: <a href="{}" class="underline">{}</a>',
+                        duplicate.get_absolute_url(),
+                        duplicate.title,
+                    ),
+                )
 
             return redirect(new_image.get_absolute_url())
     else:
@@ -42,50 +91,139 @@ def image_create(request):
 
 
 @login_required
+@conditional_page(lambda request: ["images", user_version(request.user)])
 def image_list(request):
     """
-    Display a paginated list of all images. Supports AJAX requests that return
-    only the image grid partial via the 'images_only' GET parameter. Displays
-    8 images per page.
+    Display a paginated list of all images, 8 per page, newest first. Pages
+    after the first are selected with an opaque 'cursor' (images/pagination.py).
+    Supports AJAX requests that return only the image grid partial via the
+    'images_only' GET parameter, with the next cursor in X-Next-Cursor.
+    """
+    images_only = request.GET.get("images_only")
+    try:
+        images = paginate(Image.objects.all(), request.GET.get("cursor"), 8)
+    except InvalidCursor:
+        if images_only:
+            return HttpResponse("")
+        images = paginate(Image.objects.all(), None, 8)
+
+    attach_view_counts(images)
+
+    if images_only:
+        response = render(
+            request,
+            "includes/list_images_subset.html",
+            {"section": "images", "images": images},
+        )
+        response["X-Next-Cursor"] = images.next_cursor or ""
+        return response
+    return render(
+        request,
+        "images/image/list.html",
+        {"section": "images", "images": images, "next_cursor": images.next_cursor},
+    )
+
+
+@login_required
+@gzip_page
+@conditional_page(lambda request: ["images", user_version(request.user)])
+def image_feed(request):
+    """
+    JSON feed of image cards for infinite scroll: minimal records plus the
+    cursor of the next page ('next', null on the last page). Pass 'user' to
+    list one user's images, 'tag' for the images of a #tag and 'cursor' to
+    continue from a previous page.
     """
     images = Image.objects.all()
-    paginator = Paginator(images, 8)
-    page = request.GET.get("page")
+    username = request.GET.get("user")
+    tag_name = request.GET.get("tag")
+    if username:
+        images = images.filter(user__username=username, user__is_active=True)
+    try:
+        if tag_name:
+            tag = get_object_or_404(Tag, name=tag_name.lower())
+            page = tag_images(tag, request.GET.get("cursor"), 8)
+        else:
+            page = paginate(images, request.GET.get("cursor"), 8)
+    except InvalidCursor:
+        return JsonResponse({"status": "error", "error": "Invalid cursor."}, status=400)
+    attach_view_counts(page)
+    return JsonResponse({"images": card_records(page, request.user), "next": page.next_cursor})
+
+
+@login_required
+@conditional_page(lambda request: ["images", user_version(request.user)])
+def image_search(request):
+    """
+    Full-text search over image titles, descriptions and usernames, best match
+    first, 8 per page (images/search.py). Every word of 'q' matches as a prefix.
+    Like image_list, 'images_only' returns the grid fragment for a 'cursor'.
+    """
+    query = request.GET.get("q", "").strip()
     images_only = request.GET.get("images_only")
     try:
-        images = paginator.page(page)
-    except PageNotAnInteger:
-        images = paginator.page(1)
-    except EmptyPage:
+        images = search_images(query, request.GET.get("cursor"), 8)
+    except InvalidCursor:
         if images_only:
             return HttpResponse("")
-        images = paginator.page(paginator.num_pages)
-    
-    # Fetch view counts from Redis using pipeline for efficiency.
+        images = search_images(query, None, 8)
+
+    attach_view_counts(images)
+    context = {
+        "section": "images",
+        "images": images,
+        "empty_title": "No matching images",
+        "empty_text": "Try fewer or shorter words.",
+    }
+
+    if images_only:
+        response = render(request, "includes/list_images_subset.html", context)
+        response["X-Next-Cursor"] = images.next_cursor or ""
+        return response
+    return render(
+        request,
+        "images/image/search.html",
+        {**context, "query": query, "next_cursor": images.next_cursor},
+    )
+
+
+@login_required
+@conditional_page(lambda request, name: ["images", user_version(request.user), trending_version()])
+def tag_detail(request, name):
+    """
+    Images whose description uses #name, newest first, 8 per page, with the
+    trending tags. Pages come from the ImageTag index (images/tags.py);
+    infinite scroll continues through image_feed with 'tag'.
+    """
+    tag = get_object_or_404(Tag, name=name.lower())
+    images_only = request.GET.get("images_only")
     try:
-        pipeline = r.pipeline()
-        for image in images:
-            pipeline.get(f"image:{image.id}:views")
-        view_counts = pipeline.execute()
-        
-        # Attach view counts to image objects
-        for image, views in zip(images, view_counts):
-            image.views = int(views) if views else 0
-    except Exception:
-        # If Redis is unavailable, set all view counts to 0
-        for image in images:
-            image.views = 0
-    
+        images = tag_images(tag, request.GET.get("cursor"), 8)
+    except InvalidCursor:
+        if images_only:
+            return HttpResponse("")
+        images = tag_images(tag, None, 8)
+
+    attach_view_counts(images)
+
     if images_only:
-        return render(
+        response = render(
             request,
             "includes/list_images_subset.html",
             {"section": "images", "images": images},
         )
+        response["X-Next-Cursor"] = images.next_cursor or ""
+        return response
     return render(
         request,
-        "images/image/list.html",
-        {"section": "images", "images": images},
+        "images/image/tag.html",
+        {
+            "section": "images",
+            "tag": tag,
+            "images": images,
+            "next_cursor": images.next_cursor,
+            "trending_tags": trending_tags(),
+        },
     )
 
 
@@ -101,6 +239,12 @@ def image_detail(request, id, slug):
     try:
         total_views = r.incr(f"image:{image.id}:views")
         r.zincrby("image_ranking", 1, image.id)
+        # Every view reorders the ranking; list pages only show a new count
+        # once it reaches the next card view bucket.
+        if total_views % settings.IMAGE_CARD_VIEW_BUCKET == 0:
+            bump_versions("ranking", "images")
+        else:
+            bump_versions("ranking")
     except Exception:
         # Redis might not be configured or reachable; default to 0 views
         total_views = 0
@@ -113,27 +257,15 @@ def image_detail(request, id, slug):
 
 
 @login_required
+@conditional_page(lambda request: ["images", "ranking", user_version(request.user)])
 def image_ranking(request):
     image_ranking = r.zrange("image_ranking", 0, -1, withscores=True, desc=True)[:10]
     image_ranking_ids = [int(id) for id, score in image_ranking]
     most_viewed = list(Image.objects.filter(id__in=image_ranking_ids))
     most_viewed.sort(key=lambda x: image_ranking_ids.index(x.id))
     
-    # Fetch view counts from Redis using pipeline for efficiency
-    try:
-        pipeline = r.pipeline()
-        for image in most_viewed:
-            pipeline.get(f"image:{image.id}:views")
-        view_counts = pipeline.execute()
-        
-        # Attach view counts to image objects
-        for image, views in zip(most_viewed, view_counts):
-            image.views = int(views) if views else 0
-    except Exception:
-        # If Redis is unavailable, set all view counts to 0
-        for image in most_viewed:
-            image.views = 0
-    
+    attach_view_counts(most_viewed)
+
     return render(
         request,
         "images/image/ranking.html",
@@ -143,6 +275,7 @@ def image_ranking(request):
 
 @login_required
 @require_POST
+@throttle("like", user="60/m", ip="300/m")
 def image_like(request):
     """
     Handle image liking/unliking via AJAX POST requests. Accepts 'id' and 'action'
@@ -163,3 +296,57 @@ def image_like(request):
         except Image.DoesNotExist:
             pass
     return JsonResponse({"status": "error"})
+
+
+@login_required
+@require_POST
+def upload_create(request):
+    """
+    Start a chunked upload. Expects 'filename' and 'size' (bytes) and returns
+    the upload id and the chunk size the client should send.
+    """
+    try:
+        size = int(request.POST.get("size", ""))
+        upload = start_upload(request.user, request.POST.get("filename") or "upload", size)
+    except ValueError:
+        return JsonResponse({"status": "error", "error": "Invalid size."}, status=400)
+    except UploadError as e:
+        return JsonResponse({"status": "error", "error": str(e)}, status=400)
+    return JsonResponse(
+        {"status": "ok", "id": str(upload.id), "offset": 0, "chunk_size": settings.IMAGE_UPLOAD_CHUNK_SIZE},
+        status=201,
+    )
+
+
+@login_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def upload_detail(request, id):
+    """
+    Resume (GET returns the current offset), continue (PUT the next chunk with
+    its position in the Upload-Offset header) or abort (DELETE) a chunked upload.
+    A PUT at the wrong offset gets a 409 with the offset to resume from.
+    """
+    upload = get_upload(request.user, id)
+    if upload is None:
+        return JsonResponse({"status": "error", "error": "Unknown upload."}, status=404)
+    if request.method == "DELETE":
+        finish_upload(upload)
+        return JsonResponse({"status": "ok"})
+    if request.method == "PUT":
+        try:
+            append_chunk(upload, int(request.headers.get("Upload-Offset", "")), request.body)
+        except ValueError:
+            return JsonResponse({"status": "error", "error": "Invalid Upload-Offset."}, status=400)
+        except OffsetMismatch as e:
+            return JsonResponse({"status": "error", "error": str(e), "offset": e.offset}, status=409)
+        except UploadError as e:
+            return JsonResponse({"status": "error", "error": str(e)}, status=400)
+    return JsonResponse(
+        {
+            "status": "ok",
+            "id": str(upload.id),
+            "offset": upload.offset,
+            "size": upload.size,
+            "chunk_size": settings.IMAGE_UPLOAD_CHUNK_SIZE,
+        }
+    )
@@ -0,0 +1,90 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+VERSION_PREFIX = "page_version:"
+
+
+def get_versions(names):
+    """
+    Return the version (time of the last change, as a timestamp) of each named
+    piece of page content. Unknown names start at the current time.
+    """
+    keys = [f"{VERSION_PREFIX}{name}" for name in names]
+    try:
+        found = cache.get_many(keys)
+    except Exception:
+        found = {}
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        try:
+            cache.set_many(missing, None)
+        except Exception:
+            pass
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump_versions(*names):
+    """Record that the named content changed, so pages built from it revalidate."""
+    now = time.time()
+    try:
+        cache.set_many({f"{VERSION_PREFIX}{name}": now for name in names}, None)
+    except Exception:
+        pass
+
+
+def user_version(user):
+    """Name of the version covering what a page shows about `user` (nav, profile, follows)."""
+    return f"user:{user.username}" if user.is_authenticated else "user:"
+
+
+def _has_messages(request):
+    # A 304 would hide queued flash messages; len() does not mark them as read.
+    storage = getattr(request, "_messages", None)
+    return storage is not None and len(storage) > 0
+
+
+def conditional_page(versions):
+    """
+    Answer GET requests with 304 Not Modified when nothing the page shows has
+    changed, before the view runs any queries. `versions(request, *args,
+    **kwargs)` returns the names of the content versions the page depends on
+    (see bump_versions()). The ETag also covers the user, the CSRF cookie (the
+    page embeds a token) and the full URL, so cached copies are per user and per
+    infinite-scroll page. Responses are marked private and must be revalidated.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or settings.DEBUG or _has_messages(request):
+                return view(request, *args, **kwargs)
+            stamps = get_versions(versions(request, *args, **kwargs))
+            validators = (
+                stamps,
+                request.user.pk,
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+                request.get_full_path(),
+            )
+            etag = quote_etag(hashlib.sha1(repr(validators).encode()).hexdigest())
+            last_modified = int(max(stamps))
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers["ETag"] = etag
+            response.headers["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from easy_thumbnails.signals import thumbnail_created
+
+from accounts.models import Contact, Profile
+from images.models import Image
+
+from .conditional import bump_versions, user_version
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_changed(sender, instance, **kwargs):
+    # Likes are covered too: they update total_likes with a save.
+    bump_versions("images")
+
+
+@receiver(thumbnail_created)
+def thumbnail_generated(sender, **kwargs):
+    # Cards swap their placeholder for the thumbnail.
+    bump_versions("images")
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, **kwargs):
+    bump_versions(user_version(instance))
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    bump_versions(user_version(instance.user))
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def contact_changed(sender, instance, **kwargs):
+    bump_versions(user_version(instance.user_from), user_version(instance.user_to))
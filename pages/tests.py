@@ -1,3 +1,84 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import Contact
+from images.models import Image
+
+User = get_user_model()
+
+
+class ConditionalPageTests(TestCase):
+    """Test ETag/Last-Modified handling on list and profile pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.image = Image.objects.create(user=self.other, title='Test', image='images/test.jpg')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        # The first page sets the CSRF cookie, which is part of the validators.
+        self.client.get(reverse('pages:landing'))
+
+    def _revalidate(self, url, response):
+        return self.client.get(url, headers={'If-None-Match': response['ETag']})
+
+    def test_unchanged_list_is_not_modified(self):
+        """Test a revalidated image list gets a 304 without querying images"""
+        url = reverse('images:list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertTrue(response.has_header('Last-Modified'))
+        with CaptureQueriesContext(connection) as queries:
+            revalidated = self._revalidate(url, response)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertFalse(any('images_image' in query['sql'] for query in queries.captured_queries))
+
+    def test_likes_and_uploads_change_the_list(self):
+        """Test a like or a new image makes the list render again"""
+        url = reverse('images:list')
+        response = self.client.get(url)
+        self.image.users_like.add(self.other)
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        Image.objects.create(user=self.other, title='New', image='images/new.jpg')
+        self.assertEqual(self._revalidate(url, response).status_code, 200)
+
+    def test_etag_is_per_user_and_page(self):
+        """Test different users and infinite-scroll pages get different validators"""
+        url = reverse('images:list')
+        mine = self.client.get(url)
+        self.assertNotEqual(self.client.get(url + '?images_only=1')['ETag'], mine['ETag'])
+        other = Client()
+        other.login(username='other', password='testpass123')
+        self.assertEqual(self._revalidate(url, mine).status_code, 304)
+        self.assertEqual(other.get(url, headers={'If-None-Match': mine['ETag']}).status_code, 200)
+
+    def test_follow_changes_profile_page(self):
+        """Test following a user revalidates their profile page"""
+        url = reverse('user_detail', args=['other'])
+        response = self.client.get(url)
+        self.assertEqual(self._revalidate(url, response).status_code, 304)
+        Contact.objects.create(user_from=self.user, user_to=self.other)
+        self.assertEqual(self._revalidate(url, response).status_code, 200)
+
+    def test_missing_profile_has_no_validators(self):
+        """Test error responses are not given an ETag"""
+        response = self.client.get(reverse('user_detail', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_landing_page(self):
+        """Test the landing page revalidates for anonymous visitors"""
+        client = Client()
+        url = reverse('pages:landing')
+        client.get(url)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
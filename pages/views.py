@@ -1,5 +1,8 @@
 from django.shortcuts import render
 
+from .conditional import conditional_page, user_version
 
+
+@conditional_page(lambda request: [user_version(request.user)])
 def landing_page(request):
     return render(request, 'pages/landing.html')
@@ -0,0 +1,106 @@
+// Sends the file chosen in a form in sequential chunks before the form is
+// submitted, so large uploads never tie up a server worker. Forms opt in with
+// data-chunked-upload="<file field name>" and data-upload-url, and carry a hidden
+// "upload" input that receives the finished upload's id. Interrupted uploads
+// resume from the last stored chunk when the same file is submitted again.
+(function () {
+    const MAX_RETRIES = 3;
+
+    function storageKey(file) {
+        return `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    async function request(url, options) {
+        const response = await fetch(url, {
+            mode: 'same-origin',
+            ...options,
+            headers: {'X-CSRFToken': Cookies.get('csrftoken'), ...(options.headers || {})},
+        });
+        return {response, data: await response.json()};
+    }
+
+    async function resumeOrStart(uploadUrl, file) {
+        const savedId = localStorage.getItem(storageKey(file));
+        if (savedId) {
+            const {response, data} = await request(`${uploadUrl}${savedId}/`, {method: 'GET'});
+            if (response.ok) {
+                return {id: data.id, offset: data.offset, chunkSize: data.chunk_size};
+            }
+            localStorage.removeItem(storageKey(file));
+        }
+        const body = new FormData();
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        const {response, data} = await request(uploadUrl, {method: 'POST', body});
+        if (!response.ok) {
+            throw new Error(data.error || 'Upload failed.');
+        }
+        localStorage.setItem(storageKey(file), data.id);
+        return {id: data.id, offset: data.offset, chunkSize: data.chunk_size};
+    }
+
+    async function upload(form, file, onProgress) {
+        const uploadUrl = form.dataset.uploadUrl;
+        let {id, offset, chunkSize} = await resumeOrStart(uploadUrl, file);
+        let failures = 0;
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + chunkSize);
+            try {
+                const {response, data} = await request(`${uploadUrl}${id}/`, {
+                    method: 'PUT',
+                    headers: {'Upload-Offset': String(offset), 'Content-Type': 'application/octet-stream'},
+                    body: chunk,
+                });
+                if (response.ok || response.status === 409) {
+                    // On 409 the server tells us where to pick up again.
+                    offset = data.offset;
+                    failures = 0;
+                    onProgress(offset / file.size);
+                    continue;
+                }
+                throw new Error(data.error || 'Upload failed.');
+            } catch (error) {
+                failures += 1;
+                if (failures > MAX_RETRIES) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 500 * 2 ** failures));
+            }
+        }
+        return id;
+    }
+
+    document.querySelectorAll('form[data-chunked-upload]').forEach(form => {
+        const fileInput = form.querySelector(`input[type="file"][name="${form.dataset.chunkedUpload}"]`);
+        const uploadInput = form.querySelector('input[name="upload"]');
+        const button = form.querySelector('button[type="submit"]');
+        if (!fileInput || !uploadInput || !window.fetch) {
+            return;
+        }
+
+        form.addEventListener('submit', async event => {
+            const file = fileInput.files[0];
+            if (!file || uploadInput.value) {
+                return;
+            }
+            event.preventDefault();
+            const label = button.textContent;
+            button.disabled = true;
+            try {
+                const id = await upload(form, file, progress => {
+                    button.textContent = `Uploading ${Math.round(progress * 100)}%`;
+                });
+                // The saved id is kept until the server has used the upload, so
+                // resubmitting after a validation error does not send the file again.
+                uploadInput.value = id;
+                // The file is already on the server; don't send it again.
+                fileInput.disabled = true;
+                form.submit();
+            } catch (error) {
+                button.disabled = false;
+                button.textContent = label;
+                alert(error.message);
+            }
+        });
+    });
+})();
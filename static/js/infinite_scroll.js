@@ -1,41 +1,123 @@
-// Infinite scroll script for image listings
-let page = 1;
+// Infinite scroll script for image listings. Lists with data-feed-url load
+// JSON card records (images:feed) and render them from the
+// #image-card-template element; others fetch rendered ?images_only=1 pages.
+// Both follow the opaque cursor of the last page loaded.
 let emptyPage = false;
 let blockRequest = false;
 
+const imageList = document.getElementById("image-list");
+const cardTemplate = document.getElementById("image-card-template");
+let nextCursor = imageList ? imageList.dataset.nextCursor : "";
+
+function renderCard(record) {
+    const card = cardTemplate.content.firstElementChild.cloneNode(true);
+    card.setAttribute("x-data", `imageLike('${record.id}', '${record.liked ? "unlike" : "like"}', ${record.likes})`);
+    card.querySelectorAll("[data-card-link]").forEach(link => link.href = record.url);
+    card.querySelector("[data-card-title]").textContent = record.title;
+    card.querySelector("[data-card-views]").textContent = record.views;
+    card.querySelector("[data-card-created]").textContent = record.created;
+
+    const picture = card.querySelector("[data-card-picture]");
+    const pending = card.querySelector("[data-card-pending]");
+    const placeholder = record.placeholder ? `url('${record.placeholder}')` : "";
+    if (record.thumbnail) {
+        const img = picture.querySelector("[data-card-img]");
+        record.thumbnail.sources.forEach(source => {
+            const el = document.createElement("source");
+            el.type = source.type;
+            el.srcset = source.srcset;
+            el.sizes = img.sizes;
+            picture.insertBefore(el, img);
+        });
+        img.src = record.thumbnail.url;
+        img.width = record.thumbnail.width;
+        img.height = record.thumbnail.height;
+        img.alt = record.title;
+        if (record.thumbnail.srcset) {
+            img.srcset = record.thumbnail.srcset;
+        } else {
+            img.removeAttribute("sizes");
+        }
+        img.style.backgroundImage = placeholder;
+        pending.remove();
+    } else {
+        picture.remove();
+        pending.setAttribute("aria-label", record.title);
+        if (placeholder) {
+            pending.style.backgroundImage = placeholder;
+        } else {
+            pending.classList.add("animate-pulse");
+        }
+    }
+    return card;
+}
+
+function loadNextPage() {
+    if (!nextCursor) {
+        return Promise.resolve(false);
+    }
+    if (imageList.dataset.feedUrl && cardTemplate) {
+        const params = new URLSearchParams({cursor: nextCursor});
+        if (imageList.dataset.feedUser) {
+            params.set("user", imageList.dataset.feedUser);
+        }
+        if (imageList.dataset.feedTag) {
+            params.set("tag", imageList.dataset.feedTag);
+        }
+        return fetch(`${imageList.dataset.feedUrl}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                const fragment = document.createDocumentFragment();
+                data.images.forEach(record => fragment.appendChild(renderCard(record)));
+                imageList.appendChild(fragment);
+                nextCursor = data.next;
+                return data.images.length > 0 && Boolean(nextCursor);
+            });
+    }
+    // Keep the page's own parameters (e.g. the search query).
+    const params = new URLSearchParams(window.location.search);
+    params.set("images_only", 1);
+    params.set("cursor", nextCursor);
+    return fetch(`?${params}`)
+        .then(response => {
+            nextCursor = response.headers.get("X-Next-Cursor") || "";
+            return response.text();
+        })
+        .then(html => {
+            if (html.trim().length == 0) {
+                return false;
+            }
+            imageList.insertAdjacentHTML("beforeend", html);
+            return Boolean(nextCursor);
+        });
+}
+
 window.addEventListener('scroll', function (e) {
     const margin = document.body.clientHeight - window.innerHeight - 200;
-    if (window.pageYOffset > margin && !blockRequest && !emptyPage) {
+    if (imageList && window.pageYOffset > margin && !blockRequest && !emptyPage) {
         blockRequest = true;
-        page += 1;
 
         // Show skeleton loader
-        const imageList = document.getElementById("image-list");
         const skeletonTemplate = document.getElementById("skeleton-template");
         if (skeletonTemplate) {
             imageList.insertAdjacentHTML("beforeend", skeletonTemplate.innerHTML);
         }
 
-        fetch(`?images_only=1&page=${page}`)
-            .then(response => response.text())
-            .then(html => {
+        loadNextPage()
+            .then(more => {
                 // Remove skeleton loader
-                const skeletons = imageList.querySelectorAll(".skeleton-item");
-                skeletons.forEach(el => el.remove());
-
-                if (html.trim().length == 0) {
-                    emptyPage = true;
-                } else {
-                    imageList.insertAdjacentHTML("beforeend", html);
+                imageList.querySelectorAll(".skeleton-item").forEach(el => el.remove());
+                if (more) {
                     blockRequest = false;
+                } else {
+                    emptyPage = true;
                 }
             })
             .catch(error => {
                 console.error("Infinite scroll fetch failed:", error);
-                
+
                 // Remove skeleton loader
-                const skeletons = imageList.querySelectorAll(".skeleton-item");
-                skeletons.forEach(el => el.remove());
+                imageList.querySelectorAll(".skeleton-item").forEach(el => el.remove());
 
                 blockRequest = false; // Allow retry on error
             });
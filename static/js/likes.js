@@ -1,6 +1,19 @@
+// Ids of the images the user likes, from the JSON blobs sent with each page of
+// cached image cards (images/cards.py).
+const likedImageIds = new Set();
+
+function readLikedImageIds() {
+    document.querySelectorAll('script[data-liked-images]:not([data-read])').forEach(el => {
+        JSON.parse(el.textContent).forEach(id => likedImageIds.add(String(id)));
+        el.dataset.read = '';
+    });
+    return likedImageIds;
+}
+
 document.addEventListener('alpine:init', () => {
+    // initialAction is null for shared cards; the like state then comes from the page.
     Alpine.data('imageLike', (imageId, initialAction, initialLikes) => ({
-        action: initialAction,
+        action: initialAction ?? (readLikedImageIds().has(String(imageId)) ? 'unlike' : 'like'),
         likes: initialLikes,
         loading: false,
         